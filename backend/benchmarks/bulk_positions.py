@@ -0,0 +1,153 @@
+"""
+Bulk Position Update Benchmark
+------------------------------
+Compares the old per-item bulk position update (a position SELECT, an
+AIModel SELECT and a refresh per item) with the set-based update used by
+PUT /models/update_bulk_positions, on the price updater's workload: every
+position gets a new value, pnl, percentage and last_price.
+
+The benchmark creates its own schema in the DATABASE_URL database, fills it
+with synthetic ai_models/positions rows, checks that both approaches leave
+the same rows and drops the schema afterwards; the application's tables are
+not touched.
+
+Usage (from the backend directory):
+    python -m benchmarks.bulk_positions --positions 1000 10000 --runs 3
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from config.database import DATABASE_URL
+from tables.ai_model import AIModel
+from tables.positions import Position, PositionBulkUpdateItem
+from utils.position_updates import update_positions_in_bulk
+
+SCHEMA = "bulk_positions_benchmark"
+MODELS = 10
+# Fields compared between the two approaches (last_updated differs by design)
+COMPARED_FIELDS = ("id", "asset", "percentage", "value", "pnl", "quantity", "last_price", "ai_model_id")
+
+
+async def seed(engine, positions: int):
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        await conn.run_sync(
+            lambda sync_conn: AIModel.metadata.create_all(
+                sync_conn, tables=[AIModel.__table__, Position.__table__]
+            )
+        )
+        await conn.execute(text("""
+            INSERT INTO ai_models (code_name, display_name, provider)
+            SELECT 'model_' || m, 'Model ' || m, 'benchmark' FROM generate_series(1, :models) AS m
+        """), {"models": MODELS})
+        await conn.execute(text("""
+            INSERT INTO positions (asset, display_name, percentage, value, pnl, quantity,
+                                   last_price, code_name, ai_model_id, last_updated)
+            SELECT 'ASSET' || i, 'Model ' || (i % :models + 1), 1, 1000, 0, 10, 100,
+                   'model_' || (i % :models + 1), i % :models + 1, now()
+            FROM generate_series(1, :positions) AS i
+        """), {"models": MODELS, "positions": positions})
+
+
+def price_updates(positions: int, run: int) -> list:
+    """One update per position, as sent by the price updater"""
+    rng = random.Random(run)
+    items = []
+    for position_id in range(1, positions + 1):
+        last_price = round(rng.uniform(50, 150), 2)
+        items.append(PositionBulkUpdateItem(
+            id=position_id,
+            percentage=round(rng.uniform(0, 5), 4),
+            value=round(last_price * 10, 2),
+            pnl=round((last_price - 100) * 10, 2),
+            last_price=last_price,
+            ai_model_id=position_id % MODELS + 1
+        ))
+    return items
+
+
+async def per_item(db: AsyncSession, items: list) -> int:
+    """The loop update_bulk_positions ran before"""
+    updated_positions = []
+    for item in items:
+        existing_position = (await db.execute(select(Position).where(Position.id == item.id))).scalar_one_or_none()
+        if not existing_position:
+            continue
+        if item.ai_model_id is not None:
+            ai_model = (await db.execute(select(AIModel).where(AIModel.id == item.ai_model_id))).scalar_one_or_none()
+            if not ai_model:
+                continue
+        for field, value in item.model_dump(exclude_unset=True, exclude={"id"}).items():
+            setattr(existing_position, field, value)
+        updated_positions.append(existing_position)
+    await db.commit()
+    for position in updated_positions:
+        await db.refresh(position)
+    return len(updated_positions)
+
+
+async def set_based(db: AsyncSession, items: list) -> int:
+    updated_positions, _ = await update_positions_in_bulk(db, items)
+    await db.commit()
+    return len(updated_positions)
+
+
+async def snapshot(engine) -> list:
+    async with engine.connect() as conn:
+        rows = await conn.execute(text(f"SELECT {', '.join(COMPARED_FIELDS)} FROM positions ORDER BY id"))
+        return [tuple(row) for row in rows]
+
+
+async def run(positions: int, runs: int):
+    engine = create_async_engine(DATABASE_URL, connect_args={"server_settings": {"search_path": SCHEMA}})
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        await seed(engine, positions)
+        print(f"Seeded {positions:,} positions")
+
+        results = {}
+        for name, update in (("before (per-item queries)", per_item), ("after (set-based)", set_based)):
+            timings = []
+            for run_number in range(runs):
+                items = price_updates(positions, run_number)
+                async with session_maker() as db:
+                    started = time.perf_counter()
+                    updated = await update(db, items)
+                    timings.append(time.perf_counter() - started)
+            results[name] = await snapshot(engine)
+            print({
+                "mode": name,
+                "positions": positions,
+                # Statements besides the flush and commit
+                "queries": 3 * positions if name.startswith("before") else 2,
+                "best_ms": round(min(timings) * 1000, 1),
+                "mean_ms": round(sum(timings) / len(timings) * 1000, 1),
+                "updated": updated
+            })
+
+        before, after = results.values()
+        print("Same rows:", before == after)
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--positions", type=int, nargs="+", default=[1000, 10000], help="Positions per request")
+    parser.add_argument("--runs", type=int, default=3, help="Timed runs per approach")
+    args = parser.parse_args()
+    for positions in args.positions:
+        asyncio.run(run(positions, args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Frame Encoding Benchmark
+------------------------
+Measures the CPU cost of broadcasting one modeldata_update frame as the
+number of connections grows.
+
+"before" is the old path: json.dumps once per tick, then send_text(str) for
+every socket, which UTF-8 encodes the whole frame again per connection.
+"after-text" and "after-binary" serialize once with orjson into a shared
+Frame and push it through the per-connection send queues; text clients
+still pay the server's per-socket encode, binary clients get the same bytes.
+
+The sockets are in-process fakes that do what the ASGI server does with the
+payload (encode str to UTF-8, pass bytes through), so no network is involved.
+
+Usage (from the backend directory):
+    python -m benchmarks.frame_encoding --models 10 --points 500 --ticks 5
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+
+from fastapi.websockets import WebSocketState
+
+from utils.frames import Frame, BINARY_ENCODING, TEXT_ENCODING
+from utils.send_queue import StreamSenders, KEEP_LATEST
+
+CONNECTION_COUNTS = (10, 100, 1000, 10000)
+
+
+class FakeWebSocket:
+    """Stands in for a connected socket, doing the ASGI server's payload work"""
+    client_state = WebSocketState.CONNECTED
+
+    def __init__(self, done: "DeliveryCounter"):
+        self.done = done
+        self.bytes_out = 0
+
+    async def send_text(self, message: str):
+        self.bytes_out += len(message.encode("utf-8"))
+        self.done.increment()
+
+    async def send_bytes(self, data: bytes):
+        self.bytes_out += len(data)
+        self.done.increment()
+
+
+class DeliveryCounter:
+    """Signals once every socket has received the current frame"""
+
+    def __init__(self):
+        self.expected = 0
+        self.count = 0
+        self.event = asyncio.Event()
+
+    def reset(self, expected: int):
+        self.expected = expected
+        self.count = 0
+        self.event.clear()
+
+    def increment(self):
+        self.count += 1
+        if self.count >= self.expected:
+            self.event.set()
+
+
+def build_modeldata_message(models: int, points: int) -> dict:
+    """A modeldata_update message shaped like the broadcaster's"""
+    start = datetime(2024, 1, 1)
+    data = {}
+    for model_id in range(1, models + 1):
+        data_points = [
+            {
+                "id": model_id * points + i,
+                "ai_model_id": model_id,
+                "code_name": f"model_{model_id}",
+                "display_name": f"Model {model_id}",
+                "account_value": 100000.0 + i * 1.25,
+                "return_value": i * 0.001,
+                "total_pnl": i * 1.25,
+                "fees": i * 0.05,
+                "trades": i,
+                "created_at": (start + timedelta(minutes=i)).isoformat()
+            }
+            for i in range(points)
+        ]
+        data[str(model_id)] = {
+            "ai_model_id": model_id,
+            "code_name": f"model_{model_id}",
+            "display_name": f"Model {model_id}",
+            "data_points": data_points,
+            "total_points": len(data_points),
+            "latest_timestamp": data_points[-1]["created_at"],
+            "first_timestamp": data_points[0]["created_at"]
+        }
+    return {
+        "type": "modeldata_update",
+        "timestamp": datetime.now().isoformat(),
+        "total_groups": len(data),
+        "data": data
+    }
+
+
+async def send_safe(websocket: FakeWebSocket, message: str):
+    """The per-socket send the broadcasters used to gather over"""
+    try:
+        await websocket.send_text(message)
+    except Exception as e:
+        print(f"Failed to send to client: {e}")
+
+
+async def run(mode: str, message: dict, connections: int, ticks: int) -> dict:
+    done = DeliveryCounter()
+    sockets = [FakeWebSocket(done) for _ in range(connections)]
+    senders = StreamSenders("benchmark", 32, KEEP_LATEST)
+    if mode != "before":
+        encoding = BINARY_ENCODING if mode == "after-binary" else TEXT_ENCODING
+        for ws in sockets:
+            senders.register(ws, encoding)
+
+    elapsed = []
+    for _ in range(ticks):
+        done.reset(connections)
+        started = time.perf_counter()
+        if mode == "before":
+            message_text = json.dumps(message, default=str)
+            await asyncio.gather(*[send_safe(ws, message_text) for ws in sockets], return_exceptions=True)
+        else:
+            frame = Frame.from_message(message)
+            for ws in sockets:
+                senders.send(ws, frame)
+            await done.event.wait()
+        elapsed.append(time.perf_counter() - started)
+
+    for ws in sockets:
+        senders.unregister(ws)
+
+    best = min(elapsed)
+    return {
+        "mode": mode,
+        "connections": connections,
+        "ms_per_broadcast": round(best * 1000, 2),
+        "us_per_connection": round(best * 1e6 / connections, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", type=int, default=10, help="AI models in the frame")
+    parser.add_argument("--points", type=int, default=500, help="Data points per model")
+    parser.add_argument("--ticks", type=int, default=5, help="Broadcasts per run; the best one is reported")
+    args = parser.parse_args()
+
+    message = build_modeldata_message(args.models, args.points)
+    print(f"Frame size: {len(Frame.from_message(message)) / 1024:.0f} KiB")
+    for connections in CONNECTION_COUNTS:
+        for mode in ("before", "after-text", "after-binary"):
+            print(asyncio.run(run(mode, message, connections, args.ticks)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Modeldata Layout Benchmark
+--------------------------
+Compares the rows layout of modeldata stream frames (one dict per data point)
+with the columnar layout (one header per model, delta-encoded times, flat
+metric arrays): frame size, raw and deflated, and the time to build the
+groups from the in-memory cache and serialize them.
+
+The series are synthetic and held in in-process ModelSeries objects, so no
+database is needed.
+
+Usage (from the backend directory):
+    python -m benchmarks.modeldata_layout --models 10 --rows-per-model 100000 --points 500
+"""
+
+import argparse
+import time
+import zlib
+
+import numpy as np
+
+from utils.columnar import LAYOUTS, COLUMNAR_LAYOUT
+from utils.downsampling import EVEN
+from utils.frames import encode_json, DEFLATE_LEVEL
+from utils.modeldata_cache import ModelSeries, ModelDataCache
+
+
+def build_series(models: int, rows: int) -> dict:
+    """Synthetic modeldata series, one row every 5 seconds"""
+    rng = np.random.default_rng(0)
+    start = np.datetime64("2025-01-01T09:15:00", "us")
+    series = {}
+    for ai_model_id in range(1, models + 1):
+        model_series = ModelSeries(ai_model_id, f"model_{ai_model_id}", f"Model {ai_model_id}")
+        account_value = 100000 + np.cumsum(rng.normal(0, 25, rows))
+        model_series.append(
+            np.arange(rows, dtype=np.int64) * models + ai_model_id,
+            start + np.arange(rows) * np.timedelta64(5, "s") + rng.integers(0, 1000, rows).astype("timedelta64[ms]"),
+            {
+                "account_value": account_value,
+                "return_value": (account_value - 100000) / 1000,
+                "total_pnl": account_value - 100000,
+                "fees": np.cumsum(rng.random(rows)),
+                "trades": np.arange(rows, dtype=np.float64) // 50
+            }
+        )
+        series[ai_model_id] = model_series
+    return series
+
+
+def measure(layout: str, points: int, runs: int) -> dict:
+    timings = []
+    for _ in range(runs):
+        # Start cold each run so the groups are rebuilt, not read from the cache
+        ModelDataCache.downsampled.clear()
+        started = time.perf_counter()
+        groups = ModelDataCache.downsample(EVEN, points, layout=layout)
+        data = encode_json({"type": "modeldata_update", "layout": layout, "data": groups})
+        timings.append(time.perf_counter() - started)
+    return {
+        "layout": layout,
+        "bytes": len(data),
+        "deflate_bytes": len(zlib.compress(data, DEFLATE_LEVEL)),
+        "best_ms": round(min(timings) * 1000, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", type=int, default=10, help="AI models")
+    parser.add_argument("--rows-per-model", type=int, default=100000, help="Cached rows per model")
+    parser.add_argument("--points", type=int, default=500, help="Points per model in the frame")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per layout; the best one is reported")
+    args = parser.parse_args()
+
+    ModelDataCache.series = build_series(args.models, args.rows_per_model)
+    results = {layout: measure(layout, args.points, args.runs) for layout in LAYOUTS}
+    for result in results.values():
+        print(result)
+    rows, columnar = results.values()
+    print(f"Size: {rows['bytes'] / columnar['bytes']:.1f}x smaller, "
+          f"build + serialize: {rows['best_ms'] / columnar['best_ms']:.1f}x faster with {COLUMNAR_LAYOUT}")
+
+
+if __name__ == "__main__":
+    main()
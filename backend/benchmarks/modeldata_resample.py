@@ -0,0 +1,164 @@
+"""
+Modeldata Resampling Benchmark
+------------------------------
+Compares the old per-model resampling (one window-function query per AI
+model) with the single partitioned query used by the modeldata stream.
+
+The benchmark creates its own schema in the DATABASE_URL database, fills it
+with synthetic ai_models/modeldata rows, checks that both approaches pick the
+same rows and drops the schema afterwards; the application's tables are not
+touched.
+
+Usage (from the backend directory):
+    python -m benchmarks.modeldata_resample --models 10 --rows-per-model 200000 --runs 3
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from config.database import DATABASE_URL
+from utils.modeldata_cache import MODELDATA_SAMPLE_POINTS, load_resampled_modeldata
+
+SCHEMA = "modeldata_resample_benchmark"
+
+# The per-model query the broadcaster ran before, once for every AI model
+PER_MODEL_QUERY = text("""
+    WITH ranked_data AS (
+        SELECT
+            id,
+            created_at,
+            ROW_NUMBER() OVER (ORDER BY created_at) as row_num,
+            COUNT(*) OVER () as total_rows
+        FROM modeldata
+        WHERE ai_model_id = :ai_model_id
+        ORDER BY created_at
+    ),
+    sampled_indices AS (
+        SELECT
+            CASE
+                WHEN total_rows <= 500 THEN row_num
+                WHEN row_num = 1 THEN 1
+                WHEN row_num = total_rows THEN total_rows
+                ELSE CAST(1 + ROUND((row_num - 1) * (total_rows - 1) / 499.0) AS INTEGER)
+            END as sample_index
+        FROM ranked_data
+        WHERE total_rows > 0
+    ),
+    final_sample AS (
+        SELECT DISTINCT sample_index
+        FROM sampled_indices
+        ORDER BY sample_index
+        LIMIT 500
+    )
+    SELECT rd.id
+    FROM ranked_data rd
+    INNER JOIN final_sample fs ON rd.row_num = fs.sample_index
+    ORDER BY rd.created_at
+""")
+
+
+async def seed(engine, models: int, rows_per_model: int):
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        await conn.execute(text("""
+            CREATE TABLE ai_models (
+                id SERIAL PRIMARY KEY,
+                code_name VARCHAR(255) NOT NULL,
+                display_name VARCHAR(255) NOT NULL
+            )
+        """))
+        await conn.execute(text("""
+            CREATE TABLE modeldata (
+                id SERIAL PRIMARY KEY,
+                ai_model_id INTEGER NOT NULL REFERENCES ai_models(id),
+                code_name VARCHAR(255) NOT NULL,
+                display_name VARCHAR(255) NOT NULL,
+                account_value DOUBLE PRECISION,
+                return_value DOUBLE PRECISION,
+                total_pnl DOUBLE PRECISION,
+                fees DOUBLE PRECISION,
+                trades INTEGER,
+                created_at TIMESTAMP NOT NULL,
+                updated_at TIMESTAMP NOT NULL
+            )
+        """))
+        await conn.execute(text("""
+            INSERT INTO ai_models (code_name, display_name)
+            SELECT 'model_' || m, 'Model ' || m FROM generate_series(1, :models) AS m
+        """), {"models": models})
+        await conn.execute(text("""
+            INSERT INTO modeldata (ai_model_id, code_name, display_name, account_value, return_value,
+                                   total_pnl, fees, trades, created_at, updated_at)
+            SELECT m, 'model_' || m, 'Model ' || m, 100000 + random() * 1000, random(),
+                   random() * 1000, random(), i, TIMESTAMP '2024-01-01' + i * INTERVAL '1 minute',
+                   TIMESTAMP '2024-01-01' + i * INTERVAL '1 minute'
+            FROM generate_series(1, :models) AS m, generate_series(1, :rows) AS i
+        """), {"models": models, "rows": rows_per_model})
+        await conn.execute(text("CREATE INDEX ON modeldata (ai_model_id)"))
+        await conn.execute(text("CREATE INDEX ix_modeldata_ai_model_id_created_at ON modeldata (ai_model_id, created_at)"))
+        await conn.execute(text("ANALYZE modeldata"))
+
+
+async def per_model(conn) -> dict:
+    models = (await conn.execute(text("SELECT id FROM ai_models ORDER BY id"))).fetchall()
+    sampled = {}
+    for (ai_model_id,) in models:
+        rows = (await conn.execute(PER_MODEL_QUERY, {"ai_model_id": ai_model_id})).fetchall()
+        if rows:
+            sampled[str(ai_model_id)] = [row[0] for row in rows]
+    return sampled
+
+
+async def single_query(conn) -> dict:
+    groups = await load_resampled_modeldata(conn)
+    return {key: [point["id"] for point in group["data_points"]] for key, group in groups.items()}
+
+
+async def run(models: int, rows_per_model: int, runs: int):
+    engine = create_async_engine(DATABASE_URL, connect_args={"server_settings": {"search_path": SCHEMA}})
+    try:
+        started = time.perf_counter()
+        await seed(engine, models, rows_per_model)
+        print(f"Seeded {models * rows_per_model:,} modeldata rows in {time.perf_counter() - started:.1f}s")
+
+        results = {}
+        async with engine.connect() as conn:
+            for name, resample in (("before (per-model queries)", per_model), ("after (single query)", single_query)):
+                timings = []
+                for _ in range(runs):
+                    started = time.perf_counter()
+                    results[name] = await resample(conn)
+                    timings.append(time.perf_counter() - started)
+                print({
+                    "mode": name,
+                    "round_trips": models + 1 if name.startswith("before") else 1,
+                    "best_ms": round(min(timings) * 1000, 1),
+                    "mean_ms": round(sum(timings) / len(timings) * 1000, 1),
+                    "points": sum(len(ids) for ids in results[name].values())
+                })
+
+        before, after = results.values()
+        print("Same sampled rows:", before == after)
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", type=int, default=10, help="AI models to create")
+    parser.add_argument("--rows-per-model", type=int, default=200000, help="modeldata rows per model")
+    parser.add_argument("--runs", type=int, default=3, help="Timed runs per approach")
+    args = parser.parse_args()
+    print(f"Sampling {MODELDATA_SAMPLE_POINTS} points per model")
+    asyncio.run(run(args.models, args.rows_per_model, args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Redis Event-Loop Lag Benchmark
+------------------------------
+Measures how much Redis calls made from async code delay the event loop.
+
+"before" calls DirectRedis directly from coroutines, the way the API did;
+"after" goes through the pooled RedisClient. While the load runs, a probe
+coroutine sleeps in short intervals and records how late it wakes up.
+
+Usage (from the backend directory, with Redis running at REDIS_URL):
+    python -m benchmarks.redis_event_loop_lag --symbols 2000 --workers 50 --seconds 5
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from direct_redis import DirectRedis
+from redis import ConnectionPool
+
+from config.redis import REDIS_URL, RedisClient
+
+HASH_NAME = "benchmark_ltp_data"
+PROBE_INTERVAL = 0.005  # seconds
+
+
+def seed_hash(client: DirectRedis, symbols: int):
+    """Fill the benchmark hash with ltp_data-like entries"""
+    client.delete(HASH_NAME)
+    for i in range(symbols):
+        client.hset(HASH_NAME, f"SYM{i}", {
+            "last_price": 1000.0 + i,
+            "change": 0.5,
+            "last_trade_time": "2024-01-01 10:00:00",
+            "exchange_timestamp": "2024-01-01 10:00:00"
+        })
+
+
+async def probe_lag(stop: asyncio.Event, samples: list):
+    """Record how late the event loop wakes a sleeping coroutine"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        samples.append(max(0.0, loop.time() - expected) * 1000)
+
+
+async def run(mode: str, workers: int, seconds: float) -> dict:
+    sync_client = DirectRedis(connection_pool=ConnectionPool.from_url(REDIS_URL))
+    calls = 0
+
+    async def worker(stop: asyncio.Event):
+        nonlocal calls
+        while not stop.is_set():
+            if mode == "before":
+                sync_client.hgetall(HASH_NAME)
+                # Yield like an await would, otherwise the loop never runs the probe
+                await asyncio.sleep(0)
+            else:
+                await RedisClient.hgetall(HASH_NAME)
+            calls += 1
+
+    stop = asyncio.Event()
+    samples = []
+    tasks = [asyncio.create_task(probe_lag(stop, samples))]
+    tasks += [asyncio.create_task(worker(stop)) for _ in range(workers)]
+    await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(*tasks)
+
+    samples.sort()
+    return {
+        "mode": mode,
+        "calls_per_second": round(calls / seconds, 1),
+        "lag_p50_ms": round(statistics.median(samples), 2) if samples else None,
+        "lag_p99_ms": round(samples[int(len(samples) * 0.99) - 1], 2) if samples else None,
+        "lag_max_ms": round(samples[-1], 2) if samples else None,
+        "probe_wakeups": len(samples)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=2000, help="Entries in the benchmark hash")
+    parser.add_argument("--workers", type=int, default=50, help="Concurrent coroutines calling hgetall")
+    parser.add_argument("--seconds", type=float, default=5, help="Duration of each run")
+    args = parser.parse_args()
+
+    seed_client = DirectRedis(connection_pool=ConnectionPool.from_url(REDIS_URL))
+    seed_hash(seed_client, args.symbols)
+
+    RedisClient.connect()
+    try:
+        for mode in ("before", "after"):
+            print(asyncio.run(run(mode, args.workers, args.seconds)))
+    finally:
+        RedisClient.close()
+        seed_client.delete(HASH_NAME)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
 from .database import Database, get_db_session
+from .redis import RedisClient
 
-__all__ = ["Database", "get_db_session"]
+__all__ = ["Database", "get_db_session", "RedisClient"]
@@ -0,0 +1,143 @@
+"""
+Redis Connection Manager
+------------------------
+Shared, pooled Redis access for async code.
+
+direct_redis pins redis==3.4.1, which has no asyncio client, so commands are
+run on a dedicated thread pool sized to the connection pool. Callers await
+them like any other coroutine and the event loop never blocks on a Redis
+socket, while values keep DirectRedis's encoding (plain str, pickle otherwise).
+"""
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from direct_redis import DirectRedis
+from dotenv import load_dotenv
+from redis import BlockingConnectionPool
+
+load_dotenv()
+
+# Redis connection settings
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_MAX_WORKERS = int(os.getenv("REDIS_MAX_WORKERS", "16"))
+# Pub/sub subscriptions each hold a connection on top of the command workers
+REDIS_MAX_SUBSCRIPTIONS = 8
+
+
+class RedisSubscription:
+    """
+    Pub/sub subscription to one channel.
+
+    A background thread reads the channel and hands messages to the event loop;
+    `get()` returns None once the subscription has ended (connection lost or
+    closed) so the consumer can decide to resubscribe.
+    """
+
+    def __init__(self, client: DirectRedis, channel: str, loop: asyncio.AbstractEventLoop):
+        self.channel = channel
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._client = client
+        self._loop = loop
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"redis-sub-{channel}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(self.channel)
+            while not self._stop.is_set():
+                message = pubsub.get_message(timeout=1.0)
+                if message and message.get("type") == "message":
+                    self._loop.call_soon_threadsafe(self.queue.put_nowait, message["data"])
+        except Exception as e:
+            print(f"Redis subscription error on {self.channel}: {e}")
+        finally:
+            pubsub.close()
+            if not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+    async def get(self) -> Optional[bytes]:
+        """Wait for the next message payload, or None if the subscription ended"""
+        return await self.queue.get()
+
+    def close(self):
+        """Stop the subscription; the reader thread exits within a second"""
+        self._stop.set()
+
+
+class RedisClient:
+    """Async Redis Connection Manager"""
+    pool = None
+    client = None
+    executor = None
+
+    @classmethod
+    def connect(cls):
+        """Create the connection pool and the command thread pool"""
+        if cls.client is not None:
+            return
+        cls.pool = BlockingConnectionPool.from_url(
+            REDIS_URL,
+            max_connections=REDIS_MAX_WORKERS + REDIS_MAX_SUBSCRIPTIONS
+        )
+        cls.client = DirectRedis(connection_pool=cls.pool)
+        cls.executor = ThreadPoolExecutor(max_workers=REDIS_MAX_WORKERS, thread_name_prefix="redis")
+        print("Redis connection pool created")
+
+    @classmethod
+    def close(cls):
+        """Shut down the thread pool and close pooled connections"""
+        if cls.executor:
+            cls.executor.shutdown(wait=False)
+        if cls.pool:
+            cls.pool.disconnect()
+            print("Redis connection pool closed")
+        cls.pool = None
+        cls.client = None
+        cls.executor = None
+
+    @classmethod
+    async def execute(cls, command: str, *args, **kwargs):
+        """Run a DirectRedis command without blocking the event loop"""
+        if cls.client is None:
+            cls.connect()
+        loop = asyncio.get_running_loop()
+        call = functools.partial(getattr(cls.client, command), *args, **kwargs)
+        return await loop.run_in_executor(cls.executor, call)
+
+    @classmethod
+    async def get(cls, name: str):
+        return await cls.execute("get", name)
+
+    @classmethod
+    async def hget(cls, name: str, key: str):
+        return await cls.execute("hget", name, key)
+
+    @classmethod
+    async def hmget(cls, name: str, keys: list) -> list:
+        return await cls.execute("hmget", name, *keys)
+
+    @classmethod
+    async def hgetall(cls, name: str) -> dict:
+        return await cls.execute("hgetall", name)
+
+    @classmethod
+    async def hkeys(cls, name: str) -> list:
+        return await cls.execute("hkeys", name)
+
+    @classmethod
+    async def publish(cls, channel: str, message: str) -> int:
+        return await cls.execute("publish", channel, message)
+
+    @classmethod
+    def subscribe(cls, channel: str) -> RedisSubscription:
+        """Subscribe to a pub/sub channel from the running event loop"""
+        if cls.client is None:
+            cls.connect()
+        return RedisSubscription(cls.client, channel, asyncio.get_running_loop())
@@ -8,6 +8,12 @@ import os
 from dotenv import load_dotenv
 from routers import router
 from config.database import Database
+from config.redis import RedisClient
+from utils.notifications import ChangeListener
+from utils.modeldata_cache import ModelDataCache
+from utils.modeldata_rollups import ensure_rollup_table
+from utils.model_identity import ModelIdentityCache
+from utils.trade_queue import TradeQueue
 
 # Load environment variables
 load_dotenv()
@@ -69,13 +75,24 @@ app.include_router(router.router)
 async def startup_db_client():
     """Connect to PostgreSQL on startup"""
     await Database.connect_db()
+    RedisClient.connect()
+    # create_model_data writes rollups in its transaction, so the table must exist
+    await ensure_rollup_table()
+    await ModelDataCache.load()
+    await ModelIdentityCache.load()
+    await TradeQueue.start()
     # Create tables on startup (comment out if using Alembic)
     # await Database.create_tables()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     """Close PostgreSQL connection on shutdown"""
+    await ModelDataCache.close()
+    await ModelIdentityCache.close()
+    await TradeQueue.close()
+    await ChangeListener.close()
     await Database.close_db()
+    RedisClient.close()
 
 # Protected documentation endpoints
 @app.get("/openapi.json", include_in_schema=False)
@@ -1,5 +1,5 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
+from typing import List, Optional, Tuple
 from datetime import datetime, time as dt_time
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
@@ -9,7 +9,6 @@ import time
 import json
 import requests
 from pydantic import BaseModel
-from direct_redis import DirectRedis
 import pytz
 import os
 from dotenv import load_dotenv
@@ -21,12 +20,39 @@ load_dotenv()
 from tables.ai_model import AIModel, AIModelResponse, AIModelCreate, AIModelUpdate
 from tables.positions import Position, PositionResponse, PositionUpdate, PositionCreateSimple, PositionBulkUpdate, PositionBulkUpdateResponse
 from tables.modelchat import ModelChat, ModelChatResponse, ModelChatCreate, ModelChatCreateSimple
-from tables.trades import Trade, TradeResponse, TradeCreate, TradeCreateSimple
+from tables.trades import (
+    Trade, TradeResponse, TradeCreate, TradeCreateSimple, TradeTicketResponse, RebalanceRequest, RebalanceResponse
+)
 from tables.modeldata import ModelData, ModelDataResponse, ModelDataCreate, ModelDataUpdate, ModelDataCreateSimple
+from tables.modeldata_rollup import ModelDataRollupResponse
 from config.database import get_db_session
-
-# Initialize Redis client for LTP data
-redis_client = DirectRedis()
+from config.redis import RedisClient
+from utils.notifications import notify_change, MODELDATA_CHANNEL
+from utils.modeldata_cache import (
+    get_downsampled_modeldata,
+    MODELDATA_SAMPLE_POINTS,
+    MODELDATA_MIN_POINTS,
+    MODELDATA_MAX_POINTS,
+    MODELDATA_MIN_WINDOW
+)
+from utils.downsampling import EVEN, ALGORITHM_PATTERN
+from utils.columnar import ROWS_LAYOUT, LAYOUT_PATTERN
+from utils.frames import encode_json
+from utils.time_utils import get_ist_now, to_naive_ist
+from utils.modeldata_rollups import update_rollups, choose_resolution, load_rollups, RESOLUTIONS
+from utils.position_updates import update_positions_in_bulk
+from utils.trade_execution import execute_trade, execution_error, market_closed_reason, price_from_ltp, CASH_ASSET
+from utils.trade_queue import TradeQueue, TRADE_QUEUE_ENABLED, get_ticket
+from utils.rebalance import lock_positions, assets_to_price, invalid_prices, plan_rebalance, apply_rebalance, CASH_TOLERANCE
+from utils.model_identity import ModelIdentity, ModelIdentityCache
+from utils.modeldata_history import (
+    load_modeldata_history,
+    LAST,
+    AGGREGATE_PATTERN,
+    HISTORY_METRICS,
+    HISTORY_DEFAULT_POINTS,
+    HISTORY_MAX_POINTS
+)
 
 router = APIRouter(prefix="/models", tags=["models"])
 
@@ -358,9 +384,7 @@ async def create_model_chat(
     """
     try:
         # Find AI model with exact matching code_name
-        ai_model_query = select(AIModel).where(AIModel.code_name == model_chat_data.code_name)
-        ai_model_result = await db.execute(ai_model_query)
-        ai_model = ai_model_result.scalar_one_or_none()
+        ai_model = await ModelIdentityCache.get(model_chat_data.code_name)
         
         if not ai_model:
             raise HTTPException(
@@ -383,6 +407,7 @@ async def create_model_chat(
         
         # Add to database
         db.add(new_model_chat)
+        await notify_change(db, "modelchat")
         await db.commit()
         await db.refresh(new_model_chat)
         
@@ -399,6 +424,67 @@ async def create_model_chat(
         )
 
 
+async def price_trade(trade_data: TradeCreateSimple) -> Tuple[ModelIdentity, float, float]:
+    """
+    Validate a trade request and price it, for create_trade and queue_trade.
+    
+    Returns:
+        (the AI model, price, notional_value)
+    
+    Raises:
+        HTTPException: Outside market hours, for an unknown code_name or without LTP data
+    """
+    # Check market hours for assets other than BTCUSD
+    closed_reason = market_closed_reason(trade_data.asset)
+    if closed_reason:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=closed_reason
+        )
+    
+    # Unknown code_names are refused before the Redis lookup
+    ai_model = await ModelIdentityCache.get(trade_data.code_name)
+    if ai_model is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No AI model found with code_name '{trade_data.code_name}'. Please ensure the code_name matches an existing AI model."
+        )
+    
+    # Get LTP data from Redis if price or notional_value is not provided
+    ltp = trade_data.price
+    if ltp is None or trade_data.notional_value is None:
+        try:
+            # Only the traded asset's entry is needed, not the whole hash
+            asset_ltp = await RedisClient.hget('ltp_data', trade_data.asset)
+            
+            if asset_ltp is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"LTP data not found for asset '{trade_data.asset}' in Redis. Please ensure the asset is being tracked."
+                )
+            
+            # Calculate LTP based on asset type
+            ltp = price_from_ltp(trade_data.asset, asset_ltp)
+
+            print(f"Fetched LTP for {trade_data.asset}: {ltp}")
+                
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error fetching LTP data from Redis: {str(e)}"
+            )
+    
+    # Calculate notional value if not provided
+    notional_value = trade_data.notional_value
+    if notional_value is None:
+        notional_value = ltp * trade_data.quantity
+    
+    # Use provided price if available, otherwise use calculated LTP
+    price = trade_data.price if trade_data.price is not None else ltp
+    
+    return ai_model, price, notional_value
+
+
 @router.post("/create_trade", response_model=TradeResponse, status_code=status.HTTP_201_CREATED)
 async def create_trade(
     trade_data: TradeCreateSimple,
@@ -433,174 +519,242 @@ async def create_trade(
     - Updates the CASH position for the code_name:
       * BUY trades: Decreases CASH by notional_value (spending cash)
       * SELL trades: Increases CASH by notional_value (receiving cash)
+    - The trade, both position changes and the cash check run as one atomic
+      statement, so concurrent BUY trades for a model cannot overspend its cash
     """
     try:
-        # Check market hours for assets other than BTCUSD
-        if trade_data.asset != "BTCUSD":
-            # Get current time in IST (Indian Standard Time)
-            ist_tz = pytz.timezone('Asia/Kolkata')
-            current_time = datetime.now(ist_tz)
-            
-            # Check if it's a weekday (Monday=0, Sunday=6)
-            if current_time.weekday() >= 5:  # Saturday or Sunday
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Trading for {trade_data.asset} is not allowed on weekends. Market is open Monday-Friday, 9:15 AM - 3:30 PM IST."
-                )
-            
-            # Check if current time is within market hours (9:15 AM - 3:30 PM)
-            market_open = dt_time(9, 15)  # 9:15 AM
-            market_close = dt_time(15, 30)  # 3:30 PM
-            current_time_only = current_time.time()
-            
-            if not (market_open <= current_time_only <= market_close):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Trading for {trade_data.asset} is not allowed outside market hours. Market is open Monday-Friday, 9:15 AM - 3:30 PM IST. Current time: {current_time.strftime('%A, %I:%M %p IST')}"
-                )
+        ai_model, price, notional_value = await price_trade(trade_data)
+        
+        # Cash check, position changes and trade insert in one statement
+        execution = await execute_trade(
+            db,
+            ai_model,
+            trade_data.asset,
+            trade_data.side.value,
+            trade_data.quantity,
+            price,
+            notional_value
+        )
         
-        # Find AI model with exact matching code_name
-        ai_model_query = select(AIModel).where(AIModel.code_name == trade_data.code_name)
-        ai_model_result = await db.execute(ai_model_query)
-        ai_model = ai_model_result.scalar_one_or_none()
+        error = execution_error(execution, trade_data.code_name, notional_value)
+        if error:
+            raise HTTPException(status_code=error[0], detail=error[1])
         
-        if not ai_model:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"No AI model found with code_name '{trade_data.code_name}'. Please ensure the code_name matches an existing AI model."
-            )
+        await db.commit()
         
-        # Use the AI model's display_name and id
-        ai_model_id = ai_model.id
-        display_name = ai_model.display_name
+        return execution["trade"]
         
-        # Get LTP data from Redis if price or notional_value is not provided
-        ltp = trade_data.price
-        if ltp is None or trade_data.notional_value is None:
-            try:
-                ltp_data = redis_client.hgetall('ltp_data')
-                
-                if trade_data.asset not in ltp_data:
-                    raise HTTPException(
-                        status_code=status.HTTP_404_NOT_FOUND,
-                        detail=f"LTP data not found for asset '{trade_data.asset}' in Redis. Please ensure the asset is being tracked."
-                    )
-                
-                # Calculate LTP based on asset type
-                if trade_data.asset == 'BTCUSD':
-                    # Special calculation for BTCUSD
-                    ltp = (((ltp_data[trade_data.asset]['last_price']) * 0.001) / 10)
-                else:
-                    ltp = ltp_data[trade_data.asset]['last_price']
+    except HTTPException:
+        # Re-raise HTTP exceptions
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error creating trade: {str(e)}"
+        )
 
-                print(f"Fetched LTP for {trade_data.asset}: {ltp}")
-                    
-            except Exception as e:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Error fetching LTP data from Redis: {str(e)}"
-                )
-        
-        # Calculate notional value if not provided
-        notional_value = trade_data.notional_value
-        if notional_value is None:
-            notional_value = ltp * trade_data.quantity
-        
-        # Use provided price if available, otherwise use calculated LTP
-        price = trade_data.price if trade_data.price is not None else ltp
-        
-        # Create new Trade instance with mapped and calculated fields
-        new_trade = Trade(
-            display_name=display_name,
-            code_name=trade_data.code_name,
-            ai_model_id=ai_model_id,
-            asset=trade_data.asset,
-            side=trade_data.side,
-            quantity=trade_data.quantity,
-            price=price,
-            notional_value=notional_value
+
+@router.post("/queue_trade", response_model=TradeTicketResponse, status_code=status.HTTP_202_ACCEPTED)
+async def queue_trade(trade_data: TradeCreateSimple):
+    """
+    Accept a trade for asynchronous execution (requires TRADE_QUEUE_ENABLED).
+    
+    Takes the same fields as create_trade and applies the same market hours,
+    code_name and LTP checks, then appends the priced trade to the trade queue
+    and returns its ticket without waiting for the database. Trades of one
+    code_name are executed in the order they were accepted; trades of
+    different models are executed in parallel.
+    
+    The outcome is reported by:
+    - GET /models/trade_ticket/{ticket_id}
+    - a trade_ticket message on the /ws/trade-tickets WebSocket
+    
+    A ticket ends up executed (with the trade), rejected (with the error and
+    status code create_trade would have returned, e.g. insufficient cash) or
+    failed (e.g. a database error). Tickets expire after TRADE_TICKET_TTL seconds.
+    """
+    if not TRADE_QUEUE_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The trade queue is disabled. Use /models/create_trade or set TRADE_QUEUE_ENABLED."
         )
+    
+    ai_model, price, notional_value = await price_trade(trade_data)
+    
+    try:
+        return await TradeQueue.enqueue(
+            ai_model,
+            trade_data.asset,
+            trade_data.side.value,
+            trade_data.quantity,
+            price,
+            notional_value
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error queueing trade: {str(e)}"
+        )
+
+
+@router.get("/trade_ticket/{ticket_id}", response_model=TradeTicketResponse)
+async def get_trade_ticket(ticket_id: str):
+    """
+    Get the status of a trade queued with POST /models/queue_trade.
+    
+    Path Parameters:
+    - ticket_id: The ticket_id queue_trade returned
+    """
+    try:
+        ticket = await get_ticket(ticket_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching trade ticket: {str(e)}"
+        )
+    if ticket is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Trade ticket {ticket_id} not found or expired"
+        )
+    return ticket
+
+
+@router.post("/rebalance", response_model=RebalanceResponse, status_code=status.HTTP_200_OK)
+async def rebalance(
+    rebalance_data: RebalanceRequest,
+    db: AsyncSession = Depends(get_db_session)
+):
+    """
+    Move an AI model's portfolio to target weights with one batch of trades.
+    
+    Required fields:
+    - code_name: AI model code name (must match an existing AI model)
+    - targets: Target percentage (0-100) of the portfolio value per asset,
+      e.g. {"RELIANCE": 40, "BTCUSD": 25}; the rest stays in CASH
+    
+    Optional fields:
+    - min_trade_value: Trades with a smaller notional value are skipped (default 0)
+    
+    Behaviour:
+    - The portfolio value is CASH plus every asset at its LTP from Redis 'ltp_data',
+      read once for all assets (BTCUSD is priced as in create_trade)
+    - Assets the model holds but does not list are sold
+    - A missing position is created for an asset that is bought
+    - Every trade is subject to the market hours check of create_trade
+    - The whole basket is checked against the cash balance, then all trades and
+      position changes are applied in one transaction; the model's positions are
+      locked meanwhile, so concurrent trades wait for it instead of interleaving
+    
+    Response:
+    - portfolio_value, cash_before, cash_after
+    - trades: The executed trades, sells first (empty if already on target)
+    - positions: The positions as written
+    """
+    try:
+        targets = rebalance_data.targets
+        if CASH_ASSET in targets:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{CASH_ASSET} cannot be a target; it holds whatever the other targets leave over."
+            )
+        invalid = [asset for asset, weight in targets.items() if not 0 <= weight <= 100]
+        if invalid:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Target weights must be between 0 and 100: {', '.join(invalid)}"
+            )
+        if sum(targets.values()) > 100:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Target weights add up to {sum(targets.values()):.2f}, more than 100."
+            )
         
-        # Add to database
-        db.add(new_trade)
+        ai_model = await ModelIdentityCache.get(rebalance_data.code_name)
+        if not ai_model:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No AI model found with code_name '{rebalance_data.code_name}'. Please ensure the code_name matches an existing AI model."
+            )
         
-        # Update position table based on trade side
-        position_query = select(Position).where(
-            Position.code_name == trade_data.code_name,
-            Position.asset == trade_data.asset
-        )
-        position_result = await db.execute(position_query)
-        existing_position = position_result.scalar_one_or_none()
+        # Locked until the commit or rollback
+        positions = await lock_positions(db, rebalance_data.code_name)
+        if not any(position["asset"] == CASH_ASSET for position in positions):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No CASH position found for code_name '{rebalance_data.code_name}'. Cannot rebalance without cash balance."
+            )
         
-        if existing_position:
-            # Update existing position quantity
-            if trade_data.side == "BUY":
-                # Increase quantity for BUY trades
-                if existing_position.quantity is not None:
-                    existing_position.quantity += trade_data.quantity
-                else:
-                    existing_position.quantity = trade_data.quantity
-            elif trade_data.side == "SELL":
-                # Decrease quantity for SELL trades
-                if existing_position.quantity is not None:
-                    existing_position.quantity -= trade_data.quantity
-                else:
-                    existing_position.quantity = -trade_data.quantity
-            
-            # Update last_price with the trade price
-            existing_position.last_price = price
+        # One LTP snapshot for every asset involved
+        assets = assets_to_price(positions, targets)
+        try:
+            ltp_entries = await RedisClient.hmget('ltp_data', assets) if assets else []
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error fetching LTP data from Redis: {str(e)}"
+            )
+        missing = [asset for asset, asset_ltp in zip(assets, ltp_entries) if asset_ltp is None]
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"LTP data not found for assets {', '.join(missing)} in Redis. Please ensure the assets are being tracked."
+            )
+        prices = {asset: price_from_ltp(asset, asset_ltp) for asset, asset_ltp in zip(assets, ltp_entries)}
+        invalid = invalid_prices(prices)
+        if invalid:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid LTP for assets {', '.join(invalid)} in Redis. Prices must be positive and finite."
+            )
         
-        # Update CASH position for the code_name
-        cash_position_query = select(Position).where(
-            Position.code_name == trade_data.code_name,
-            Position.asset == "CASH"
-        )
-        cash_position_result = await db.execute(cash_position_query)
-        cash_position = cash_position_result.scalar_one_or_none()
-        
-        if cash_position:
-            # Check cash balance before executing BUY trade
-            if trade_data.side == "BUY":
-                # Calculate after-trade cash
-                current_cash = cash_position.quantity if cash_position.quantity is not None else 0
-                after_trade_cash = current_cash - notional_value
-                
-                # Raise error if cash would go negative
-                if after_trade_cash < 0:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Insufficient cash balance. Current cash: {current_cash:.2f}, Required: {notional_value:.2f}, Shortfall: {abs(after_trade_cash):.2f}"
-                    )
-                
-                # Decrease CASH for BUY trades (spending cash)
-                cash_position.quantity = after_trade_cash
-            elif trade_data.side == "SELL":
-                # Increase CASH for SELL trades (receiving cash)
-                if cash_position.quantity is not None:
-                    cash_position.quantity += notional_value
-                else:
-                    cash_position.quantity = notional_value
-        else:
-            # If no CASH position exists and this is a BUY trade, reject it
-            if trade_data.side == "BUY":
+        plan = plan_rebalance(positions, targets, prices, rebalance_data.min_trade_value)
+        if plan["portfolio_value"] <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot rebalance a portfolio valued at {plan['portfolio_value']:.2f}."
+            )
+        
+        for trade in plan["trades"]:
+            closed_reason = market_closed_reason(trade["asset"])
+            if closed_reason:
                 raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"No CASH position found for code_name '{trade_data.code_name}'. Cannot execute BUY trade without cash balance."
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=closed_reason
                 )
         
+        # Cash check across the whole basket
+        if plan["cash_after"] < -CASH_TOLERANCE:
+            buys = sum(trade["notional_value"] for trade in plan["trades"] if trade["side"] == "BUY")
+            sells = sum(trade["notional_value"] for trade in plan["trades"] if trade["side"] == "SELL")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Insufficient cash balance for the basket. Current cash: {plan['cash_before']:.2f}, Buys: {buys:.2f}, Sells: {sells:.2f}, Shortfall: {abs(plan['cash_after']):.2f}"
+            )
+        
+        # Positions, trades and the change notification in one statement
+        applied = await apply_rebalance(db, ai_model, plan)
         await db.commit()
-        await db.refresh(new_trade)
         
-        return new_trade
+        return RebalanceResponse(
+            code_name=rebalance_data.code_name,
+            portfolio_value=plan["portfolio_value"],
+            cash_before=plan["cash_before"],
+            cash_after=plan["cash_after"] if applied else plan["cash_before"],
+            trades=applied["trades"] if applied else [],
+            positions=applied["positions"] if applied else []
+        )
         
     except HTTPException:
-        # Re-raise HTTP exceptions
+        # Release the position locks
+        await db.rollback()
         raise
     except Exception as e:
         await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error creating trade: {str(e)}"
+            detail=f"Error rebalancing portfolio: {str(e)}"
         )
 
 
@@ -643,9 +797,7 @@ async def update_position(
         
         # If ai_model_id is being updated, verify it exists
         if position_data.ai_model_id is not None:
-            ai_model_query = select(AIModel).where(AIModel.id == position_data.ai_model_id)
-            ai_model_result = await db.execute(ai_model_query)
-            ai_model = ai_model_result.scalar_one_or_none()
+            ai_model = await ModelIdentityCache.get_by_id(position_data.ai_model_id)
             
             if not ai_model:
                 raise HTTPException(
@@ -661,6 +813,7 @@ async def update_position(
                 setattr(existing_position, field, value)
         
         # Commit the changes
+        await notify_change(db, "positions")
         await db.commit()
         await db.refresh(existing_position)
         
@@ -702,9 +855,7 @@ async def create_model_data(
     """
     try:
         # Find AI model with exact matching code_name
-        ai_model_query = select(AIModel).where(AIModel.code_name == model_data.chat_name)
-        ai_model_result = await db.execute(ai_model_query)
-        ai_model = ai_model_result.scalar_one_or_none()
+        ai_model = await ModelIdentityCache.get(model_data.chat_name)
         
         if not ai_model:
             raise HTTPException(
@@ -730,6 +881,11 @@ async def create_model_data(
         
         # Add to database
         db.add(new_model_data)
+        await db.flush()
+        # Fold the row into the 1m/15m/1h/1d rollups in the same transaction
+        await update_rollups(db, new_model_data.id)
+        # Every worker's modeldata cache appends the row once this commits
+        await notify_change(db, "modeldata", channel=MODELDATA_CHANNEL)
         await db.commit()
         await db.refresh(new_model_data)
         
@@ -746,6 +902,140 @@ async def create_model_data(
         )
 
 
+@router.get("/get_downsampled_model_data", status_code=status.HTTP_200_OK)
+async def get_downsampled_model_data(
+    ai_model_ids: Optional[List[int]] = Query(None, description="Only these AI models (default: all)"),
+    algorithm: str = Query(
+        EVEN,
+        pattern=ALGORITHM_PATTERN,
+        description="Downsampling: 'even' spacing, 'lttb' (Largest-Triangle-Three-Buckets) or 'minmax' per bucket"
+    ),
+    points: int = Query(MODELDATA_SAMPLE_POINTS, ge=MODELDATA_MIN_POINTS, le=MODELDATA_MAX_POINTS, description="Points per model"),
+    window: Optional[int] = Query(
+        None,
+        ge=MODELDATA_MIN_WINDOW,
+        description="Only the last `window` seconds of each model's history (default: all of it)"
+    ),
+    layout: str = Query(
+        ROWS_LAYOUT,
+        pattern=LAYOUT_PATTERN,
+        description="'columnar' returns each model's header once with delta-encoded times and flat metric arrays"
+    )
+):
+    """
+    Get downsampled model data per AI model, the REST equivalent of /ws/modeldata-stream.
+    
+    - algorithm: 'even' keeps evenly spaced points, 'lttb' keeps the points that
+      shape the account_value line, 'minmax' keeps each bucket's lowest and highest point
+    - points: Points per model
+    - window: Seconds of history counted back from each model's latest point
+    - layout: 'rows' (one dict per point) or 'columnar'
+    
+    Results come from the in-memory modeldata cache and are reused until a
+    model gets new data.
+    """
+    try:
+        used_algorithm, modeldata_groups = await get_downsampled_modeldata(algorithm, points, window, ai_model_ids, layout)
+        # Serialized with the frame encoder, which writes columnar NumPy arrays directly
+        return Response(content=encode_json({
+            "algorithm": used_algorithm,
+            "points": points,
+            "window": window,
+            "layout": layout,
+            "total_groups": len(modeldata_groups),
+            "data": modeldata_groups
+        }), media_type="application/json")
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching downsampled model data: {str(e)}"
+        )
+
+
+@router.get("/get_model_data_rollups", response_model=List[ModelDataRollupResponse], status_code=status.HTTP_200_OK)
+async def get_model_data_rollups(
+    start: datetime = Query(..., description="Start of the time range (IST)"),
+    end: Optional[datetime] = Query(None, description="End of the time range (IST, default: now)"),
+    ai_model_ids: Optional[List[int]] = Query(None, description="Only these AI models (default: all)"),
+    points: int = Query(MODELDATA_SAMPLE_POINTS, ge=1, le=MODELDATA_MAX_POINTS, description="Minimum buckets per model"),
+    db: AsyncSession = Depends(get_db_session)
+):
+    """
+    Get open/high/low/close modeldata buckets per AI model.
+    
+    The coarsest rollup resolution (1 day, 1 hour, 15 minutes, 1 minute) that
+    still gives at least `points` buckets over the range is used; ranges too
+    short for that get 1-minute buckets.
+    """
+    try:
+        start = to_naive_ist(start)
+        end = to_naive_ist(end) if end else get_ist_now()
+        if end <= start:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="end must be after start"
+            )
+        resolution = choose_resolution(start, end, points) or RESOLUTIONS[0]
+        return await load_rollups(db, resolution, start, end, ai_model_ids)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching model data rollups: {str(e)}"
+        )
+
+
+@router.get("/modeldata_history", status_code=status.HTTP_200_OK)
+async def get_modeldata_history(
+    start: datetime = Query(..., description="Start of the time range (IST)"),
+    end: Optional[datetime] = Query(None, description="End of the time range (IST, default: now)"),
+    ai_model_ids: Optional[List[int]] = Query(None, description="Only these AI models (default: all)"),
+    aggregate: str = Query(LAST, pattern=AGGREGATE_PATTERN, description="Per bucket: 'last', 'avg', 'min' or 'max'"),
+    bucket: Optional[int] = Query(None, ge=1, description="Bucket width in seconds (default: derived from points)"),
+    points: int = Query(HISTORY_DEFAULT_POINTS, ge=1, le=HISTORY_MAX_POINTS, description="Target buckets when no bucket width is given"),
+    metrics: Optional[List[str]] = Query(None, description="Only these metrics (default: all)"),
+    db: AsyncSession = Depends(get_db_session)
+):
+    """
+    Get modeldata history in aligned time buckets, aggregated server-side.
+    
+    Buckets start at multiples of the bucket width and the range is widened to
+    whole buckets. The response is columnar: one shared `timestamps` list and,
+    per AI model, one list per metric aligned to it (null for empty buckets).
+    
+    Buckets come from the in-memory modeldata cache, the modeldata rollups or
+    the modeldata table, whichever can answer in one pass (see `source`).
+    """
+    try:
+        start = to_naive_ist(start)
+        end = to_naive_ist(end) if end else get_ist_now()
+        if end <= start:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="end must be after start"
+            )
+        unknown = [metric for metric in metrics or [] if metric not in HISTORY_METRICS]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown metrics {unknown}. Available: {list(HISTORY_METRICS)}"
+            )
+        return await load_modeldata_history(db, start, end, aggregate, bucket, points, ai_model_ids, metrics)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching model data history: {str(e)}"
+        )
+
+
 @router.post("/create_position", response_model=PositionResponse, status_code=status.HTTP_201_CREATED)
 async def create_position(
     position_data: PositionCreateSimple,
@@ -773,9 +1063,7 @@ async def create_position(
     """
     try:
         # Find AI model with exact matching code_name
-        ai_model_query = select(AIModel).where(AIModel.code_name == position_data.code_name)
-        ai_model_result = await db.execute(ai_model_query)
-        ai_model = ai_model_result.scalar_one_or_none()
+        ai_model = await ModelIdentityCache.get(position_data.code_name)
         
         if not ai_model:
             raise HTTPException(
@@ -802,6 +1090,7 @@ async def create_position(
         
         # Add to database
         db.add(new_position)
+        await notify_change(db, "positions")
         await db.commit()
         await db.refresh(new_position)
         
@@ -841,59 +1130,16 @@ async def update_bulk_positions(
     - This endpoint processes all positions and returns partial success
     - If an ai_model_id is provided, it will be verified to exist
     - The last_updated field will be automatically updated for each position
+    - All positions are validated with one lookup and updated with one
+      statement, whatever the number of positions
     """
-    updated_positions = []
-    errors = []
-    
     try:
-        for position_item in bulk_data.positions:
-            try:
-                # Find the existing position
-                position_query = select(Position).where(Position.id == position_item.id)
-                position_result = await db.execute(position_query)
-                existing_position = position_result.scalar_one_or_none()
-                
-                if not existing_position:
-                    errors.append({
-                        "position_id": position_item.id,
-                        "error": f"Position with ID {position_item.id} not found"
-                    })
-                    continue
-                
-                # If ai_model_id is being updated, verify it exists
-                if position_item.ai_model_id is not None:
-                    ai_model_query = select(AIModel).where(AIModel.id == position_item.ai_model_id)
-                    ai_model_result = await db.execute(ai_model_query)
-                    ai_model = ai_model_result.scalar_one_or_none()
-                    
-                    if not ai_model:
-                        errors.append({
-                            "position_id": position_item.id,
-                            "error": f"AI model with ID {position_item.ai_model_id} not found"
-                        })
-                        continue
-                
-                # Update only the provided fields
-                update_data = position_item.model_dump(exclude_unset=True, exclude={'id'})
-                
-                for field, value in update_data.items():
-                    if hasattr(existing_position, field):
-                        setattr(existing_position, field, value)
-                
-                updated_positions.append(existing_position)
-                
-            except Exception as e:
-                errors.append({
-                    "position_id": position_item.id,
-                    "error": str(e)
-                })
+        updated_positions, errors = await update_positions_in_bulk(db, bulk_data.positions)
         
         # Commit all successful updates
         if updated_positions:
+            await notify_change(db, "positions")
             await db.commit()
-            # Refresh all updated positions to get the latest data
-            for position in updated_positions:
-                await db.refresh(position)
         
         return PositionBulkUpdateResponse(
             success_count=len(updated_positions),
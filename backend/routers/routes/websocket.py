@@ -1,32 +1,193 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from fastapi.websockets import WebSocketState
-from typing import List, Dict, Set
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
+from typing import List, Dict, Set, Optional, Tuple, FrozenSet
 import json
 import asyncio
+import os
 import random
+import time
 from datetime import datetime
+import orjson
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
+from sqlalchemy import select, desc, text
 from config.database import get_db_session
 from tables.ai_model import AIModel, AIModelResponse
 from tables.positions import Position, PositionResponse
 from tables.trades import Trade, TradeResponse
 from tables.modelchat import ModelChat, ModelChatResponse
 from tables.modeldata import ModelData, ModelDataResponse
-from direct_redis import DirectRedis
+from config.redis import RedisClient
+from utils.notifications import ChangeListener, MODEL_UPDATES_CHANNEL, request_wake
+from utils.modeldata_cache import (
+    ModelDataCache,
+    get_downsampled_modeldata,
+    get_modeldata_version,
+    MODELDATA_SAMPLE_POINTS,
+    MODELDATA_MIN_POINTS,
+    MODELDATA_MAX_POINTS,
+    MODELDATA_MIN_WINDOW
+)
+from utils.downsampling import EVEN, ALGORITHMS, ALGORITHM_PATTERN
+from utils.columnar import ROWS_LAYOUT, COLUMNAR_LAYOUT, LAYOUTS, LAYOUT_PATTERN
+from utils.row_diff import VersionedRowSets
+from utils.frame_bus import WORKER_ID, RequestedIntervals, StreamLeadership, publish_frames, relay_frames
+from utils.send_queue import StreamSenders, DROP_OLDEST, KEEP_LATEST
+from utils.snapshots import SnapshotCache
+from utils.replay import ReplayRing
+from utils.rate_limit import ClientRates
+from utils.trade_queue import TradeQueue, TRADE_TICKETS_STREAM
+from utils.subscriptions import (
+    StreamFilter,
+    SUBSCRIBE,
+    UNSUBSCRIBE,
+    SUBSCRIPTION_MESSAGES,
+    FILTER_FIELDS,
+    apply_subscription,
+    filter_rows,
+    parse_subscription_request,
+    subscription_message
+)
+from utils.frames import (
+    Frame,
+    encode_json,
+    TEXT_ENCODING,
+    NO_COMPRESSION,
+    FRAME_ENCODING_PATTERN,
+    FRAME_COMPRESSION_PATTERN
+)
 
 router = APIRouter(prefix="/ws", tags=["websocket"])
 
 # Global set to track active connections and broadcast tasks
 active_connections: Set[WebSocket] = set()
-price_stream_connections: Set[WebSocket] = set()
+price_stream_connections: Dict[WebSocket, "PriceStreamGroup"] = {}
 modeldata_stream_connections: Set[WebSocket] = set()
+# Clients that subscribed to part of a stream, mapped to their filter; clients
+# without an entry receive everything
+model_updates_filters: Dict[WebSocket, StreamFilter] = {}
+price_stream_filters: Dict[WebSocket, StreamFilter] = {}
+modeldata_filters: Dict[WebSocket, StreamFilter] = {}
+# Price-stream connections sharing a symbol filter and conflation window,
+# keyed by (symbols or None, conflation_ms)
+price_stream_groups: Dict[Tuple[Optional[FrozenSet[str]], int], "PriceStreamGroup"] = {}
+# Modeldata clients that asked for something other than the default view,
+# mapped to their (algorithm, points, window)
+modeldata_client_views: Dict[WebSocket, Tuple[str, int, Optional[int]]] = {}
+# Modeldata clients that asked for the columnar layout
+columnar_modeldata_clients: Set[WebSocket] = set()
 broadcast_task = None
 price_broadcast_task = None
 modeldata_broadcast_task = None
 
-# Redis client for fetching real-time price data
-redis_client = DirectRedis()
+# Model updates and modeldata are produced by one elected worker and published
+# on the frame bus; every worker runs a relay task feeding its own sockets.
+# Price updates need no election: ticks already arrive on a shared channel.
+MODEL_UPDATES_STREAM = "model-updates"
+MODELDATA_STREAM = "modeldata-stream"
+PRICE_STREAM = "price-stream"
+model_updates_relay_task = None
+modeldata_relay_task = None
+# Trade ticket events are published by whichever worker executed the trade
+trade_tickets_connections: Set[WebSocket] = set()
+trade_tickets_filters: Dict[WebSocket, StreamFilter] = {}
+trade_tickets_relay_task = None
+# Latest default-view modeldata frames per layout, for clients caught up
+# after skipping a frame
+modeldata_latest_frames: Dict[str, Frame] = {}
+
+# Latest model-updates frames received by this worker's relay, the version each
+# diff-mode client has, and full-update clients still waiting for a current frame.
+# The frames outlive the last connection (marked stale) so reconnecting clients
+# get them at once while a fresh push is requested.
+model_updates_frames: Dict[str, object] = {}
+# Latest frames decoded and narrowed to each subscribed filter, built once per
+# push and filter and shared by every client with that filter
+model_updates_messages: Dict[str, dict] = {}
+model_updates_filtered: Dict[Tuple[str, StreamFilter], Frame] = {}
+diff_client_versions: Dict[WebSocket, Optional[int]] = {}
+model_updates_waiting: Set[WebSocket] = set()
+# Set while a wake request is outstanding, so a burst of connects sends one
+model_updates_wake_pending = False
+
+# Every connection gets a bounded outbound queue drained by its own writer task;
+# the stream's policy decides what happens when a slow client's queue is full
+# (drop_oldest, keep_latest or disconnect)
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "32"))
+model_updates_senders = StreamSenders(
+    MODEL_UPDATES_STREAM,
+    WS_SEND_QUEUE_SIZE,
+    os.getenv("WS_MODEL_UPDATES_QUEUE_POLICY", KEEP_LATEST)
+)
+price_stream_senders = StreamSenders(
+    PRICE_STREAM,
+    WS_SEND_QUEUE_SIZE,
+    os.getenv("WS_PRICE_STREAM_QUEUE_POLICY", DROP_OLDEST)
+)
+modeldata_senders = StreamSenders(
+    MODELDATA_STREAM,
+    WS_SEND_QUEUE_SIZE,
+    os.getenv("WS_MODELDATA_QUEUE_POLICY", KEEP_LATEST)
+)
+trade_tickets_senders = StreamSenders(
+    TRADE_TICKETS_STREAM,
+    WS_SEND_QUEUE_SIZE,
+    os.getenv("WS_TRADE_TICKETS_QUEUE_POLICY", DROP_OLDEST)
+)
+# Control messages of multiplexed /ws/stream connections; their channel frames
+# go through the queues above
+stream_senders = StreamSenders("stream", WS_SEND_QUEUE_SIZE, DROP_OLDEST)
+
+# Model updates are pushed on change notifications; the fallback poll covers
+# lost notifications by comparing each table's watermark
+MODEL_UPDATES_FALLBACK_INTERVAL = 30  # seconds
+MODEL_UPDATES_DEBOUNCE = 0.25  # quiet period that ends a burst of notifications
+MODEL_UPDATES_MAX_DELAY = 1.0  # upper bound on how long a burst can delay a push
+
+# Per-client update rates (interval_ms). Model-updates clients may ask for at
+# most one push per interval; modeldata is produced at the fastest interval
+# any client in the cluster asked for, and slower clients skip frames
+MODEL_UPDATES_INTERVAL_DEFAULT_MS = 0
+MODEL_UPDATES_INTERVAL_MAX_MS = 60000
+MODELDATA_INTERVAL_DEFAULT_MS = 20000
+MODELDATA_INTERVAL_MIN_MS = int(os.getenv("WS_MODELDATA_MIN_INTERVAL_MS", "5000"))
+MODELDATA_INTERVAL_MAX_MS = 300000
+modeldata_intervals = RequestedIntervals(MODELDATA_STREAM)
+
+# Tick writers publish every normalized tick on this channel
+PRICE_TICKS_CHANNEL = "ltp_ticks"
+
+# Per-client conflation window bounds for the price stream
+PRICE_CONFLATION_DEFAULT_MS = 50
+PRICE_CONFLATION_MAX_MS = 10000
+
+# Latest ticker per symbol, as last forwarded to price-stream clients, and a
+# counter bumped whenever it changes, sent as the price frames' seq. Counters
+# are per worker and start at a random offset, so a seq issued by another
+# worker does not fall inside this worker's replay ring
+latest_prices: Dict[str, dict] = {}
+latest_prices_version = random.randrange(2 ** 52)
+
+# Recent history for clients reconnecting with ?since=<seq>: the deltas of the
+# last model-updates versions and the last changed tickers
+MODEL_UPDATES_REPLAY_SIZE = int(os.getenv("WS_MODEL_UPDATES_REPLAY_SIZE", "256"))
+PRICE_REPLAY_SIZE = int(os.getenv("WS_PRICE_REPLAY_SIZE", "4096"))
+model_updates_replay = ReplayRing(MODEL_UPDATES_STREAM, MODEL_UPDATES_REPLAY_SIZE)
+price_replay = ReplayRing(PRICE_STREAM, PRICE_REPLAY_SIZE)
+
+# Initial frames for new connections. Prices follow latest_prices_version;
+# modeldata follows the modeldata cache and is otherwise rebuilt as often as
+# it is broadcast
+PRICE_SNAPSHOT_MAX_AGE = 5  # seconds
+MODELDATA_SNAPSHOT_MAX_AGE = 20  # seconds
+price_snapshots = SnapshotCache(PRICE_STREAM, PRICE_SNAPSHOT_MAX_AGE, version=lambda: latest_prices_version)
+modeldata_snapshots = SnapshotCache(
+    MODELDATA_STREAM,
+    MODELDATA_SNAPSHOT_MAX_AGE,
+    version=lambda: (ModelDataCache.loaded, ModelDataCache.generation)
+)
+
+# Broadcasters skip frames when nothing changed; connections that would
+# otherwise stay silent get a small heartbeat at least this often
+STREAM_HEARTBEAT_INTERVAL = int(os.getenv("WS_HEARTBEAT_INTERVAL", "20"))  # seconds
 
 # Connection manager for WebSocket connections
 class ConnectionManager:
@@ -58,447 +219,1258 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
-async def send_safe(websocket: WebSocket, message: str):
-    """Safely send message to WebSocket, removing failed connections"""
-    try:
-        if websocket.client_state == WebSocketState.CONNECTED:
-            await websocket.send_text(message)
-        else:
-            # Remove disconnected connection
-            active_connections.discard(websocket)
-    except Exception as e:
-        print(f"Failed to send to client: {e}")
-        # Remove failed connection
-        active_connections.discard(websocket)
+def format_ticker(symbol: str, ticker_data: dict) -> dict:
+    """Convert a raw LTP entry (from the ltp_data hash or a published tick) into a price-stream ticker"""
+    last_price = ticker_data.get('last_price', 0)
+    change_pct = ticker_data.get('change', 0) or 0  # This is already in percentage
+    change_percent = round(change_pct, 2)
+    
+    # Determine price direction based on change
+    if change_percent > 0:
+        change_direction = "up"
+    elif change_percent < 0:
+        change_direction = "down"
+    else:
+        change_direction = "neutral"
+    
+    return {
+        "symbol": symbol,
+        "price": round(float(last_price), 2),
+        "change_percent": change_percent,
+        "change_direction": change_direction,
+        "last_trade_time": str(ticker_data.get('last_trade_time') or ''),
+        "exchange_timestamp": str(ticker_data.get('exchange_timestamp') or '')
+    }
+
+def build_heartbeat(**fields) -> bytes:
+    """A heartbeat message, sent in place of frames that would repeat the last one"""
+    return encode_json({"type": "heartbeat", **fields, "timestamp": datetime.now().isoformat()})
+
+async def load_latest_prices():
+    """Rebuild latest_prices from the full ltp_data hash"""
+    global latest_prices_version
+    
+    ltp_data = await RedisClient.hgetall('ltp_data')
+    if not ltp_data:
+        print("No LTP data available in Redis")
+        return
+    
+    for symbol, ticker_data in ltp_data.items():
+        try:
+            latest_prices[symbol] = format_ticker(symbol, ticker_data)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            print(f"Error processing ticker data for {symbol}: {e}")
+    latest_prices_version += 1
+    # Changes picked up from the hash are not in the ring; older seqs get a snapshot
+    price_replay.reset(latest_prices_version)
+
+async def build_price_snapshot(symbols: Optional[FrozenSet[str]] = None) -> Frame:
+    """initial_prices frame for new price-stream connections, or for clients subscribed to `symbols`"""
+    # Read Redis only when the broadcaster is not already keeping prices current
+    if price_broadcast_task is None or price_broadcast_task.done() or not latest_prices:
+        await load_latest_prices()
+    if symbols is None:
+        data = dict(latest_prices)
+    else:
+        data = {symbol: latest_prices[symbol] for symbol in sorted(symbols) if symbol in latest_prices}
+    return Frame.from_message({
+        "type": "initial_prices",
+        "timestamp": datetime.now().isoformat(),
+        "seq": latest_prices_version,
+        "data": data
+    })
+
+def merge_price_replay(since: int, tickers: List[dict]) -> Frame:
+    """One price_update with the latest ticker of every symbol that changed after `since`"""
+    return Frame.from_message({
+        "type": "price_update",
+        "timestamp": datetime.now().isoformat(),
+        "seq": price_replay.last_seq,
+        "since": since,
+        "data": {ticker["symbol"]: ticker for ticker in tickers}
+    })
+
+def price_snapshot_key(symbols: Optional[FrozenSet[str]]):
+    return "initial_prices" if symbols is None else ("initial_prices", symbols)
+
+class PriceStreamGroup:
+    """
+    Changed tickers pending for the price-stream connections that share a
+    symbol filter and conflation window, flushed once per window as a single
+    frame for all of them
+    """
+    
+    def __init__(self, symbols: Optional[FrozenSet[str]], conflation_ms: int):
+        self.symbols = symbols
+        self.conflation_ms = conflation_ms
+        self.window = conflation_ms / 1000
+        self.members: Set[WebSocket] = set()
+        self.pending: Dict[str, dict] = {}
+        self.flush_task = None
+        self.last_sent = time.monotonic()
+    
+    @property
+    def key(self) -> Tuple[Optional[FrozenSet[str]], int]:
+        return self.symbols, self.conflation_ms
+    
+    def wants(self, symbol: str) -> bool:
+        return self.symbols is None or symbol in self.symbols
+    
+    def push(self, ticker: dict):
+        """Queue a changed ticker, starting a flush if none is scheduled"""
+        self.pending[ticker["symbol"]] = ticker
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self.flush_after_window())
+    
+    async def flush_after_window(self):
+        try:
+            if self.window > 0:
+                await asyncio.sleep(self.window)
+            data, self.pending = self.pending, {}
+            message = {
+                "type": "price_update",
+                "timestamp": datetime.now().isoformat(),
+                "seq": latest_prices_version,
+                "data": data
+            }
+            frame = Frame.from_message(message)
+            for websocket in list(self.members):
+                price_stream_senders.send(websocket, frame)
+            self.last_sent = time.monotonic()
+        finally:
+            self.flush_task = None
+    
+    def close(self):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+
+def send_price_heartbeats():
+    """Heartbeat to the price-stream groups that received nothing for a heartbeat interval"""
+    now = time.monotonic()
+    frame = None
+    for group in list(price_stream_groups.values()):
+        if now - group.last_sent < STREAM_HEARTBEAT_INTERVAL:
+            continue
+        if frame is None:
+            frame = Frame(build_heartbeat(seq=latest_prices_version))
+        for websocket in list(group.members):
+            price_stream_senders.send(websocket, frame)
+        group.last_sent = now
+
+def join_price_group(websocket: WebSocket, symbols: Optional[FrozenSet[str]], conflation_ms: int):
+    """Move a price-stream connection to the group for its symbols and conflation window"""
+    leave_price_group(websocket)
+    group = price_stream_groups.get((symbols, conflation_ms))
+    if group is None:
+        group = PriceStreamGroup(symbols, conflation_ms)
+        price_stream_groups[group.key] = group
+    group.members.add(websocket)
+    price_stream_connections[websocket] = group
+
+def leave_price_group(websocket: WebSocket):
+    group = price_stream_connections.pop(websocket, None)
+    if group is None:
+        return
+    group.members.discard(websocket)
+    if not group.members:
+        group.close()
+        price_stream_groups.pop(group.key, None)
 
 async def broadcast_price_updates():
-    """Background task that broadcasts price updates to all price stream connections using Redis data"""
+    """
+    Background task that forwards ticks published by the tick writers to all price stream connections.
+    
+    Only symbols whose ticker changed are forwarded; connections sharing a
+    symbol filter and conflation window batch their changes into one frame.
+    Groups that received nothing for a while get a heartbeat instead. The ltp_data hash is only read
+    when the subscription is (re)established, to pick up ticks missed meanwhile.
+    """
+    global latest_prices_version
+    
     while True:
+        subscription = RedisClient.subscribe(PRICE_TICKS_CHANNEL)
         try:
-            if not price_stream_connections:
-                # No connections, sleep and continue
-                await asyncio.sleep(1)
-                continue
-            
-            # Fetch live price data from Redis
-            ltp_data = redis_client.hgetall('ltp_data')
-            
-            if not ltp_data:
-                print("No LTP data available in Redis")
-                await asyncio.sleep(2)
-                continue
+            # Catch up on ticks written while nobody was subscribed
+            previous_prices = dict(latest_prices)
+            await load_latest_prices()
+            for symbol, ticker in latest_prices.items():
+                if previous_prices.get(symbol) != ticker:
+                    for group in list(price_stream_groups.values()):
+                        if group.wants(symbol):
+                            group.push(ticker)
             
-            updated_tickers = {}
-            
-            for symbol, ticker_data in ltp_data.items():
+            heartbeat_due = time.monotonic() + STREAM_HEARTBEAT_INTERVAL / 2
+            while True:
+                if time.monotonic() >= heartbeat_due:
+                    send_price_heartbeats()
+                    heartbeat_due = time.monotonic() + STREAM_HEARTBEAT_INTERVAL / 2
                 try:
-                    # Extract last_price and change percentage from Redis data
-                    last_price = ticker_data.get('last_price', 0)
-                    change_pct = ticker_data.get('change', 0)  # This is already in percentage
-                    
-                    # Convert change percentage to a percentage format (multiply by 100 if needed)
-                    if abs(change_pct) < 1:
-                        # If change is in decimal format (e.g., 0.018 for 1.8%), convert to percentage
-                        change_percent = round(change_pct, 2)
-                    else:
-                        # If change is already in percentage format
-                        change_percent = round(change_pct, 2)
-                    
-                    # Determine price direction based on change
-                    if change_percent > 0:
-                        change_direction = "up"
-                    elif change_percent < 0:
-                        change_direction = "down"
-                    else:
-                        change_direction = "neutral"
-                    
-                    updated_tickers[symbol] = {
-                        "symbol": symbol,
-                        "price": round(float(last_price), 2),
-                        "change_percent": change_percent,
-                        "change_direction": change_direction,
-                        "last_trade_time": ticker_data.get('last_trade_time', ''),
-                        "exchange_timestamp": ticker_data.get('exchange_timestamp', '')
-                    }
-                    
-                except (KeyError, TypeError, ValueError) as e:
-                    print(f"Error processing ticker data for {symbol}: {e}")
+                    raw_tick = await asyncio.wait_for(
+                        subscription.get(),
+                        timeout=max(heartbeat_due - time.monotonic(), 0)
+                    )
+                except asyncio.TimeoutError:
+                    continue
+                if raw_tick is None:
+                    # Subscription ended, resubscribe after a short pause
+                    break
+                
+                try:
+                    tick = json.loads(raw_tick)
+                    symbol = tick["symbol"]
+                    ticker = format_ticker(symbol, tick)
+                except (KeyError, TypeError, ValueError, AttributeError) as e:
+                    print(f"Error processing published tick {raw_tick!r}: {e}")
                     continue
-            
-            if updated_tickers:
-                message = {
-                    "type": "price_update",
-                    "timestamp": datetime.now().isoformat(),
-                    "data": updated_tickers
-                }
                 
-                message_text = json.dumps(message, default=str)
+                if latest_prices.get(symbol) == ticker:
+                    continue
+                latest_prices[symbol] = ticker
+                latest_prices_version += 1
+                price_replay.append(latest_prices_version, ticker)
                 
-                # Send to all price stream connections in parallel
-                connection_list = list(price_stream_connections.copy())
-                if connection_list:
-                    await asyncio.gather(
-                        *[send_safe(ws, message_text) for ws in connection_list],
-                        return_exceptions=True
-                    )
+                for group in list(price_stream_groups.values()):
+                    if group.wants(symbol):
+                        group.push(ticker)
             
-            # Wait 2 seconds before next update
-            await asyncio.sleep(1)
+            await asyncio.sleep(2)
             
         except Exception as e:
             print(f"Price broadcast error: {e}")
             await asyncio.sleep(2)
+        finally:
+            subscription.close()
+
+def build_modeldata_message(
+    message_type: str,
+    algorithm: str,
+    points: int,
+    window: Optional[int],
+    modeldata_groups: Dict[str, dict],
+    layout: str = ROWS_LAYOUT
+) -> dict:
+    """Wrap downsampled modeldata groups in a modeldata stream message"""
+    return {
+        "type": message_type,
+        "timestamp": datetime.now().isoformat(),
+        "total_groups": len(modeldata_groups),
+        "algorithm": algorithm,
+        "points": points,
+        "window": window,
+        "layout": layout,
+        "data": modeldata_groups
+    }
+
+async def get_filtered_modeldata(
+    view: Tuple[str, int, Optional[int]],
+    layout: str,
+    stream_filter: Optional[StreamFilter] = None
+) -> Tuple[str, Dict[str, dict]]:
+    """Downsampled modeldata groups for a view, limited to the models a client subscribed to"""
+    algorithm, points, window = view
+    ai_model_ids = None
+    if stream_filter is not None and ModelDataCache.loaded:
+        # Only downsample the subscribed models; code_names resolve through the cache
+        ai_model_ids = [
+            ai_model_id
+            for ai_model_id, series in ModelDataCache.series.items()
+            if stream_filter.matches_model({"ai_model_id": ai_model_id, "code_name": series.code_name})
+        ]
+    used_algorithm, modeldata_groups = await get_downsampled_modeldata(
+        algorithm, points, window, ai_model_ids=ai_model_ids, layout=layout
+    )
+    if stream_filter is not None:
+        modeldata_groups = {
+            key: group for key, group in modeldata_groups.items() if stream_filter.matches_model(group)
+        }
+    return used_algorithm, modeldata_groups
+
+async def build_modeldata_snapshot(
+    view: Tuple[str, int, Optional[int]],
+    layout: str,
+    stream_filter: Optional[StreamFilter] = None
+) -> Frame:
+    """initial_modeldata frame for new modeldata stream connections with the given view and filter"""
+    # Same downsampling as the updates
+    algorithm, points, window = view
+    used_algorithm, initial_data = await get_filtered_modeldata(view, layout, stream_filter)
+    
+    initial_message = build_modeldata_message("initial_modeldata", used_algorithm, points, window, initial_data, layout)
+    initial_message["note"] = "Initial load with all AI models. Updates follow the requested interval_ms (default 20 seconds)."
+    print(f"Built initial modeldata snapshot with {len(initial_data)} groups")
+    return Frame.from_message(initial_message)
 
 async def broadcast_modeldata_updates():
-    """Background task that broadcasts resampled modeldata grouped by display_name every 20 seconds"""
-    from config.database import Database
-    from sqlalchemy import text
+    """
+    Producer that publishes resampled modeldata grouped by display_name at the
+    fastest interval requested by any client (every 20 seconds by default).
     
+    Runs only on the worker elected for the modeldata stream; every worker's
+    relay forwards the published frame to its own connections, skipping
+    connections that asked for a slower rate. When no modeldata was written
+    since the last frame, a heartbeat is published instead and nothing is rebuilt.
+    """
+    published_version = None
     while True:
         try:
-            if not modeldata_stream_connections:
-                # No connections, sleep and continue
-                await asyncio.sleep(5)
-                continue
-            
-            # Use PostgreSQL's window functions for efficient resampling by AI model
-            async with Database.async_session_maker() as session:
-                # First, get all AI models
-                ai_models_query = text("""
-                    SELECT id, code_name, display_name 
-                    FROM ai_models 
-                    ORDER BY id
-                """)
-                ai_models_result = await session.execute(ai_models_query)
-                ai_models = ai_models_result.fetchall()
+            # Taken before building, so rows written meanwhile trigger another build
+            version = await get_modeldata_version()
+            if version == published_version:
+                await publish_frames(MODELDATA_STREAM, {"heartbeat": True}, {"heartbeat": build_heartbeat()})
+            else:
+                frames = {}
+                for layout in LAYOUTS:
+                    algorithm, modeldata_groups = await get_downsampled_modeldata(layout=layout)
+                    if modeldata_groups:
+                        frames[layout] = encode_json(build_modeldata_message(
+                            "modeldata_update", algorithm, MODELDATA_SAMPLE_POINTS, None, modeldata_groups, layout
+                        ))
                 
-                modeldata_groups = {}
-                
-                for ai_model in ai_models:
-                    ai_model_id = ai_model[0]
-                    code_name = ai_model[1]
-                    display_name = ai_model[2]
-                    
-                    # Resample data for this specific AI model to exactly 500 evenly distributed points
-                    # This ensures first and last points are always included
-                    resample_query = text("""
-                        WITH ranked_data AS (
-                            SELECT 
-                                id,
-                                ai_model_id,
-                                code_name,
-                                display_name,
-                                account_value,
-                                return_value,
-                                total_pnl,
-                                fees,
-                                trades,
-                                created_at,
-                                ROW_NUMBER() OVER (ORDER BY created_at) as row_num,
-                                COUNT(*) OVER () as total_rows
-                            FROM modeldata 
-                            WHERE ai_model_id = :ai_model_id
-                            ORDER BY created_at
-                        ),
-                        sampled_indices AS (
-                            SELECT 
-                                CASE 
-                                    WHEN total_rows <= 500 THEN row_num
-                                    WHEN row_num = 1 THEN 1  -- Always include first point
-                                    WHEN row_num = total_rows THEN total_rows  -- Always include last point
-                                    ELSE CAST(1 + ROUND((row_num - 1) * (total_rows - 1) / 499.0) AS INTEGER)
-                                END as sample_index
-                            FROM ranked_data
-                            WHERE total_rows > 0
-                        ),
-                        final_sample AS (
-                            SELECT DISTINCT sample_index 
-                            FROM sampled_indices 
-                            ORDER BY sample_index
-                            LIMIT 500
-                        )
-                        SELECT 
-                            rd.id,
-                            rd.ai_model_id,
-                            rd.code_name,
-                            rd.display_name,
-                            rd.account_value,
-                            rd.return_value,
-                            rd.total_pnl,
-                            rd.fees,
-                            rd.trades,
-                            rd.created_at
-                        FROM ranked_data rd
-                        INNER JOIN final_sample fs ON rd.row_num = fs.sample_index
-                        ORDER BY rd.created_at
-                    """)
-                    
-                    result = await session.execute(resample_query, {"ai_model_id": ai_model_id})
-                    rows = result.fetchall()
-                    
-                    if rows:
-                        # Convert to list of dictionaries
-                        data_points = []
-                        for row in rows:
-                            data_points.append({
-                                "id": row[0],
-                                "ai_model_id": row[1],
-                                "code_name": row[2],
-                                "display_name": row[3],
-                                "account_value": float(row[4]) if row[4] is not None else None,
-                                "return_value": float(row[5]) if row[5] is not None else None,
-                                "total_pnl": float(row[6]) if row[6] is not None else None,
-                                "fees": float(row[7]) if row[7] is not None else None,
-                                "trades": int(row[8]) if row[8] is not None else None,
-                                "created_at": row[9].isoformat() if row[9] else None
-                            })
-                        
-                        # Use ai_model_id as the key for better organization
-                        modeldata_groups[str(ai_model_id)] = {
-                            "ai_model_id": ai_model_id,
-                            "code_name": code_name,
-                            "display_name": display_name,
-                            "data_points": data_points,
-                            "total_points": len(data_points),
-                            "latest_timestamp": data_points[-1]["created_at"] if data_points else None,
-                            "first_timestamp": data_points[0]["created_at"] if data_points else None
-                        }
-                
-                if modeldata_groups:
-                    message = {
-                        "type": "modeldata_update",
-                        "timestamp": datetime.now().isoformat(),
-                        "total_groups": len(modeldata_groups),
-                        "data": modeldata_groups
-                    }
-                    
-                    message_text = json.dumps(message, default=str)
-                    
-                    # Send to all modeldata stream connections in parallel
-                    connection_list = list(modeldata_stream_connections.copy())
-                    if connection_list:
-                        await asyncio.gather(
-                            *[send_safe(ws, message_text) for ws in connection_list],
-                            return_exceptions=True
-                        )
-                        print(f"Broadcasted modeldata to {len(connection_list)} connections with {len(modeldata_groups)} groups")
+                if frames:
+                    await publish_frames(MODELDATA_STREAM, {}, frames)
+                    published_version = version
             
-            # Wait 20 seconds before next update
-            await asyncio.sleep(20)
+            # Wait for the fastest interval requested across the cluster
+            interval = await modeldata_intervals.fastest(MODELDATA_INTERVAL_DEFAULT_MS / 1000)
+            await asyncio.sleep(max(interval, MODELDATA_INTERVAL_MIN_MS / 1000))
             
         except Exception as e:
             print(f"Modeldata broadcast error: {e}")
             await asyncio.sleep(20)
 
+async def publish_modeldata_interval():
+    """Record the fastest interval this worker's modeldata clients asked for, for the producer"""
+    try:
+        await modeldata_intervals.publish(modeldata_rates.fastest())
+    except Exception as e:
+        print(f"Failed to publish modeldata interval: {e}")
+
+async def send_modeldata_frames(websockets: List[WebSocket], layout_frames: Dict[str, Frame]):
+    """
+    Send modeldata connections the latest modeldata. Connections with the
+    default view get the published frame of their layout; the others get a
+    frame downsampled from this worker's cache, built once per distinct
+    view, layout and filter.
+    """
+    view_frames: Dict[tuple, Frame] = {}
+    for ws in websockets:
+        layout = COLUMNAR_LAYOUT if ws in columnar_modeldata_clients else ROWS_LAYOUT
+        view = modeldata_client_views.get(ws)
+        stream_filter = modeldata_filters.get(ws)
+        if view is None and stream_filter is None:
+            if layout in layout_frames:
+                modeldata_senders.send(ws, layout_frames[layout])
+            continue
+        view = view or (EVEN, MODELDATA_SAMPLE_POINTS, None)
+        key = (view, layout, stream_filter)
+        if key not in view_frames:
+            algorithm, modeldata_groups = await get_filtered_modeldata(view, layout, stream_filter)
+            view_frames[key] = Frame.from_message(
+                build_modeldata_message("modeldata_update", algorithm, view[1], view[2], modeldata_groups, layout)
+            )
+        modeldata_senders.send(ws, view_frames[key])
+
+async def relay_modeldata_updates(meta: dict, frames: Dict[str, bytes]):
+    """
+    Forward a published modeldata frame to this worker's modeldata stream connections.
+    
+    Connections whose interval has not passed since their last frame skip it
+    and are caught up with the latest modeldata once it has. Heartbeats go to
+    connections that are not owed data and heard nothing for a heartbeat
+    interval (or their own interval, if shorter).
+    """
+    await publish_modeldata_interval()
+    if meta.get("heartbeat"):
+        heartbeat_frame = Frame(frames["heartbeat"])
+        for ws in list(modeldata_stream_connections):
+            if ws not in modeldata_rates.behind and modeldata_rates.due(ws, STREAM_HEARTBEAT_INTERVAL):
+                modeldata_senders.send(ws, heartbeat_frame)
+                modeldata_rates.sent(ws)
+        return
+    
+    modeldata_latest_frames.clear()
+    modeldata_latest_frames.update((layout, Frame(data)) for layout, data in frames.items())
+    due = []
+    for ws in list(modeldata_stream_connections):
+        if modeldata_rates.due(ws):
+            due.append(ws)
+        else:
+            modeldata_rates.skip(ws)
+    await send_modeldata_frames(due, modeldata_latest_frames)
+    for ws in due:
+        modeldata_rates.sent(ws)
+    if due:
+        print(f"Broadcasted modeldata to {len(due)} connections")
+
+async def catch_up_modeldata(websockets: List[WebSocket]):
+    """Send the latest modeldata to connections that skipped a frame"""
+    await send_modeldata_frames(
+        [ws for ws in websockets if ws in modeldata_stream_connections],
+        modeldata_latest_frames
+    )
+
+async def load_position_updates(session: AsyncSession) -> List[dict]:
+    """Fetch all positions"""
+    positions_result = await session.execute(select(Position))
+    positions = positions_result.scalars().all()
+    return [
+        PositionResponse.model_validate(position).model_dump()
+        for position in positions
+    ]
+
+async def load_trade_updates(session: AsyncSession) -> List[dict]:
+    """Fetch latest 30 trades ordered by last_update_time"""
+    trades_result = await session.execute(
+        select(Trade).order_by(desc(Trade.last_update_time)).limit(30)
+    )
+    trades = trades_result.scalars().all()
+    return [
+        TradeResponse.model_validate(trade).model_dump()
+        for trade in trades
+    ]
+
+async def load_modelchat_updates(session: AsyncSession) -> List[dict]:
+    """Fetch latest 30 model chats ordered by last_update_time"""
+    modelchats_result = await session.execute(
+        select(ModelChat).order_by(desc(ModelChat.last_update_time)).limit(30)
+    )
+    modelchats = modelchats_result.scalars().all()
+    modelchat_data = []
+    for chat in modelchats:
+        chat_dict = ModelChatResponse.model_validate(chat).model_dump()
+        
+        # Parse model_input_prompt as JSON if it's a valid JSON string
+        if chat_dict.get('model_input_prompt'):
+            try:
+                chat_dict['model_input_prompt'] = json.loads(chat_dict['model_input_prompt'])
+            except (json.JSONDecodeError, TypeError):
+                # Keep as string if not valid JSON
+                pass
+        
+        # Parse model_output_prompt as JSON if it's a valid JSON string
+        if chat_dict.get('model_output_prompt'):
+            try:
+                chat_dict['model_output_prompt'] = json.loads(chat_dict['model_output_prompt'])
+            except (json.JSONDecodeError, TypeError):
+                # Keep as string if not valid JSON
+                pass
+        
+        modelchat_data.append(chat_dict)
+    return modelchat_data
+
+# Loaders for each table carried by the combined_update message
+MODEL_UPDATE_LOADERS = {
+    "positions": load_position_updates,
+    "trades": load_trade_updates,
+    "modelchat": load_modelchat_updates,
+}
+
+# Row count, highest id and latest update per table: any insert, update or
+# delete moves at least one of them, so the fallback poll only reloads tables
+# that changed without a notification
+MODEL_UPDATES_WATERMARK_QUERY = text("""
+    SELECT 'positions', COUNT(*), MAX(id), MAX(last_updated) FROM positions
+    UNION ALL
+    SELECT 'trades', COUNT(*), MAX(id), MAX(last_update_time) FROM trades
+    UNION ALL
+    SELECT 'modelchat', COUNT(*), MAX(id), MAX(last_update_time) FROM modelchat
+""")
+
+async def load_model_updates_watermarks(session: AsyncSession) -> Dict[str, tuple]:
+    """Watermark of each model-updates table"""
+    result = await session.execute(MODEL_UPDATES_WATERMARK_QUERY)
+    return {row[0]: tuple(row[1:]) for row in result.fetchall()}
+
+# Message key used for each table in combined frames
+MODEL_UPDATE_KEYS = {
+    "positions": "position_updates",
+    "trades": "trade_updates",
+    "modelchat": "modelchat_updates",
+}
+
+def build_model_updates_snapshot(state: VersionedRowSets) -> bytes:
+    """Build a full combined_snapshot message from the current model-updates state"""
+    timestamp = datetime.now().isoformat()
+    tables = state.snapshot()
+    message = {
+        "type": "combined_snapshot",
+        "version": state.version,
+        "seq": state.version,
+        "timestamp": timestamp
+    }
+    for table, key in MODEL_UPDATE_KEYS.items():
+        message[key] = {
+            "type": key,
+            "timestamp": timestamp,
+            "data": tables.get(table, [])
+        }
+    return encode_json(message)
+
+def build_model_updates_delta(state: VersionedRowSets, changes: Dict[str, dict]) -> bytes:
+    """Build a combined_delta message holding only the rows that changed since the previous version"""
+    message = {
+        "type": "combined_delta",
+        "version": state.version,
+        "base_version": state.version - 1,
+        "seq": state.version,
+        "timestamp": datetime.now().isoformat()
+    }
+    for table, table_changes in changes.items():
+        message[MODEL_UPDATE_KEYS[table]] = table_changes
+    return encode_json(message)
+
+def merge_model_updates_deltas(since: int, delta_frames: List[Frame]) -> Frame:
+    """
+    One combined_delta from version `since` to the latest version, folding
+    consecutive deltas: a row's last upsert wins and a removal drops it.
+    """
+    tables: Dict[str, Dict[object, Optional[dict]]] = {}
+    for frame in delta_frames:
+        message = orjson.loads(frame.data)
+        for key in MODEL_UPDATE_KEYS.values():
+            section = message.get(key)
+            if not section:
+                continue
+            rows = tables.setdefault(key, {})
+            for row in section.get("upserted", []):
+                rows[row["id"]] = row
+            for row_id in section.get("removed", []):
+                rows[row_id] = None
+    version = model_updates_replay.last_seq
+    message = {
+        "type": "combined_delta",
+        "version": version,
+        "base_version": since,
+        "seq": version,
+        "timestamp": datetime.now().isoformat()
+    }
+    for key, rows in tables.items():
+        message[key] = {
+            "upserted": [row for row in rows.values() if row is not None],
+            "removed": [row_id for row_id, row in rows.items() if row is None]
+        }
+    return Frame.from_message(message)
+
+def filter_model_updates_message(message: dict, stream_filter: StreamFilter) -> dict:
+    """
+    A combined_update/snapshot/delta message with only the rows of subscribed
+    models. Removed ids are kept as they are: the rows are gone, and clients
+    ignore ids they never received.
+    """
+    filtered = dict(message)
+    for key in MODEL_UPDATE_KEYS.values():
+        section = message.get(key)
+        if not isinstance(section, dict):
+            continue
+        section = dict(section)
+        for rows_key in ("data", "upserted"):
+            if rows_key in section:
+                section[rows_key] = filter_rows(section[rows_key], stream_filter)
+        filtered[key] = section
+    return filtered
+
+def model_updates_frame(kind: str, stream_filter: Optional[StreamFilter] = None) -> Optional[Frame]:
+    """
+    The latest "full", "snapshot" or "delta" frame, narrowed to a client's
+    filter. Each published frame is decoded at most once per push and each
+    filtered frame built once per filter, then shared.
+    """
+    frame = model_updates_frames.get(kind)
+    if frame is None or stream_filter is None:
+        return frame
+    key = (kind, stream_filter)
+    filtered = model_updates_filtered.get(key)
+    if filtered is None:
+        if kind not in model_updates_messages:
+            model_updates_messages[kind] = orjson.loads(frame.data)
+        filtered = Frame.from_message(filter_model_updates_message(model_updates_messages[kind], stream_filter))
+        model_updates_filtered[key] = filtered
+    return filtered
+
+def next_model_updates_frame(websocket: WebSocket) -> Optional[Frame]:
+    """
+    The frame that brings a connection up to the latest relayed push: the
+    combined_update for full-update clients; for diff-mode clients the delta
+    when they hold the previous version, the deltas they missed merged into
+    one, or else the snapshot. None if a diff-mode client is already current.
+    """
+    stream_filter = model_updates_filters.get(websocket)
+    if websocket not in diff_client_versions:
+        return model_updates_frame("full", stream_filter)
+    
+    version = model_updates_frames["version"]
+    client_version = diff_client_versions[websocket]
+    if client_version == version:
+        return None
+    frame = None
+    if client_version is not None:
+        if model_updates_frames["delta"] is not None and client_version == version - 1:
+            frame = model_updates_frame("delta", stream_filter)
+        elif stream_filter is None and model_updates_replay.last_seq == version:
+            frame = model_updates_replay.merged(client_version, merge_model_updates_deltas)
+    if frame is None:
+        frame = model_updates_frame("snapshot", stream_filter)
+    diff_client_versions[websocket] = version
+    return frame
+
+async def relay_model_updates(meta: dict, frames: Dict[str, bytes]):
+    """
+    Forward a published model-updates push to this worker's connections.
+    
+    Each connection gets the frame that brings it up to date (see
+    next_model_updates_frame). Pushes that only answer a wake request go to
+    clients that have not received a current frame yet. Connections whose
+    interval_ms has not passed since their last frame skip the push and are
+    caught up once it has. Subscribed clients get the same frames narrowed to
+    their filter. Heartbeats go to connections that are not owed a push.
+    """
+    global model_updates_wake_pending
+    
+    version = meta["version"]
+    if meta.get("heartbeat"):
+        heartbeat_frame = Frame(frames["heartbeat"])
+        for ws in list(active_connections):
+            if ws not in model_updates_rates.behind:
+                model_updates_senders.send(ws, heartbeat_frame)
+        return
+    
+    model_updates_frames.update(
+        version=version,
+        full=Frame(frames["full"]),
+        snapshot=Frame(frames["snapshot"]),
+        delta=Frame(frames["delta"]) if "delta" in frames else None,
+        stale=False
+    )
+    model_updates_messages.clear()
+    model_updates_filtered.clear()
+    model_updates_wake_pending = False
+    if model_updates_frames["delta"] is not None:
+        model_updates_replay.append(version, model_updates_frames["delta"])
+    
+    for ws in list(active_connections):
+        if ws in diff_client_versions:
+            if diff_client_versions[ws] == version:
+                continue
+        elif meta.get("wake") and ws not in model_updates_waiting:
+            continue
+        # Clients still waiting for their first current frame never wait longer
+        if ws not in model_updates_waiting and not model_updates_rates.due(ws):
+            model_updates_rates.skip(ws)
+            continue
+        frame = next_model_updates_frame(ws)
+        model_updates_waiting.discard(ws)
+        model_updates_rates.sent(ws)
+        if frame is not None:
+            model_updates_senders.send(ws, frame)
+
+async def catch_up_model_updates(websockets: List[WebSocket]):
+    """Send connections that skipped a push the frame that brings them up to date"""
+    if not model_updates_frames:
+        return
+    for ws in websockets:
+        if ws not in active_connections:
+            continue
+        frame = next_model_updates_frame(ws)
+        if frame is not None:
+            model_updates_senders.send(ws, frame)
+
+def model_updates_wait_result(payloads: List[dict]) -> Tuple[Set[str], bool, bool]:
+    """
+    Tables named by the notifications received while waiting, whether they
+    were all wake requests, and whether the wait ended with the fallback poll
+    """
+    changed_tables = {
+        table
+        for payload in payloads
+        for table in payload.get("tables", [])
+        if table in MODEL_UPDATE_LOADERS
+    }
+    wake_only = bool(payloads) and all(payload.get("wake") for payload in payloads)
+    if payloads and not changed_tables and not wake_only:
+        # Unrecognised payload: reload everything
+        changed_tables = set(MODEL_UPDATE_LOADERS)
+    return changed_tables, wake_only, not payloads
+
 async def broadcast_model_updates():
-    """Background task that broadcasts model updates to all connections"""
+    """
+    Producer that publishes model updates for every worker's connections.
+    
+    Pushes are driven by PostgreSQL notifications sent by the write routes:
+    a burst of notifications is debounced into a single push, and only the
+    tables named in the notifications are reloaded, along with any table
+    whose watermark moved (in case a notification is lost). Nothing is
+    published when no rows changed; the slow fallback poll publishes a
+    heartbeat instead.
+    
+    Runs only on the worker elected for the model-updates stream. Each push
+    carries the combined_update, combined_snapshot and (when rows changed)
+    combined_delta frames, serialized once to bytes for the whole cluster.
+    """
     from config.database import Database
     
-    while True:
-        try:
-            if not active_connections:
-                # No connections, sleep and continue
-                await asyncio.sleep(3)
-                continue
-            
-            # Single database session for all queries
-            async with Database.async_session_maker() as session:
-                # Fetch all positions
-                positions_result = await session.execute(select(Position))
-                positions = positions_result.scalars().all()
-                position_data = [
-                    PositionResponse.model_validate(position).model_dump()
-                    for position in positions
-                ]
-                
-                # Fetch latest 50 trades ordered by last_update_time
-                trades_result = await session.execute(
-                    select(Trade).order_by(desc(Trade.last_update_time)).limit(30)
-                )
-                trades = trades_result.scalars().all()
-                trade_data = [
-                    TradeResponse.model_validate(trade).model_dump()
-                    for trade in trades
-                ]
+    subscription = await ChangeListener.subscribe(MODEL_UPDATES_CHANNEL)
+    # Versions start from the clock so a new leader never reuses an old leader's versions
+    state = VersionedRowSets(initial_version=int(time.time() * 1000))
+    latest_data = {}
+    watermarks: Dict[str, tuple] = {}
+    # The first pass loads every table
+    stale_tables = set(MODEL_UPDATE_LOADERS)
+    wake_only = False
+    poll = False
+    published = False
+    
+    try:
+        while True:
+            try:
+                # Single database session for all queries
+                async with Database.async_session_maker() as session:
+                    # Read before reloading, so writes made meanwhile move them again
+                    current_watermarks = await load_model_updates_watermarks(session)
+                    stale_tables |= {
+                        table for table in MODEL_UPDATE_LOADERS
+                        if current_watermarks.get(table) != watermarks.get(table)
+                    }
+                    for table in stale_tables:
+                        latest_data[table] = await MODEL_UPDATE_LOADERS[table](session)
+                watermarks = current_watermarks
+                changes = state.update({table: latest_data[table] for table in stale_tables}) if stale_tables else None
+                stale_tables = set()
                 
-                # Fetch latest 30 model chats ordered by last_update_time
-                modelchats_result = await session.execute(
-                    select(ModelChat).order_by(desc(ModelChat.last_update_time)).limit(30)
-                )
-                modelchats = modelchats_result.scalars().all()
-                modelchat_data = []
-                for chat in modelchats:
-                    chat_dict = ModelChatResponse.model_validate(chat).model_dump()
-                    
-                    # Parse model_input_prompt as JSON if it's a valid JSON string
-                    if chat_dict.get('model_input_prompt'):
-                        try:
-                            chat_dict['model_input_prompt'] = json.loads(chat_dict['model_input_prompt'])
-                        except (json.JSONDecodeError, TypeError):
-                            # Keep as string if not valid JSON
-                            pass
-                    
-                    # Parse model_output_prompt as JSON if it's a valid JSON string
-                    if chat_dict.get('model_output_prompt'):
-                        try:
-                            chat_dict['model_output_prompt'] = json.loads(chat_dict['model_output_prompt'])
-                        except (json.JSONDecodeError, TypeError):
-                            # Keep as string if not valid JSON
-                            pass
-                    
-                    modelchat_data.append(chat_dict)
+                if published and not changes and not wake_only:
+                    if poll:
+                        # Nothing changed: keep connections alive without rebuilding the frames
+                        await publish_frames(
+                            MODEL_UPDATES_STREAM,
+                            {"version": state.version, "heartbeat": True},
+                            {"heartbeat": build_heartbeat(seq=state.version)}
+                        )
+                    payloads = await subscription.wait(
+                        timeout=MODEL_UPDATES_FALLBACK_INTERVAL,
+                        debounce=MODEL_UPDATES_DEBOUNCE,
+                        max_delay=MODEL_UPDATES_MAX_DELAY
+                    )
+                    stale_tables, wake_only, poll = model_updates_wait_result(payloads)
+                    continue
                 
                 # Prepare combined message with all three data types
                 timestamp = datetime.now().isoformat()
                 
                 combined_message = {
                     "type": "combined_update",
+                    "seq": state.version,
                     "trade_updates": {
                         "type": "trade_updates",
                         "timestamp": timestamp,
-                        "data": trade_data
+                        "data": latest_data["trades"]
                     },
                     "position_updates": {
                         "type": "position_updates",
                         "timestamp": timestamp,
-                        "data": position_data
+                        "data": latest_data["positions"]
                     },
                     "modelchat_updates": {
                         "type": "modelchat_updates",
                         "timestamp": timestamp,
-                        "data": modelchat_data
+                        "data": latest_data["modelchat"]
                     }
                 }
                 
-                # Convert to JSON string
-                combined_message_text = json.dumps(combined_message, default=str)
+                await publish_frames(
+                    MODEL_UPDATES_STREAM,
+                    {"version": state.version, "wake": wake_only and not changes},
+                    {
+                        "full": encode_json(combined_message),
+                        "snapshot": build_model_updates_snapshot(state),
+                        # Diff-mode clients only receive the rows that changed
+                        "delta": build_model_updates_delta(state, changes) if changes else None
+                    }
+                )
+                published = True
                 
-                # Send combined message to all connections in parallel
-                connection_list = list(active_connections.copy())
-                if connection_list:
-                    await asyncio.gather(
-                        *[send_safe(ws, combined_message_text) for ws in connection_list],
-                        return_exceptions=True
-                    )
-            
-            # Wait 3 seconds before next update
-            await asyncio.sleep(3)
-            
-        except Exception as e:
-            print(f"Broadcast error: {e}")
-            await asyncio.sleep(3)
+                # Wait for the next change notification (or the fallback poll)
+                payloads = await subscription.wait(
+                    timeout=MODEL_UPDATES_FALLBACK_INTERVAL,
+                    debounce=MODEL_UPDATES_DEBOUNCE,
+                    max_delay=MODEL_UPDATES_MAX_DELAY
+                )
+                stale_tables, wake_only, poll = model_updates_wait_result(payloads)
+                
+            except Exception as e:
+                print(f"Broadcast error: {e}")
+                stale_tables = set(MODEL_UPDATE_LOADERS)
+                wake_only = False
+                poll = False
+                await asyncio.sleep(3)
+    finally:
+        await ChangeListener.unsubscribe(subscription)
+
+async def request_model_updates_push():
+    """Ask the producing worker, wherever it runs, to push; once until the next push arrives"""
+    global model_updates_wake_pending
+    
+    if model_updates_wake_pending:
+        return
+    model_updates_wake_pending = True
+    try:
+        await request_wake(MODEL_UPDATES_CHANNEL)
+    except Exception as e:
+        model_updates_wake_pending = False
+        print(f"Failed to request model updates push: {e}")
+
+def update_subscription(
+    websocket: WebSocket,
+    request: dict,
+    filters: Dict[WebSocket, StreamFilter],
+    senders: StreamSenders
+) -> bool:
+    """
+    Apply a client's subscribe/unsubscribe request to its filter and
+    acknowledge it with a subscription message (an error message if the
+    request is malformed).
+    
+    Returns:
+        Whether the filter was updated
+    """
+    try:
+        stream_filter = apply_subscription(filters.get(websocket), request)
+    except ValueError as e:
+        senders.send(websocket, Frame.from_message({
+            "type": "error",
+            "message": f"Invalid {request.get('type')} request: {e}",
+            "timestamp": datetime.now().isoformat()
+        }))
+        return False
+    if stream_filter is None:
+        filters.pop(websocket, None)
+    else:
+        filters[websocket] = stream_filter
+    senders.send(websocket, Frame.from_message(subscription_message(stream_filter, datetime.now().isoformat())))
+    return True
+
+model_updates_leadership = StreamLeadership(MODEL_UPDATES_STREAM, broadcast_model_updates)
+model_updates_rates = ClientRates(
+    MODEL_UPDATES_STREAM, MODEL_UPDATES_INTERVAL_DEFAULT_MS / 1000, catch_up_model_updates
+)
+modeldata_rates = ClientRates(MODELDATA_STREAM, MODELDATA_INTERVAL_DEFAULT_MS / 1000, catch_up_modeldata)
+modeldata_leadership = StreamLeadership(MODELDATA_STREAM, broadcast_modeldata_updates)
+
+async def join_model_updates(
+    websocket: WebSocket,
+    encoding: str = TEXT_ENCODING,
+    compression: str = NO_COMPRESSION,
+    channel: Optional[str] = None,
+    mode: Optional[str] = None,
+    since: Optional[int] = None,
+    interval_ms: int = MODEL_UPDATES_INTERVAL_DEFAULT_MS
+):
+    """
+    Add an accepted connection to the model-updates stream: send it what it is
+    missing and start this worker's relay and producer election if needed
+    """
+    global broadcast_task, model_updates_relay_task
+    
+    model_updates_senders.register(websocket, encoding, compression, channel)
+    active_connections.add(websocket)
+    model_updates_rates.set(websocket, interval_ms / 1000)
+    
+    diff_mode = mode == "diff"
+    if diff_mode:
+        diff_client_versions[websocket] = None
+    
+    stale = not model_updates_frames or model_updates_frames["stale"]
+    if model_updates_frames:
+        # Serve the latest push this worker relayed, even one kept from before
+        # the relay last stopped; a current push follows when it is stale
+        version = model_updates_frames["version"]
+        if diff_mode:
+            diff_client_versions[websocket] = version
+            if since != version:
+                replay = None
+                if since is not None and model_updates_replay.last_seq == version:
+                    replay = model_updates_replay.merged(since, merge_model_updates_deltas)
+                if replay is None:
+                    replay = model_updates_frames["snapshot"]
+                model_updates_senders.send(websocket, replay)
+                model_updates_rates.sent(websocket)
+        elif since != version:
+            # combined_update carries whole tables, so there is nothing to replay
+            model_updates_senders.send(websocket, model_updates_frames["full"])
+            model_updates_rates.sent(websocket)
+    if stale and not diff_mode:
+        model_updates_waiting.add(websocket)
+    
+    # Start the relay and leader election if it's the first connection
+    if model_updates_relay_task is None or model_updates_relay_task.done():
+        model_updates_relay_task = asyncio.create_task(relay_frames(MODEL_UPDATES_STREAM, relay_model_updates))
+    if broadcast_task is None or broadcast_task.done():
+        broadcast_task = asyncio.create_task(model_updates_leadership.run())
+    if stale:
+        # Ask the producing worker, wherever it runs, to push right away
+        await request_model_updates_push()
+
+async def handle_model_updates_request(websocket: WebSocket, request: dict):
+    """Answer a model-updates client message: subscribe/unsubscribe, or sync in diff mode"""
+    diff_mode = websocket in diff_client_versions
+    if request.get("type") in SUBSCRIPTION_MESSAGES:
+        if update_subscription(websocket, request, model_updates_filters, model_updates_senders) and model_updates_frames:
+            stream_filter = model_updates_filters.get(websocket)
+            if diff_mode:
+                diff_client_versions[websocket] = model_updates_frames["version"]
+                model_updates_senders.send(websocket, model_updates_frame("snapshot", stream_filter))
+            else:
+                model_updates_senders.send(websocket, model_updates_frame("full", stream_filter))
+            model_updates_rates.sent(websocket)
+    elif (
+        diff_mode
+        and request.get("type") == "sync"
+        and model_updates_frames
+        and request.get("version") != model_updates_frames["version"]
+    ):
+        diff_client_versions[websocket] = model_updates_frames["version"]
+        model_updates_senders.send(
+            websocket, model_updates_frame("snapshot", model_updates_filters.get(websocket))
+        )
+        model_updates_rates.sent(websocket)
+
+def leave_model_updates(websocket: WebSocket):
+    """Remove a connection from the model-updates stream, stopping the relay after the last one"""
+    global broadcast_task, model_updates_relay_task, model_updates_wake_pending
+    
+    active_connections.discard(websocket)
+    model_updates_senders.unregister(websocket)
+    diff_client_versions.pop(websocket, None)
+    model_updates_waiting.discard(websocket)
+    model_updates_filters.pop(websocket, None)
+    model_updates_rates.remove(websocket)
+    
+    # Stop relaying and step down as producer if no connections remain
+    if not active_connections:
+        if broadcast_task and not broadcast_task.done():
+            broadcast_task.cancel()
+        if model_updates_relay_task and not model_updates_relay_task.done():
+            model_updates_relay_task.cancel()
+        broadcast_task = None
+        model_updates_relay_task = None
+        # Kept for the next connection, which also asks for a current push
+        if model_updates_frames:
+            model_updates_frames["stale"] = True
+        model_updates_wake_pending = False
+        
+    print(f"WebSocket connection cleaned up. Remaining connections: {len(active_connections)}")
+
+async def join_price_stream(
+    websocket: WebSocket,
+    encoding: str = TEXT_ENCODING,
+    compression: str = NO_COMPRESSION,
+    channel: Optional[str] = None,
+    conflation_ms: int = PRICE_CONFLATION_DEFAULT_MS,
+    since: Optional[int] = None
+):
+    """Add an accepted connection to the price stream and send it the prices it is missing"""
+    global price_broadcast_task
+    
+    price_stream_senders.register(websocket, encoding, compression, channel)
+    join_price_group(websocket, None, conflation_ms)
+    
+    # Send initial price data immediately upon connection
+    try:
+        # The ring only covers ticks this worker is still receiving
+        replay = None
+        current = False
+        if since is not None and price_broadcast_task is not None and not price_broadcast_task.done():
+            current = since == price_replay.last_seq
+            if not current:
+                replay = price_replay.merged(since, merge_price_replay)
+        if replay is not None:
+            price_stream_senders.send(websocket, replay)
+        elif not current:
+            # Shared snapshot; concurrent connects wait for a single refresh
+            price_stream_senders.send(websocket, await price_snapshots.get("initial_prices", build_price_snapshot))
+        
+    except Exception as e:
+        print(f"Failed to send initial price data: {e}")
+    
+    # Start price broadcast task if it's the first connection
+    if price_broadcast_task is None or price_broadcast_task.done():
+        price_broadcast_task = asyncio.create_task(broadcast_price_updates())
+
+async def handle_price_stream_request(websocket: WebSocket, request: dict):
+    """Apply a price-stream client's subscribe/unsubscribe and send the subscribed prices"""
+    group = price_stream_connections.get(websocket)
+    if group is None or request.get("type") not in SUBSCRIPTION_MESSAGES:
+        return
+    if update_subscription(websocket, request, price_stream_filters, price_stream_senders):
+        stream_filter = price_stream_filters.get(websocket)
+        # Model subscriptions do not narrow the price stream
+        symbols = stream_filter.symbols if stream_filter and stream_filter.symbols else None
+        join_price_group(websocket, symbols, group.conflation_ms)
+        price_stream_senders.send(websocket, await price_snapshots.get(
+            price_snapshot_key(symbols),
+            lambda: build_price_snapshot(symbols)
+        ))
+
+def leave_price_stream(websocket: WebSocket):
+    """Remove a connection from the price stream, stopping the broadcaster after the last one"""
+    global price_broadcast_task
+    
+    leave_price_group(websocket)
+    price_stream_filters.pop(websocket, None)
+    price_stream_senders.unregister(websocket)
+    
+    # Stop price broadcast task if no connections remain
+    if not price_stream_connections and price_broadcast_task and not price_broadcast_task.done():
+        price_broadcast_task.cancel()
+        price_broadcast_task = None
+        
+    print(f"Price stream connection cleaned up. Remaining connections: {len(price_stream_connections)}")
+
+def modeldata_client_options(websocket: WebSocket) -> Tuple[Tuple[str, int, Optional[int]], str]:
+    """A modeldata stream connection's (algorithm, points, window) view and layout"""
+    view = modeldata_client_views.get(websocket, (EVEN, MODELDATA_SAMPLE_POINTS, None))
+    layout = COLUMNAR_LAYOUT if websocket in columnar_modeldata_clients else ROWS_LAYOUT
+    return view, layout
+
+async def join_modeldata_stream(
+    websocket: WebSocket,
+    encoding: str = TEXT_ENCODING,
+    compression: str = NO_COMPRESSION,
+    channel: Optional[str] = None,
+    algorithm: str = EVEN,
+    points: int = MODELDATA_SAMPLE_POINTS,
+    window: Optional[int] = None,
+    layout: str = ROWS_LAYOUT,
+    interval_ms: int = MODELDATA_INTERVAL_DEFAULT_MS
+):
+    """Add an accepted connection to the modeldata stream and send it the initial modeldata"""
+    global modeldata_broadcast_task, modeldata_relay_task
+    
+    modeldata_senders.register(websocket, encoding, compression, channel)
+    modeldata_stream_connections.add(websocket)
+    modeldata_rates.set(websocket, interval_ms / 1000)
+    # A faster rate applies from the producer's next cycle
+    await publish_modeldata_interval()
+    
+    view = (algorithm, points, window)
+    if view != (EVEN, MODELDATA_SAMPLE_POINTS, None):
+        modeldata_client_views[websocket] = view
+    if layout == COLUMNAR_LAYOUT:
+        columnar_modeldata_clients.add(websocket)
+    
+    # Send initial modeldata immediately upon connection
+    try:
+        # Shared per view and layout; concurrent connects wait for a single refresh
+        initial_frame = await modeldata_snapshots.get(
+            (view, layout),
+            lambda: build_modeldata_snapshot(view, layout)
+        )
+        modeldata_senders.send(websocket, initial_frame)
+        modeldata_rates.sent(websocket)
+        
+    except Exception as e:
+        print(f"Failed to send initial modeldata: {e}")
+    
+    # Start modeldata broadcast task if it's the first connection
+    if modeldata_relay_task is None or modeldata_relay_task.done():
+        modeldata_relay_task = asyncio.create_task(relay_frames(MODELDATA_STREAM, relay_modeldata_updates))
+    if modeldata_broadcast_task is None or modeldata_broadcast_task.done():
+        modeldata_broadcast_task = asyncio.create_task(modeldata_leadership.run())
+        print("Started modeldata broadcast task")
+
+async def handle_modeldata_request(websocket: WebSocket, request: dict):
+    """Apply a modeldata stream client's subscribe/unsubscribe and send the subscribed models"""
+    if websocket not in modeldata_stream_connections or request.get("type") not in SUBSCRIPTION_MESSAGES:
+        return
+    if update_subscription(websocket, request, modeldata_filters, modeldata_senders):
+        view, layout = modeldata_client_options(websocket)
+        stream_filter = modeldata_filters.get(websocket)
+        modeldata_senders.send(websocket, await modeldata_snapshots.get(
+            (view, layout) if stream_filter is None else (view, layout, stream_filter),
+            lambda: build_modeldata_snapshot(view, layout, stream_filter)
+        ))
+
+def leave_modeldata_stream(websocket: WebSocket):
+    """Remove a connection from the modeldata stream, stopping the relay after the last one"""
+    global modeldata_broadcast_task, modeldata_relay_task
+    
+    modeldata_stream_connections.discard(websocket)
+    modeldata_client_views.pop(websocket, None)
+    columnar_modeldata_clients.discard(websocket)
+    modeldata_filters.pop(websocket, None)
+    modeldata_senders.unregister(websocket)
+    modeldata_rates.remove(websocket)
+    asyncio.create_task(publish_modeldata_interval())
+    
+    # Stop modeldata broadcast task if no connections remain
+    if not modeldata_stream_connections:
+        if modeldata_relay_task and not modeldata_relay_task.done():
+            modeldata_relay_task.cancel()
+        modeldata_relay_task = None
+        if modeldata_broadcast_task and not modeldata_broadcast_task.done():
+            modeldata_broadcast_task.cancel()
+            modeldata_broadcast_task = None
+            print("Stopped modeldata broadcast task")
+        
+    print(f"Modeldata stream connection cleaned up. Remaining connections: {len(modeldata_stream_connections)}")
+
+async def relay_trade_tickets(meta: dict, frames: Dict[str, bytes]):
+    """Forward a published trade ticket event to this worker's trade-tickets connections"""
+    frame = Frame(frames["message"])
+    for ws in list(trade_tickets_connections):
+        stream_filter = trade_tickets_filters.get(ws)
+        if stream_filter is None or stream_filter.matches_model(meta):
+            trade_tickets_senders.send(ws, frame)
+
+async def join_trade_tickets(
+    websocket: WebSocket,
+    encoding: str = TEXT_ENCODING,
+    compression: str = NO_COMPRESSION,
+    channel: Optional[str] = None
+):
+    """Add an accepted connection to the trade-tickets stream, starting the relay after the first one"""
+    global trade_tickets_relay_task
+    
+    trade_tickets_senders.register(websocket, encoding, compression, channel)
+    trade_tickets_connections.add(websocket)
+    if trade_tickets_relay_task is None or trade_tickets_relay_task.done():
+        trade_tickets_relay_task = asyncio.create_task(relay_frames(TRADE_TICKETS_STREAM, relay_trade_tickets))
+
+async def handle_trade_tickets_request(websocket: WebSocket, request: dict):
+    """Apply a trade-tickets client's subscribe/unsubscribe"""
+    if websocket in trade_tickets_connections and request.get("type") in SUBSCRIPTION_MESSAGES:
+        update_subscription(websocket, request, trade_tickets_filters, trade_tickets_senders)
+
+def leave_trade_tickets(websocket: WebSocket):
+    """Remove a connection from the trade-tickets stream, stopping the relay after the last one"""
+    global trade_tickets_relay_task
+    
+    trade_tickets_connections.discard(websocket)
+    trade_tickets_filters.pop(websocket, None)
+    trade_tickets_senders.unregister(websocket)
+    if not trade_tickets_connections and trade_tickets_relay_task and not trade_tickets_relay_task.done():
+        trade_tickets_relay_task.cancel()
+        trade_tickets_relay_task = None
+
+def echo_message(message: str) -> Frame:
+    return Frame.from_message({
+        "type": "echo",
+        "message": f"Received: {message}",
+        "timestamp": datetime.now().isoformat()
+    })
 
 @router.websocket("/model-updates")
-async def model_updates_websocket(websocket: WebSocket):
+async def model_updates_websocket(
+    websocket: WebSocket,
+    mode: Optional[str] = Query(None, description="Set to 'diff' to receive a snapshot followed by row-level deltas"),
+    since: Optional[int] = Query(None, description="seq of the last frame received before reconnecting"),
+    interval_ms: int = Query(
+        MODEL_UPDATES_INTERVAL_DEFAULT_MS,
+        ge=0,
+        le=MODEL_UPDATES_INTERVAL_MAX_MS,
+        description="Minimum time between two pushes; pushes in between are skipped and caught up afterwards"
+    ),
+    encoding: str = Query(
+        TEXT_ENCODING,
+        pattern=FRAME_ENCODING_PATTERN,
+        description="'binary' sends the JSON frames as binary WebSocket messages, 'msgpack' sends MessagePack"
+    ),
+    compression: str = Query(
+        NO_COMPRESSION,
+        pattern=FRAME_COMPRESSION_PATTERN,
+        description="'deflate' sends every frame zlib-compressed in a binary message"
+    )
+):
     """
     WebSocket endpoint that broadcasts a combined update message containing:
     1. position_updates - All positions from the position table
     2. trade_updates - Latest 30 trades from the trades table
     3. modelchat_updates - Latest 30 model chats from the modelchat table
     
-    Uses a single background task to broadcast to all connections efficiently
-    """
-    global broadcast_task
+    Uses a single background task to broadcast to all connections efficiently.
+    Updates are pushed as soon as a write route commits a change. With several
+    workers, one of them produces the updates and all of them relay them.
     
-    await websocket.accept()
-    active_connections.add(websocket)
+    With ?mode=diff the client receives a combined_snapshot on connect and
+    afterwards only combined_delta messages carrying upserted rows and removed
+    ids per table, tagged with version/base_version. A client that notices a
+    gap can send {"type": "sync", "version": <its version>} to get a new
+    snapshot; clients that fall behind are sent one automatically.
     
-    # Start broadcast task if it's the first connection
-    if broadcast_task is None or broadcast_task.done():
-        broadcast_task = asyncio.create_task(broadcast_model_updates())
+    Every frame carries a seq (the version). A client reconnecting with
+    ?since=<seq> is sent nothing if it is current; in diff mode it gets one
+    combined_delta covering what it missed, or a snapshot when that is no
+    longer in the replay ring.
+    
+    Clients can narrow the stream to some models with {"type": "subscribe",
+    "ai_model_ids": [...], "code_names": [...]} and widen it again with
+    "unsubscribe"; each change is answered with a subscription message and
+    a fresh update or snapshot of the subscribed rows.
+    
+    With ?interval_ms=<ms> the client receives at most one push per interval;
+    what changed in between arrives as one update (in diff mode, one merged
+    delta) when the interval has passed.
+    """
+    await websocket.accept()
+    await join_model_updates(websocket, encoding, compression, mode=mode, since=since, interval_ms=interval_ms)
     
     try:
         # Keep connection alive - just listen for client messages or disconnections
         while True:
             try:
                 # This will block until client sends a message or disconnects
-                await websocket.receive_text()
+                message = await websocket.receive_text()
             except WebSocketDisconnect:
                 print("Client disconnected normally")
                 break
             
+            try:
+                request = json.loads(message)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(request, dict):
+                await handle_model_updates_request(websocket, request)
+            
     except WebSocketDisconnect:
         print("Client disconnected from model-updates")
     except Exception as e:
         print(f"WebSocket error in model-updates: {e}")
     finally:
         # Always clean up the connection
-        active_connections.discard(websocket)
-        
-        # Stop broadcast task if no connections remain
-        if not active_connections and broadcast_task and not broadcast_task.done():
-            broadcast_task.cancel()
-            broadcast_task = None
-            
-        print(f"WebSocket connection cleaned up. Remaining connections: {len(active_connections)}")
+        leave_model_updates(websocket)
 
 
 @router.websocket("/price-stream")
-async def price_stream_websocket(websocket: WebSocket):
+async def price_stream_websocket(
+    websocket: WebSocket,
+    conflation_ms: int = Query(
+        PRICE_CONFLATION_DEFAULT_MS,
+        ge=0,
+        le=PRICE_CONFLATION_MAX_MS,
+        description="Minimum time between two price_update messages; changes in between are merged"
+    ),
+    since: Optional[int] = Query(None, description="seq of the last frame received before reconnecting"),
+    encoding: str = Query(
+        TEXT_ENCODING,
+        pattern=FRAME_ENCODING_PATTERN,
+        description="'binary' sends the JSON frames as binary WebSocket messages, 'msgpack' sends MessagePack"
+    ),
+    compression: str = Query(
+        NO_COMPRESSION,
+        pattern=FRAME_COMPRESSION_PATTERN,
+        description="'deflate' sends every frame zlib-compressed in a binary message"
+    )
+):
     """
     WebSocket endpoint for real-time price streaming
-    Broadcasts price updates for all tickers every second
+    Sends all tickers on connect, then forwards only the symbols that changed
+    as ticks are published, at most once per conflation window
+    Clients can limit the stream to some tickers with
+    {"type": "subscribe", "symbols": [...]} and "unsubscribe"
+    A client reconnecting with ?since=<seq> gets only the tickers that changed
+    after it, or all of them when they are no longer in the replay ring
     """
-    global price_broadcast_task
-    
     await websocket.accept()
-    price_stream_connections.add(websocket)
-    
-    # Send initial price data immediately upon connection
-    try:
-        # Fetch initial price data from Redis
-        ltp_data = redis_client.hgetall('ltp_data')
-        initial_data = {}
-        
-        if ltp_data:
-            for symbol, ticker_data in ltp_data.items():
-                try:
-                    last_price = ticker_data.get('last_price', 0)
-                    change_pct = ticker_data.get('change', 0)
-                    
-                    # Convert change percentage to percentage format
-                    if abs(change_pct) < 1:
-                        change_percent = round(change_pct * 100, 2)
-                    else:
-                        change_percent = round(change_pct, 2)
-                    
-                    # Determine direction based on change
-                    if change_percent > 0:
-                        change_direction = "up"
-                    elif change_percent < 0:
-                        change_direction = "down"
-                    else:
-                        change_direction = "neutral"
-                    
-                    initial_data[symbol] = {
-                        "symbol": symbol,
-                        "price": round(float(last_price), 2),
-                        "change_percent": change_percent,
-                        "change_direction": change_direction,
-                        "last_trade_time": ticker_data.get('last_trade_time', ''),
-                        "exchange_timestamp": ticker_data.get('exchange_timestamp', '')
-                    }
-                    
-                except (KeyError, TypeError, ValueError) as e:
-                    print(f"Error processing initial ticker data for {symbol}: {e}")
-                    continue
-        else:
-            print("No initial LTP data available in Redis")
-        
-        initial_message = {
-            "type": "initial_prices",
-            "timestamp": datetime.now().isoformat(),
-            "data": initial_data
-        }
-        
-        await websocket.send_text(json.dumps(initial_message, default=str))
-        
-    except Exception as e:
-        print(f"Failed to send initial price data: {e}")
-    
-    # Start price broadcast task if it's the first connection
-    if price_broadcast_task is None or price_broadcast_task.done():
-        price_broadcast_task = asyncio.create_task(broadcast_price_updates())
+    await join_price_stream(websocket, encoding, compression, conflation_ms=conflation_ms, since=since)
     
     try:
         # Keep connection alive - just listen for client messages or disconnections
@@ -506,12 +1478,12 @@ async def price_stream_websocket(websocket: WebSocket):
             try:
                 # This will block until client sends a message or disconnects
                 message = await websocket.receive_text()
+                request = parse_subscription_request(message)
+                if request is not None:
+                    await handle_price_stream_request(websocket, request)
+                    continue
                 # Echo back any messages (optional - can be used for ping/pong)
-                await websocket.send_text(json.dumps({
-                    "type": "echo",
-                    "message": f"Received: {message}",
-                    "timestamp": datetime.now().isoformat()
-                }))
+                price_stream_senders.send(websocket, echo_message(message))
             except WebSocketDisconnect:
                 print("Client disconnected normally from price stream")
                 break
@@ -522,149 +1494,59 @@ async def price_stream_websocket(websocket: WebSocket):
         print(f"WebSocket error in price-stream: {e}")
     finally:
         # Always clean up the connection
-        price_stream_connections.discard(websocket)
-        
-        # Stop price broadcast task if no connections remain
-        if not price_stream_connections and price_broadcast_task and not price_broadcast_task.done():
-            price_broadcast_task.cancel()
-            price_broadcast_task = None
-            
-        print(f"Price stream connection cleaned up. Remaining connections: {len(price_stream_connections)}")
+        leave_price_stream(websocket)
 
 
 @router.websocket("/modeldata-stream")
-async def modeldata_stream_websocket(websocket: WebSocket):
+async def modeldata_stream_websocket(
+    websocket: WebSocket,
+    encoding: str = Query(
+        TEXT_ENCODING,
+        pattern=FRAME_ENCODING_PATTERN,
+        description="'binary' sends the JSON frames as binary WebSocket messages, 'msgpack' sends MessagePack"
+    ),
+    compression: str = Query(
+        NO_COMPRESSION,
+        pattern=FRAME_COMPRESSION_PATTERN,
+        description="'deflate' sends every frame zlib-compressed in a binary message"
+    ),
+    algorithm: str = Query(
+        EVEN,
+        pattern=ALGORITHM_PATTERN,
+        description="Downsampling: 'even' spacing, 'lttb' (Largest-Triangle-Three-Buckets) or 'minmax' per bucket"
+    ),
+    points: int = Query(MODELDATA_SAMPLE_POINTS, ge=MODELDATA_MIN_POINTS, le=MODELDATA_MAX_POINTS, description="Points per model"),
+    window: Optional[int] = Query(
+        None,
+        ge=MODELDATA_MIN_WINDOW,
+        description="Only the last `window` seconds of each model's history (default: all of it)"
+    ),
+    layout: str = Query(
+        ROWS_LAYOUT,
+        pattern=LAYOUT_PATTERN,
+        description="'columnar' sends each model's header once with delta-encoded times and flat metric arrays"
+    ),
+    interval_ms: int = Query(
+        MODELDATA_INTERVAL_DEFAULT_MS,
+        ge=MODELDATA_INTERVAL_MIN_MS,
+        le=MODELDATA_INTERVAL_MAX_MS,
+        description="Time between two modeldata updates"
+    )
+):
     """
     WebSocket endpoint for real-time modeldata streaming
-    Broadcasts resampled modeldata grouped by display_name every 20 seconds
-    Each group contains exactly 500 evenly distributed data points across time
+    Broadcasts resampled modeldata grouped by display_name every 20 seconds,
+    or every interval_ms when the client asks for another rate
+    By default each group contains 500 evenly distributed data points across time;
+    clients can pick the downsampling algorithm, point count, time window and layout,
+    and limit the stream to some models with {"type": "subscribe", "ai_model_ids": [...],
+    "code_names": [...]} and "unsubscribe"
     """
-    global modeldata_broadcast_task
-    
     await websocket.accept()
-    modeldata_stream_connections.add(websocket)
-    
-    # Send initial modeldata immediately upon connection
-    try:
-        from config.database import Database
-        from sqlalchemy import text
-        
-        async with Database.async_session_maker() as session:
-            # Get initial data - same logic as broadcast function but for immediate response
-            ai_models_query = text("""
-                SELECT id, code_name, display_name 
-                FROM ai_models 
-                ORDER BY id
-            """)
-            ai_models_result = await session.execute(ai_models_query)
-            ai_models = ai_models_result.fetchall()
-            
-            initial_data = {}
-            
-            for ai_model in ai_models:  # Process all available models for initial load
-                ai_model_id = ai_model[0]
-                code_name = ai_model[1] 
-                display_name = ai_model[2]
-                
-                resample_query = text("""
-                    WITH ranked_data AS (
-                        SELECT 
-                            id,
-                            ai_model_id,
-                            code_name,
-                            display_name,
-                            account_value,
-                            return_value,
-                            total_pnl,
-                            fees,
-                            trades,
-                            created_at,
-                            ROW_NUMBER() OVER (ORDER BY created_at) as row_num,
-                            COUNT(*) OVER () as total_rows
-                        FROM modeldata 
-                        WHERE ai_model_id = :ai_model_id
-                        ORDER BY created_at
-                    ),
-                    sampled_indices AS (
-                        SELECT 
-                            CASE 
-                                WHEN total_rows <= 500 THEN row_num
-                                WHEN row_num = 1 THEN 1  -- Always include first point
-                                WHEN row_num = total_rows THEN total_rows  -- Always include last point
-                                ELSE CAST(1 + ROUND((row_num - 1) * (total_rows - 1) / 499.0) AS INTEGER)
-                            END as sample_index
-                        FROM ranked_data
-                        WHERE total_rows > 0
-                    ),
-                    final_sample AS (
-                        SELECT DISTINCT sample_index 
-                        FROM sampled_indices 
-                        ORDER BY sample_index
-                        LIMIT 500
-                    )
-                    SELECT 
-                        rd.id,
-                        rd.ai_model_id,
-                        rd.code_name,
-                        rd.display_name,
-                        rd.account_value,
-                        rd.return_value,
-                        rd.total_pnl,
-                        rd.fees,
-                        rd.trades,
-                        rd.created_at
-                    FROM ranked_data rd
-                    INNER JOIN final_sample fs ON rd.row_num = fs.sample_index
-                    ORDER BY rd.created_at
-                """)
-                
-                result = await session.execute(resample_query, {"ai_model_id": ai_model_id})
-                rows = result.fetchall()
-                
-                if rows:
-                    data_points = []
-                    for row in rows:
-                        data_points.append({
-                            "id": row[0],
-                            "ai_model_id": row[1],
-                            "code_name": row[2],
-                            "display_name": row[3],
-                            "account_value": float(row[4]) if row[4] is not None else None,
-                            "return_value": float(row[5]) if row[5] is not None else None,
-                            "total_pnl": float(row[6]) if row[6] is not None else None,
-                            "fees": float(row[7]) if row[7] is not None else None,
-                            "trades": int(row[8]) if row[8] is not None else None,
-                            "created_at": row[9].isoformat() if row[9] else None
-                        })
-                    
-                    initial_data[str(ai_model_id)] = {
-                        "ai_model_id": ai_model_id,
-                        "code_name": code_name,
-                        "display_name": display_name,
-                        "data_points": data_points,
-                        "total_points": len(data_points),
-                        "latest_timestamp": data_points[-1]["created_at"] if data_points else None,
-                        "first_timestamp": data_points[0]["created_at"] if data_points else None
-                    }
-        
-        initial_message = {
-            "type": "initial_modeldata",
-            "timestamp": datetime.now().isoformat(),
-            "total_groups": len(initial_data),
-            "note": "Initial load with all AI models. Updates will be sent every 20 seconds.",
-            "data": initial_data
-        }
-        
-        await websocket.send_text(json.dumps(initial_message, default=str))
-        print(f"Sent initial modeldata with {len(initial_data)} groups")
-        
-    except Exception as e:
-        print(f"Failed to send initial modeldata: {e}")
-    
-    # Start modeldata broadcast task if it's the first connection
-    if modeldata_broadcast_task is None or modeldata_broadcast_task.done():
-        modeldata_broadcast_task = asyncio.create_task(broadcast_modeldata_updates())
-        print("Started modeldata broadcast task")
+    await join_modeldata_stream(
+        websocket, encoding, compression,
+        algorithm=algorithm, points=points, window=window, layout=layout, interval_ms=interval_ms
+    )
     
     try:
         # Keep connection alive - just listen for client messages or disconnections
@@ -672,12 +1554,12 @@ async def modeldata_stream_websocket(websocket: WebSocket):
             try:
                 # This will block until client sends a message or disconnects
                 message = await websocket.receive_text()
+                request = parse_subscription_request(message)
+                if request is not None:
+                    await handle_modeldata_request(websocket, request)
+                    continue
                 # Echo back any messages (optional - can be used for ping/pong)
-                await websocket.send_text(json.dumps({
-                    "type": "echo",
-                    "message": f"Received: {message}",
-                    "timestamp": datetime.now().isoformat()
-                }))
+                modeldata_senders.send(websocket, echo_message(message))
             except WebSocketDisconnect:
                 print("Client disconnected normally from modeldata stream")
                 break
@@ -688,15 +1570,227 @@ async def modeldata_stream_websocket(websocket: WebSocket):
         print(f"WebSocket error in modeldata-stream: {e}")
     finally:
         # Always clean up the connection
-        modeldata_stream_connections.discard(websocket)
+        leave_modeldata_stream(websocket)
+
+
+@router.websocket("/trade-tickets")
+async def trade_tickets_websocket(
+    websocket: WebSocket,
+    encoding: str = Query(
+        TEXT_ENCODING,
+        pattern=FRAME_ENCODING_PATTERN,
+        description="'binary' sends the JSON frames as binary WebSocket messages, 'msgpack' sends MessagePack"
+    ),
+    compression: str = Query(
+        NO_COMPRESSION,
+        pattern=FRAME_COMPRESSION_PATTERN,
+        description="'deflate' sends every frame zlib-compressed in a binary message"
+    )
+):
+    """
+    WebSocket endpoint reporting trades queued with POST /models/queue_trade
+    
+    Sends {"type": "trade_ticket", "ticket": {...}} when a queued trade is
+    executed, rejected or fails; the ticket is the one GET
+    /models/trade_ticket/{ticket_id} returns. Clients can narrow the stream
+    to some models with {"type": "subscribe", "ai_model_ids": [...],
+    "code_names": [...]} and widen it again with "unsubscribe".
+    """
+    await websocket.accept()
+    await join_trade_tickets(websocket, encoding, compression)
+    
+    try:
+        while True:
+            try:
+                message = await websocket.receive_text()
+            except WebSocketDisconnect:
+                print("Client disconnected normally from trade-tickets")
+                break
+            
+            try:
+                request = json.loads(message)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(request, dict):
+                await handle_trade_tickets_request(websocket, request)
+            
+    except WebSocketDisconnect:
+        print("Client disconnected from trade-tickets")
+    except Exception as e:
+        print(f"WebSocket error in trade-tickets: {e}")
+    finally:
+        leave_trade_tickets(websocket)
+
+
+def _int_option(request: dict, name: str, default: Optional[int], minimum: Optional[int] = None, maximum: Optional[int] = None) -> Optional[int]:
+    value = request.get(name, default)
+    if value is None:
+        return None
+    if (
+        not isinstance(value, int)
+        or isinstance(value, bool)
+        or (minimum is not None and value < minimum)
+        or (maximum is not None and value > maximum)
+    ):
+        bounds = f" between {minimum} and {maximum}" if maximum is not None else (f" of at least {minimum}" if minimum is not None else "")
+        raise ValueError(f"'{name}' must be an integer{bounds}")
+    return value
+
+def _choice_option(request: dict, name: str, default: Optional[str], choices: Tuple) -> Optional[str]:
+    value = request.get(name, default)
+    if value != default and value not in choices:
+        raise ValueError(f"'{name}' must be one of {', '.join(choices)}")
+    return value
+
+def parse_channel_options(channel: str, request: dict) -> dict:
+    """
+    The options of a channel subscribe message on /ws/stream, validated like
+    the query parameters of the channel's own endpoint
+    
+    Raises:
+        ValueError: If an option is invalid
+    """
+    if channel == MODEL_UPDATES_STREAM:
+        return {
+            "mode": _choice_option(request, "mode", None, ("diff",)),
+            "since": _int_option(request, "since", None),
+            "interval_ms": _int_option(
+                request, "interval_ms", MODEL_UPDATES_INTERVAL_DEFAULT_MS, 0, MODEL_UPDATES_INTERVAL_MAX_MS
+            )
+        }
+    if channel == TRADE_TICKETS_STREAM:
+        return {}
+    if channel == PRICE_STREAM:
+        return {
+            "conflation_ms": _int_option(request, "conflation_ms", PRICE_CONFLATION_DEFAULT_MS, 0, PRICE_CONFLATION_MAX_MS),
+            "since": _int_option(request, "since", None)
+        }
+    return {
+        "algorithm": _choice_option(request, "algorithm", EVEN, ALGORITHMS),
+        "points": _int_option(request, "points", MODELDATA_SAMPLE_POINTS, MODELDATA_MIN_POINTS, MODELDATA_MAX_POINTS),
+        "window": _int_option(request, "window", None, MODELDATA_MIN_WINDOW),
+        "layout": _choice_option(request, "layout", ROWS_LAYOUT, LAYOUTS),
+        "interval_ms": _int_option(
+            request, "interval_ms", MODELDATA_INTERVAL_DEFAULT_MS, MODELDATA_INTERVAL_MIN_MS, MODELDATA_INTERVAL_MAX_MS
+        )
+    }
+
+# Channels of /ws/stream: join, message handler and leave of each stream
+STREAM_CHANNELS = {
+    MODEL_UPDATES_STREAM: (join_model_updates, handle_model_updates_request, leave_model_updates),
+    PRICE_STREAM: (join_price_stream, handle_price_stream_request, leave_price_stream),
+    MODELDATA_STREAM: (join_modeldata_stream, handle_modeldata_request, leave_modeldata_stream),
+    TRADE_TICKETS_STREAM: (join_trade_tickets, handle_trade_tickets_request, leave_trade_tickets),
+}
+
+def stream_control_message(message_type: str, **fields) -> Frame:
+    return Frame.from_message({"type": message_type, **fields, "timestamp": datetime.now().isoformat()})
+
+@router.websocket("/stream")
+async def multiplexed_stream_websocket(
+    websocket: WebSocket,
+    channels: Optional[List[str]] = Query(
+        None,
+        description="Channels to join on connect with their default options: model-updates, price-stream, modeldata-stream, trade-tickets"
+    ),
+    encoding: str = Query(
+        TEXT_ENCODING,
+        pattern=FRAME_ENCODING_PATTERN,
+        description="'binary' sends the JSON frames as binary WebSocket messages, 'msgpack' sends MessagePack"
+    ),
+    compression: str = Query(
+        NO_COMPRESSION,
+        pattern=FRAME_COMPRESSION_PATTERN,
+        description="'deflate' sends every frame zlib-compressed in a binary message"
+    )
+):
+    """
+    Single WebSocket carrying the model-updates, price-stream, modeldata-stream
+    and trade-tickets channels, fed by the same producers as their own endpoints
+    
+    Channel frames arrive as {"channel": <channel>, "message": <the channel's message>}.
+    Control messages:
+    - {"type": "subscribe", "channel": ..., <options>} joins a channel; the options
+      are the channel endpoint's query parameters (mode, since, interval_ms,
+      conflation_ms, algorithm, points, window, layout)
+    - {"type": "unsubscribe", "channel": ...} leaves it
+    - subscribe/unsubscribe with ai_model_ids, code_names or symbols on a joined
+      channel changes its filter, and other messages with a channel (e.g. sync)
+      go to that channel, as on its own endpoint
+    Membership changes are answered with {"type": "channels", "channels": [...]}.
+    """
+    await websocket.accept()
+    stream_senders.register(websocket, encoding, compression)
+    joined: Set[str] = set()
+    
+    async def join(channel: str, request: dict):
+        join_channel = STREAM_CHANNELS[channel][0]
+        await join_channel(websocket, encoding, compression, channel, **parse_channel_options(channel, request))
+        joined.add(channel)
+    
+    def send_channels():
+        stream_senders.send(websocket, stream_control_message("channels", channels=sorted(joined)))
+    
+    try:
+        for channel in dict.fromkeys(channels or []):
+            if channel in STREAM_CHANNELS:
+                await join(channel, {})
+        send_channels()
         
-        # Stop modeldata broadcast task if no connections remain
-        if not modeldata_stream_connections and modeldata_broadcast_task and not modeldata_broadcast_task.done():
-            modeldata_broadcast_task.cancel()
-            modeldata_broadcast_task = None
-            print("Stopped modeldata broadcast task")
+        while True:
+            try:
+                message = await websocket.receive_text()
+            except WebSocketDisconnect:
+                print("Client disconnected normally from stream")
+                break
+            
+            try:
+                request = json.loads(message)
+            except json.JSONDecodeError:
+                request = None
+            if not isinstance(request, dict):
+                stream_senders.send(websocket, stream_control_message("error", message="Messages must be JSON objects"))
+                continue
+            
+            channel = request.get("channel")
+            if channel not in STREAM_CHANNELS:
+                stream_senders.send(websocket, stream_control_message(
+                    "error", message=f"Unknown channel {channel!r}; expected one of {', '.join(STREAM_CHANNELS)}"
+                ))
+                continue
+            
+            message_type = request.get("type")
+            changes_filter = any(field in request for field in FILTER_FIELDS)
+            if channel not in joined:
+                if message_type != SUBSCRIBE:
+                    stream_senders.send(websocket, stream_control_message(
+                        "error", message=f"Not subscribed to channel {channel!r}"
+                    ))
+                    continue
+                try:
+                    await join(channel, request)
+                except ValueError as e:
+                    stream_senders.send(websocket, stream_control_message("error", channel=channel, message=str(e)))
+                    continue
+                send_channels()
+                if changes_filter:
+                    await STREAM_CHANNELS[channel][1](websocket, request)
+            elif message_type == UNSUBSCRIBE and not changes_filter:
+                joined.discard(channel)
+                STREAM_CHANNELS[channel][2](websocket)
+                send_channels()
+            else:
+                await STREAM_CHANNELS[channel][1](websocket, request)
             
-        print(f"Modeldata stream connection cleaned up. Remaining connections: {len(modeldata_stream_connections)}")
+    except WebSocketDisconnect:
+        print("Client disconnected from stream")
+    except Exception as e:
+        print(f"WebSocket error in stream: {e}")
+    finally:
+        # Always clean up the connection and every channel it joined
+        for channel in joined:
+            STREAM_CHANNELS[channel][2](websocket)
+        stream_senders.unregister(websocket)
 
 
 @router.get("/status")
@@ -706,22 +1800,67 @@ async def websocket_status():
         "total_connections": len(manager.active_connections),
         "user_connections": len(manager.user_connections),
         "model_update_connections": len(active_connections),
+        "model_update_diff_connections": len(diff_client_versions),
+        "model_updates_version": model_updates_frames.get("version"),
         "price_stream_connections": len(price_stream_connections),
         "modeldata_stream_connections": len(modeldata_stream_connections),
+        "trade_tickets_connections": len(trade_tickets_connections),
+        "multiplexed_connections": len(stream_senders.senders),
         "model_updates_task_running": broadcast_task is not None and not broadcast_task.done() if broadcast_task else False,
         "price_stream_task_running": price_broadcast_task is not None and not price_broadcast_task.done() if price_broadcast_task else False,
         "modeldata_stream_task_running": modeldata_broadcast_task is not None and not modeldata_broadcast_task.done() if modeldata_broadcast_task else False,
+        "worker_id": WORKER_ID,
+        "model_updates_leader": model_updates_leadership.is_leader,
+        "modeldata_stream_leader": modeldata_leadership.is_leader,
+        "modeldata_cache": ModelDataCache.status(),
+        "trade_queue": TradeQueue.status(),
+        "snapshots": {
+            snapshots.stream: snapshots.status()
+            for snapshots in (price_snapshots, modeldata_snapshots)
+        },
+        "model_updates_snapshot_stale": model_updates_frames.get("stale"),
+        "replay": {
+            ring.stream: ring.status()
+            for ring in (model_updates_replay, price_replay)
+        },
+        "subscribed_connections": {
+            MODEL_UPDATES_STREAM: len(model_updates_filters),
+            PRICE_STREAM: len(price_stream_filters),
+            MODELDATA_STREAM: len(modeldata_filters),
+            TRADE_TICKETS_STREAM: len(trade_tickets_filters)
+        },
+        "price_stream_groups": len(price_stream_groups),
+        "client_rates": {
+            rates.stream: rates.status()
+            for rates in (model_updates_rates, modeldata_rates)
+        },
+        "send_queues": {
+            senders.stream: senders.status()
+            for senders in (
+                model_updates_senders, price_stream_senders, modeldata_senders, trade_tickets_senders, stream_senders
+            )
+        },
         "broadcast_types": [
             "combined_update",
+            "combined_snapshot",
+            "combined_delta",
             "price_update", 
             "initial_prices",
             "modeldata_update",
-            "initial_modeldata"
+            "initial_modeldata",
+            "trade_ticket",
+            "subscription",
+            "heartbeat"
         ],
         "broadcast_intervals": {
-            "model_updates": "3 seconds",
-            "price_updates": "1 second", 
-            "modeldata_updates": "20 seconds"
+            "model_updates": f"on change, at most once per client interval_ms (fallback {MODEL_UPDATES_FALLBACK_INTERVAL} seconds)",
+            "price_updates": "on tick (per-client conflation window)",
+            "modeldata_updates": (
+                f"per-client interval_ms ({MODELDATA_INTERVAL_MIN_MS}-{MODELDATA_INTERVAL_MAX_MS} ms, "
+                f"default {MODELDATA_INTERVAL_DEFAULT_MS}), produced at the fastest, when modeldata changed"
+            ),
+            "trade_tickets": "when a queued trade completes",
+            "heartbeat": f"{STREAM_HEARTBEAT_INTERVAL} seconds without updates"
         },
         "status": "operational"
     }
@@ -11,10 +11,11 @@ from .positions import Position
 from .modelchat import ModelChat
 from .trades import Trade
 from .modeldata import ModelData
+from .modeldata_rollup import ModelDataRollup
 from .user import User
 
 # Export all models for easy imports
-__all__ = ["Base", "AIModel", "Position", "ModelChat", "Trade", "ModelData", "User"]
+__all__ = ["Base", "AIModel", "Position", "ModelChat", "Trade", "ModelData", "ModelDataRollup", "User"]
 
 # Auto-discovery of all models for table creation
-MODELS = [AIModel, Position, ModelChat, Trade, ModelData, User]
+MODELS = [AIModel, Position, ModelChat, Trade, ModelData, ModelDataRollup, User]
@@ -6,7 +6,7 @@ Contains both SQLAlchemy model and Pydantic schemas in one file.
 
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel, Field
 from config.database import Base
@@ -35,6 +35,11 @@ class ModelData(Base):
     
     # Relationship to AIModel
     ai_model = relationship("AIModel", back_populates="model_data")
+    
+    # Per-model history in time order, used by the modeldata resampling
+    __table_args__ = (
+        Index("ix_modeldata_ai_model_id_created_at", "ai_model_id", "created_at"),
+    )
 
 
 # ============================================================================
@@ -0,0 +1,92 @@
+"""
+ModelData Rollup Table Definition
+---------------------------------
+Open/high/low/close of every modeldata metric per AI model and time bucket,
+at 1-minute, 15-minute, 1-hour and 1-day resolution. Contains both the
+SQLAlchemy model and the Pydantic schema in one file.
+"""
+
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import Column, Integer, BigInteger, Float, DateTime, ForeignKey
+from pydantic import BaseModel
+from config.database import Base
+
+
+# ============================================================================
+# SQLAlchemy Model (Database Table)
+# ============================================================================
+
+class ModelDataRollup(Base):
+    """Database table for bucketed modeldata, one row per (resolution, model, bucket)"""
+    __tablename__ = "modeldata_rollups"
+
+    # Bucket width in seconds
+    resolution = Column(Integer, primary_key=True)
+    ai_model_id = Column(Integer, ForeignKey("ai_models.id"), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+
+    account_value_open = Column(Float, nullable=True)
+    account_value_high = Column(Float, nullable=True)
+    account_value_low = Column(Float, nullable=True)
+    account_value_close = Column(Float, nullable=True)
+    return_value_open = Column(Float, nullable=True)
+    return_value_high = Column(Float, nullable=True)
+    return_value_low = Column(Float, nullable=True)
+    return_value_close = Column(Float, nullable=True)
+    total_pnl_open = Column(Float, nullable=True)
+    total_pnl_high = Column(Float, nullable=True)
+    total_pnl_low = Column(Float, nullable=True)
+    total_pnl_close = Column(Float, nullable=True)
+    fees_open = Column(Float, nullable=True)
+    fees_high = Column(Float, nullable=True)
+    fees_low = Column(Float, nullable=True)
+    fees_close = Column(Float, nullable=True)
+    trades_open = Column(Integer, nullable=True)
+    trades_high = Column(Integer, nullable=True)
+    trades_low = Column(Integer, nullable=True)
+    trades_close = Column(Integer, nullable=True)
+
+    # modeldata rows folded into the bucket, and the first/last of them
+    sample_count = Column(Integer, nullable=False, default=0)
+    first_at = Column(DateTime, nullable=False)
+    last_at = Column(DateTime, nullable=False)
+    last_id = Column(BigInteger, nullable=False)
+
+
+# ============================================================================
+# Pydantic Schemas (API Request/Response)
+# ============================================================================
+
+class ModelDataRollupResponse(BaseModel):
+    """Schema for modeldata rollup response"""
+    resolution: int
+    ai_model_id: int
+    bucket_start: datetime
+    account_value_open: Optional[float] = None
+    account_value_high: Optional[float] = None
+    account_value_low: Optional[float] = None
+    account_value_close: Optional[float] = None
+    return_value_open: Optional[float] = None
+    return_value_high: Optional[float] = None
+    return_value_low: Optional[float] = None
+    return_value_close: Optional[float] = None
+    total_pnl_open: Optional[float] = None
+    total_pnl_high: Optional[float] = None
+    total_pnl_low: Optional[float] = None
+    total_pnl_close: Optional[float] = None
+    fees_open: Optional[float] = None
+    fees_high: Optional[float] = None
+    fees_low: Optional[float] = None
+    fees_close: Optional[float] = None
+    trades_open: Optional[int] = None
+    trades_high: Optional[int] = None
+    trades_low: Optional[int] = None
+    trades_close: Optional[int] = None
+    sample_count: int
+    first_at: datetime
+    last_at: datetime
+    last_id: int
+
+    class Config:
+        from_attributes = True
@@ -5,13 +5,14 @@ Contains both SQLAlchemy model and Pydantic schemas in one file.
 """
 
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 from enum import Enum
 from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel, Field
 from config.database import Base
 from utils.time_utils import get_ist_now
+from tables.positions import PositionResponse
 
 
 # ============================================================================
@@ -99,4 +100,41 @@ class TradeResponse(BaseModel):
     last_update_time: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class TradeTicketResponse(BaseModel):
+    """Schema for a trade queued with POST /models/queue_trade"""
+    ticket_id: str
+    status: str  # queued, running, executed, rejected or failed
+    code_name: str
+    ai_model_id: int
+    display_name: str
+    asset: str
+    side: SideEnum
+    quantity: float
+    price: float
+    notional_value: float
+    queued_at: datetime
+    completed_at: Optional[datetime] = None
+    trade: Optional[TradeResponse] = None  # Once executed
+    error: Optional[str] = None  # Once rejected or failed
+    status_code: Optional[int] = None  # What create_trade would have answered with on error
+
+
+class RebalanceRequest(BaseModel):
+    """Schema for moving an AI model's portfolio to target weights"""
+    code_name: str = Field(..., min_length=1, max_length=255)
+    # Asset -> percentage (0-100) of the portfolio value, like Position.percentage
+    targets: Dict[str, float] = Field(...)
+    min_trade_value: float = Field(0, ge=0)  # Smaller trades are skipped
+
+
+class RebalanceResponse(BaseModel):
+    """Schema for rebalance response"""
+    code_name: str
+    portfolio_value: float
+    cash_before: float
+    cash_after: float
+    trades: list[TradeResponse]
+    positions: list[PositionResponse]
@@ -0,0 +1,115 @@
+"""
+Test Configuration
+------------------
+Tests import the backend modules the way main.py does, from the backend
+directory. The config package only reads DATABASE_URL when it is imported
+and connects later, so a placeholder is set when it is missing.
+
+Tests marked `database` run SQL against PostgreSQL, each in a schema of its
+own that is dropped afterwards. They use TEST_DATABASE_URL, or else start a
+throwaway cluster with the initdb and pg_ctl found in PG_BIN or on PATH; they
+are skipped, and the skip is reported at the end of the run, when neither is
+available.
+"""
+
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://localhost/test")
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "database: runs SQL against PostgreSQL")
+
+
+def pytest_terminal_summary(terminalreporter):
+    skipped = [report for report in terminalreporter.stats.get("skipped", []) if "database" in report.keywords]
+    if skipped:
+        terminalreporter.write_line(
+            f"{len(skipped)} database tests skipped: set TEST_DATABASE_URL, or put initdb and pg_ctl on PATH",
+            yellow=True
+        )
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def database_url():
+    """URL of a PostgreSQL database the tests may create and drop schemas in"""
+    if TEST_DATABASE_URL:
+        yield TEST_DATABASE_URL
+        return
+
+    bin_dir = os.getenv("PG_BIN")
+    initdb = shutil.which("initdb", path=bin_dir)
+    pg_ctl = shutil.which("pg_ctl", path=bin_dir)
+    if not initdb or not pg_ctl:
+        pytest.skip("PostgreSQL is not available: set TEST_DATABASE_URL, or put initdb and pg_ctl on PATH")
+
+    with tempfile.TemporaryDirectory(prefix="pgtest") as directory:
+        data = os.path.join(directory, "data")
+        port = _free_port()
+        try:
+            subprocess.run([initdb, "-D", data, "-U", "postgres", "--auth=trust"], check=True, capture_output=True)
+            subprocess.run([
+                pg_ctl, "-D", data, "-l", os.path.join(directory, "log"), "-w",
+                "-o", f"-p {port} -k {directory} -c listen_addresses=127.0.0.1", "start"
+            ], check=True, capture_output=True)
+        except subprocess.CalledProcessError as e:
+            pytest.skip(f"Could not start a throwaway PostgreSQL: {e.stderr.decode(errors='replace').strip()}")
+        try:
+            yield f"postgresql+asyncpg://postgres@127.0.0.1:{port}/postgres"
+        finally:
+            subprocess.run([pg_ctl, "-D", data, "-m", "immediate", "stop"], capture_output=True)
+
+
+@pytest.fixture
+def database(database_url):
+    """
+    Async engine on a new schema holding every table, dropped after the test.
+
+    Connections are not pooled, so the engine can be used from the event loop
+    of each asyncio.run() in the test.
+    """
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    import tables
+
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    engine = create_async_engine(
+        database_url, poolclass=NullPool, connect_args={"server_settings": {"search_path": schema}}
+    )
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.execute(text(f"CREATE SCHEMA {schema}"))
+            await conn.run_sync(tables.Base.metadata.create_all)
+
+    async def drop():
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await engine.dispose()
+
+    asyncio.run(create())
+    try:
+        yield engine
+    finally:
+        asyncio.run(drop())
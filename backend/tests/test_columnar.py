@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import orjson
+
+from utils.columnar import IST_OFFSET_MS, columnar_group_from_rows, delta_encode
+from utils.frames import encode_json
+
+START = datetime(2025, 1, 1, 5, 30)
+
+
+def decode(base, deltas):
+    return (base + np.cumsum(deltas)).tolist()
+
+
+def test_delta_encode_round_trips():
+    values = np.array([100, 103, 103, 250], dtype=np.int64)
+    base, deltas = delta_encode(values)
+    assert base == 100 and deltas.tolist() == [0, 3, 0, 147]
+    assert decode(base, deltas) == values.tolist()
+    assert delta_encode(np.zeros(0, dtype=np.int64))[1].tolist() == []
+
+
+def test_group_round_trips_through_the_frame_encoder():
+    created_at = [START + timedelta(seconds=s) for s in (0, 1.5, 61)]
+    group = columnar_group_from_rows(
+        7, "alpha", "Alpha", [10, 12, 20], created_at,
+        {
+            "account_value": [1000.123456, 1001.0, None],
+            "return_value": [0.123456789, 0.2, 0.3],
+            "trades": [1, 2, 5]
+        }
+    )
+    decoded = orjson.loads(encode_json(group))
+
+    # Naive IST timestamps become UTC epoch milliseconds
+    epoch = int((START - datetime(1970, 1, 1)).total_seconds() * 1000) - IST_OFFSET_MS
+    assert decode(decoded["time_base"], decoded["time_deltas"]) == [epoch, epoch + 1500, epoch + 61000]
+    assert decode(decoded["id_base"], decoded["id_deltas"]) == [10, 12, 20]
+    assert decoded["total_points"] == 3
+    assert decoded["first_timestamp"] == created_at[0].isoformat()
+    assert decoded["latest_timestamp"] == created_at[-1].isoformat()
+
+    columns = decoded["columns"]
+    # Rounded to the column's decimals, missing values as null
+    assert columns["account_value"] == [1000.12, 1001.0, None]
+    assert columns["return_value"] == [0.1235, 0.2, 0.3]
+    # Complete whole-number columns go out as integers
+    assert columns["trades"] == [1, 2, 5]
+    assert all(isinstance(value, int) for value in columns["trades"])
+
+
+def test_empty_group_has_no_timestamps():
+    group = orjson.loads(encode_json(columnar_group_from_rows(7, "alpha", "Alpha", [], [], {"fees": []})))
+    assert group["total_points"] == 0
+    assert group["first_timestamp"] is None and group["latest_timestamp"] is None
+    assert group["time_deltas"] == [] and group["columns"]["fees"] == []
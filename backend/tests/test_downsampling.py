@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from utils.downsampling import ALGORITHMS, EVEN, LTTB, MINMAX, downsample_indices
+
+
+def series(n):
+    x = np.arange(n, dtype=np.float64)
+    return x, np.sin(x / 10) * 100
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_short_series_are_kept_whole(algorithm):
+    x, y = series(10)
+    assert downsample_indices(algorithm, x, y, 20).tolist() == list(range(10))
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_sorted_bounded_and_keeps_the_ends(algorithm):
+    x, y = series(10000)
+    indices = downsample_indices(algorithm, x, y, 200)
+    assert len(indices) <= 200
+    assert indices[0] == 0 and indices[-1] == 9999
+    assert (np.diff(indices) > 0).all()
+
+
+def test_even_matches_the_sql_resampling():
+    x, y = series(11)
+    # round(k * 10 / 4) with halves rounded up
+    assert downsample_indices(EVEN, x, y, 5).tolist() == [0, 3, 5, 8, 10]
+
+
+def test_minmax_keeps_spikes():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.zeros(1000)
+    y[357] = 50
+    y[642] = -50
+    indices = downsample_indices(MINMAX, x, y, 20)
+    assert 357 in indices and 642 in indices
+
+
+def test_lttb_keeps_a_spike_and_tolerates_gaps():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.zeros(1000)
+    y[500] = 100
+    y[100:120] = np.nan
+    indices = downsample_indices(LTTB, x, y, 50)
+    assert len(indices) == 50
+    assert 500 in indices
@@ -0,0 +1,17 @@
+from utils.frame_bus import decode_frames, encode_frames
+
+
+def test_round_trip():
+    meta = {"version": 3, "tables": ["positions"]}
+    frames = {"full": b'{"type":"full"}', "diff": b'{"type":"diff","rows":[1,2]}'}
+    assert decode_frames(encode_frames(meta, frames)) == (meta, frames)
+
+
+def test_missing_frames_are_left_out():
+    meta, frames = decode_frames(encode_frames({}, {"full": b"{}", "diff": None}))
+    assert frames == {"full": b"{}"}
+
+
+def test_frames_may_contain_newlines_and_binary_data():
+    frames = {"text": b'{"a":\n1}', "packed": bytes(range(256)), "empty": b""}
+    assert decode_frames(encode_frames({"n": 1}, frames)) == ({"n": 1}, frames)
@@ -0,0 +1,135 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import utils.modeldata_cache as modeldata_cache
+from utils.modeldata_cache import INITIAL_CAPACITY, VALUE_COLUMNS, ModelDataCache, ModelSeries
+
+START = np.datetime64("2025-01-01T00:00:00", "us")
+
+
+def rows(ids, seconds=None):
+    ids = np.asarray(ids, dtype=np.int64)
+    seconds = ids if seconds is None else np.asarray(seconds)
+    timestamps = START + seconds.astype("timedelta64[s]")
+    values = {column: ids.astype(np.float64) for column in VALUE_COLUMNS}
+    return ids, timestamps, values
+
+
+def test_append_grows_past_the_initial_capacity():
+    series = ModelSeries(1, "model", "Model")
+    series.append(*rows(np.arange(1, INITIAL_CAPACITY + 1)))
+    series.append(*rows(np.arange(INITIAL_CAPACITY + 1, 3 * INITIAL_CAPACITY + 1)))
+    assert series.size == 3 * INITIAL_CAPACITY
+    assert series.column("id").tolist() == list(range(1, 3 * INITIAL_CAPACITY + 1))
+    assert series.column("account_value")[-1] == 3 * INITIAL_CAPACITY
+
+
+def test_columns_are_read_only_views():
+    series = ModelSeries(1, "model", "Model")
+    series.append(*rows([1, 2, 3]))
+    with pytest.raises(ValueError):
+        series.column("fees")[0] = 5
+
+
+def test_rows_arriving_out_of_time_order_are_sorted():
+    series = ModelSeries(1, "model", "Model")
+    series.append(*rows([1, 2, 3], seconds=[10, 20, 30]))
+    # A row committed late: higher id, earlier created_at
+    series.append(*rows([4, 5], seconds=[15, 40]))
+    assert series.column("id").tolist() == [1, 4, 2, 3, 5]
+    assert (np.diff(series.column("created_at")) >= np.timedelta64(0)).all()
+    assert series.column("account_value").tolist() == [1, 4, 2, 3, 5]
+
+
+def test_thinning_bounds_memory_and_keeps_recent_detail(monkeypatch):
+    monkeypatch.setattr(modeldata_cache, "MODELDATA_CACHE_MAX_ROWS", 100)
+    series = ModelSeries(1, "model", "Model")
+    for start in range(1, 301, 50):
+        series.append(*rows(np.arange(start, start + 50)))
+
+    ids = series.column("id")
+    assert series.size <= 100
+    assert series.size + series.thinned == 300
+    assert ids[0] == 1 and ids[-1] == 300
+    assert (np.diff(ids) > 0).all()
+    # The newest rows are all still there
+    assert ids[-40:].tolist() == list(range(261, 301))
+    assert series.column("trades").tolist() == ids.astype(np.float64).tolist()
+
+
+def test_sync_verifies_on_its_own_timer_while_notified(monkeypatch):
+    """Notifications every 5s must not postpone the check below the watermark"""
+    clock = [1000.0]
+    refreshes = []
+
+    class Subscription:
+        async def wait(self, timeout):
+            if len(refreshes) == 13:
+                raise asyncio.CancelledError
+            clock[0] += 5
+            return [{}]
+
+    async def subscribe(channel):
+        return Subscription()
+
+    async def unsubscribe(subscription):
+        pass
+
+    async def refresh(full=False, verify=False):
+        refreshes.append(verify)
+
+    monkeypatch.setattr(modeldata_cache.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(modeldata_cache.ChangeListener, "subscribe", subscribe)
+    monkeypatch.setattr(modeldata_cache.ChangeListener, "unsubscribe", unsubscribe)
+    monkeypatch.setattr(ModelDataCache, "refresh", refresh)
+    monkeypatch.setattr(ModelDataCache, "loaded", True)
+    monkeypatch.setattr(ModelDataCache, "verified_at", clock[0])
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(ModelDataCache._sync())
+    # Every sixth 5s notification is 30s after the previous check
+    assert [i for i, verify in enumerate(refreshes) if verify] == [5, 11]
+
+
+@pytest.mark.database
+def test_verify_picks_up_rows_committed_below_the_watermark(database, monkeypatch):
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from config.database import Database
+
+    insert = text("""
+        INSERT INTO modeldata (id, ai_model_id, code_name, display_name, account_value, return_value,
+                               total_pnl, fees, trades, created_at, updated_at)
+        VALUES (:id, 1, 'model', 'Model', 1000, 0, 0, 0, 0, :created_at, :created_at)
+    """)
+
+    async def write(*ids):
+        async with database.begin() as conn:
+            for row_id in ids:
+                await conn.execute(insert, {"id": row_id, "created_at": START.astype(datetime) + timedelta(seconds=row_id)})
+
+    async def run():
+        async with database.begin() as conn:
+            await conn.execute(text("INSERT INTO ai_models (id, code_name, display_name, provider) VALUES (1, 'model', 'Model', 'test')"))
+        await write(1, 2, 3, 10)
+        await ModelDataCache.refresh(full=True)
+        # Row 5 was allocated before row 10 but commits after the cache passed 10
+        await write(5)
+        await ModelDataCache.refresh()
+        missed = ModelDataCache.get(1).column("id").tolist()
+        await ModelDataCache.refresh(verify=True)
+        return missed, ModelDataCache.get(1).column("id").tolist()
+
+    monkeypatch.setattr(Database, "async_session_maker", async_sessionmaker(database), raising=False)
+    monkeypatch.setattr(ModelDataCache, "series", {})
+    monkeypatch.setattr(ModelDataCache, "watermark", 0)
+    monkeypatch.setattr(ModelDataCache, "loaded", True)
+    monkeypatch.setattr(ModelDataCache, "_lock", None)
+
+    missed, verified = asyncio.run(run())
+    assert missed == [1, 2, 3, 10]
+    assert verified == [1, 2, 3, 5, 10]
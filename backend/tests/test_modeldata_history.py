@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.modeldata_history import AVG, LAST, MAX, bucket_width, rollup_resolution
+
+START = datetime(2025, 1, 1)
+
+
+@pytest.mark.parametrize("span, points, width", [
+    (timedelta(seconds=100), 500, 1),
+    (timedelta(hours=1), 500, 10),
+    (timedelta(days=1), 500, 300),
+    (timedelta(days=1), 24, 3600),
+    (timedelta(days=30), 20, 172800),
+])
+def test_bucket_width_rounds_up_to_nice_widths(span, points, width):
+    assert bucket_width(START, START + span, points) == width
+
+
+def test_bucket_width_never_exceeds_the_point_count():
+    end = START + timedelta(days=7)
+    for points in (1, 7, 100, 333, 5000):
+        width = bucket_width(START, end, points)
+        assert (end - START).total_seconds() / width <= points
+
+
+def test_bucket_width_with_no_points():
+    assert bucket_width(START, START + timedelta(minutes=1), 0) == 60
+
+
+@pytest.mark.parametrize("bucket, resolution", [
+    (60, 60),
+    (300, 60),
+    (1800, 900),
+    (7200, 3600),
+    (86400, 86400),
+    (172800, 86400),
+])
+def test_rollup_resolution_is_the_coarsest_divisor(bucket, resolution):
+    assert rollup_resolution(bucket, LAST) == resolution
+    assert rollup_resolution(bucket, MAX) == resolution
+
+
+def test_rollup_resolution_falls_back_to_raw_rows():
+    assert rollup_resolution(30, LAST) is None
+    assert rollup_resolution(90, MAX) is None
+    # Averages of averages would be weighted wrong
+    assert rollup_resolution(3600, AVG) is None
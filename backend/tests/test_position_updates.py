@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from tables.positions import PositionBulkUpdateItem
+from utils.position_updates import _item_error, update_positions_in_bulk
+
+FOUND = {"position": {1, 2}, "ai_model": {7}}
+
+
+def error(**fields):
+    item = PositionBulkUpdateItem(**fields)
+    return _item_error(item, item.model_dump(exclude_unset=True, exclude={"id"}), FOUND)
+
+
+def test_valid_items_have_no_error():
+    assert error(id=1, value=10.0) == ""
+    assert error(id=2, ai_model_id=7, pnl=None) == ""
+
+
+def test_missing_rows_and_null_required_fields_are_reported():
+    assert error(id=3, value=10.0) == "Position with ID 3 not found"
+    assert error(id=1, ai_model_id=8) == "AI model with ID 8 not found"
+    assert error(id=1, value=None, percentage=None) == "percentage, value cannot be null"
+
+
+@pytest.mark.database
+def test_bulk_update_applies_valid_items_and_reports_the_rest(database):
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    async def run():
+        async with database.begin() as conn:
+            await conn.execute(text("INSERT INTO ai_models (id, code_name, display_name, provider) VALUES (7, 'model', 'Model', 'test')"))
+            await conn.execute(text("""
+                INSERT INTO positions (id, asset, display_name, percentage, value, pnl, code_name, ai_model_id)
+                VALUES (1, 'BTC', 'Bitcoin', 50, 100, 5, 'model', 7), (2, 'ETH', NULL, 50, 100, 1, 'model', 7)
+            """))
+
+        items = [
+            PositionBulkUpdateItem(id=1, value=110.0),
+            PositionBulkUpdateItem(id=3, value=1.0),
+            PositionBulkUpdateItem(id=2, pnl=None, display_name="Ether"),
+            PositionBulkUpdateItem(id=2, value=None),
+            PositionBulkUpdateItem(id=1, percentage=60.0),
+        ]
+        async with async_sessionmaker(database)() as session:
+            updated, errors = await update_positions_in_bulk(session, items)
+            await session.commit()
+
+        async with database.connect() as conn:
+            rows = (await conn.execute(text("SELECT id, display_name, percentage, value, pnl FROM positions ORDER BY id"))).all()
+        return updated, errors, [tuple(row) for row in rows]
+
+    updated, errors, rows = asyncio.run(run())
+    # Items for the same position are merged, and each applied item is reported
+    assert [row["id"] for row in updated] == [1, 2, 1]
+    assert errors == [
+        {"position_id": 3, "error": "Position with ID 3 not found"},
+        {"position_id": 2, "error": "value cannot be null"},
+    ]
+    # Unset fields keep their value, an explicit null clears a nullable one
+    assert rows == [(1, "Bitcoin", 60.0, 110.0, 5.0), (2, "Ether", 50.0, 100.0, None)]
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+from utils.rate_limit import ClientRates
+
+
+class CatchUp:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, websockets):
+        self.calls.append((time.monotonic(), sorted(websockets)))
+
+
+def test_intervals_and_due():
+    async def run():
+        rates = ClientRates("test", 0.05, CatchUp())
+        rates.set("fast", 0)
+        rates.set("default")
+        assert rates.fastest() == 0
+        assert rates.interval("default") == 0.05
+
+        rates.sent("fast")
+        rates.sent("default")
+        assert rates.due("fast")
+        assert not rates.due("default")
+        # A cap such as the heartbeat interval overrides a slower rate
+        assert rates.due("default", max_interval=0)
+
+        rates.remove("fast")
+        assert rates.fastest() == 0.05
+
+    asyncio.run(run())
+
+
+def test_skipped_connection_is_caught_up_once_due():
+    async def run():
+        catch_up = CatchUp()
+        rates = ClientRates("test", 0.05, catch_up)
+        rates.set("slow")
+        rates.sent("slow")
+        sent_at = time.monotonic()
+
+        # Several skipped frames lead to a single catch-up when the interval has passed
+        for _ in range(3):
+            rates.skip("slow")
+        await asyncio.sleep(0.1)
+
+        assert [websockets for _, websockets in catch_up.calls] == [["slow"]]
+        assert catch_up.calls[0][0] - sent_at >= 0.05
+        assert not rates.behind
+        assert rates.status()["skipped"] == 3 and rates.status()["caught_up"] == 1
+
+    asyncio.run(run())
+
+
+def test_connection_sent_the_latest_frame_is_not_caught_up():
+    async def run():
+        catch_up = CatchUp()
+        rates = ClientRates("test", 0.05, catch_up)
+        rates.set("slow")
+        rates.sent("slow")
+        rates.skip("slow")
+        rates.sent("slow")
+        await asyncio.sleep(0.1)
+        assert catch_up.calls == []
+
+    asyncio.run(run())
+
+
+def test_sooner_due_connection_restarts_the_timer():
+    async def run():
+        catch_up = CatchUp()
+        rates = ClientRates("test", 1.0, catch_up)
+        rates.set("slow", 1.0)
+        rates.set("fast", 0.02)
+        rates.sent("slow")
+        rates.sent("fast")
+        rates.skip("slow")
+        await asyncio.sleep(0)
+        rates.skip("fast")
+        await asyncio.sleep(0.1)
+
+        assert [websockets for _, websockets in catch_up.calls] == [["fast"]]
+        assert rates.behind == {"slow"}
+        rates.remove("slow")
+        rates.remove("fast")
+        assert rates.timer is None
+
+    asyncio.run(run())
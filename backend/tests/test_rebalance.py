@@ -0,0 +1,104 @@
+import math
+
+import pytest
+
+from utils.rebalance import assets_to_price, invalid_prices, plan_rebalance
+
+
+def positions(cash, **held):
+    rows = [{"id": 1, "asset": "CASH", "quantity": cash}]
+    for i, (asset, quantity) in enumerate(held.items(), start=2):
+        rows.append({"id": i, "asset": asset, "quantity": quantity})
+    return rows
+
+
+def test_assets_to_price_adds_held_assets():
+    held = positions(100, AAA=1, BBB=0, CCC=2)
+    assert assets_to_price(held, {"DDD": 10, "AAA": 20}) == ["DDD", "AAA", "CCC"]
+
+
+def test_buys_into_targets_from_cash():
+    plan = plan_rebalance(positions(1000), {"AAA": 50, "BBB": 25}, {"AAA": 10.0, "BBB": 5.0})
+    assert plan["portfolio_value"] == 1000
+    assert plan["cash_after"] == pytest.approx(250)
+    assert [(t["asset"], t["side"], t["quantity"]) for t in plan["trades"]] == [
+        ("AAA", "BUY", pytest.approx(50)), ("BBB", "BUY", pytest.approx(50))
+    ]
+    new = {p["asset"]: p for p in plan["positions"]}
+    assert new["AAA"]["position_id"] is None
+    assert new["AAA"]["percentage"] == pytest.approx(50)
+    assert new["CASH"]["percentage"] == pytest.approx(25)
+
+
+def test_sells_come_first_and_unlisted_assets_are_sold():
+    held = positions(0, AAA=10, BBB=10)
+    plan = plan_rebalance(held, {"BBB": 100}, {"AAA": 10.0, "BBB": 10.0})
+    assert [(t["asset"], t["side"]) for t in plan["trades"]] == [("AAA", "SELL"), ("BBB", "BUY")]
+    assert plan["cash_after"] == pytest.approx(0)
+    new = {p["asset"]: p for p in plan["positions"]}
+    assert new["AAA"]["quantity"] == 0 and new["AAA"]["position_id"] == 2
+    assert new["BBB"]["quantity"] == pytest.approx(20)
+
+
+def test_small_trades_are_skipped():
+    held = positions(5, AAA=10)
+    # All of the 100 portfolio value in AAA: 5 of notional to buy
+    plan = plan_rebalance(held, {"AAA": 100}, {"AAA": 9.5}, min_trade_value=1)
+    assert [t["notional_value"] for t in plan["trades"]] == [pytest.approx(5)]
+    plan = plan_rebalance(held, {"AAA": 100}, {"AAA": 9.5}, min_trade_value=10)
+    assert plan["trades"] == []
+    assert plan["cash_after"] == plan["cash_before"] == 5
+
+
+def test_overweight_targets_leave_negative_cash():
+    plan = plan_rebalance(positions(100), {"AAA": 150}, {"AAA": 1.0})
+    assert plan["cash_after"] == pytest.approx(-50)
+
+
+@pytest.mark.parametrize("price", [0, -1.0, math.nan, math.inf, None])
+def test_unusable_prices_are_refused(price):
+    prices = {"AAA": 10.0, "BBB": price}
+    assert invalid_prices(prices) == ["BBB"]
+    with pytest.raises(ValueError):
+        plan_rebalance(positions(100), {"AAA": 50, "BBB": 50}, prices)
+
+
+@pytest.mark.database
+def test_apply_writes_trades_in_plan_order_and_positions(database):
+    import asyncio
+
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from utils.model_identity import ModelIdentity
+    from utils.rebalance import apply_rebalance, lock_positions
+
+    async def run():
+        async with database.begin() as conn:
+            await conn.execute(text("INSERT INTO ai_models (id, code_name, display_name, provider) VALUES (1, 'model', 'Model', 'test')"))
+            await conn.execute(text("""
+                INSERT INTO positions (asset, percentage, value, quantity, last_price, code_name, ai_model_id)
+                VALUES ('CASH', 0, 0, 0, 1, 'model', 1), ('AAA', 50, 100, 10, 10, 'model', 1),
+                       ('BBB', 50, 100, 10, 10, 'model', 1)
+            """))
+
+        async with async_sessionmaker(database)() as session:
+            held = await lock_positions(session, "model")
+            plan = plan_rebalance(held, {"BBB": 50, "CCC": 50}, {"AAA": 10.0, "BBB": 10.0, "CCC": 4.0})
+            written = await apply_rebalance(session, ModelIdentity(1, "model", "Model"), plan)
+            await session.commit()
+
+        async with database.connect() as conn:
+            rows = (await conn.execute(text("SELECT asset, quantity, display_name FROM positions ORDER BY id"))).all()
+        return written, [tuple(row) for row in rows]
+
+    written, rows = asyncio.run(run())
+    assert [(t["asset"], t["side"], t["display_name"]) for t in written["trades"]] == [
+        ("AAA", "SELL", "Model"), ("CCC", "BUY", "Model")
+    ]
+    assert rows == [
+        ("CASH", pytest.approx(0), None),
+        ("AAA", 0, None),
+        ("BBB", pytest.approx(10), None),
+        ("CCC", pytest.approx(25), "Model"),
+    ]
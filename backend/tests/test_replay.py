@@ -0,0 +1,64 @@
+from utils.replay import ReplayRing
+
+
+def ring(size=3, seqs=range(1, 6)):
+    replay = ReplayRing("test", size)
+    for seq in seqs:
+        replay.append(seq, f"item {seq}")
+    return replay
+
+
+def test_since_returns_the_missed_items_in_order():
+    replay = ring()
+    assert replay.since(3) == ["item 4", "item 5"]
+    # The seq just before the oldest entry can still be replayed in full
+    assert replay.since(2) == ["item 3", "item 4", "item 5"]
+    assert replay.since(5) == []
+
+
+def test_since_falls_back_when_items_are_gone_or_unknown():
+    replay = ring()
+    assert replay.since(1) is None
+    assert replay.since(6) is None
+    assert ReplayRing("test", 3).since(0) is None
+    assert replay.status()["fallbacks"] == 2
+
+
+def test_a_gap_in_sequences_starts_the_ring_over():
+    replay = ring()
+    replay.append(9, "item 9")
+    assert replay.status()["first_seq"] == 9
+    assert replay.since(8) == ["item 9"]
+    assert replay.since(5) is None
+
+
+def test_reset_drops_history_but_keeps_the_sequence():
+    replay = ring()
+    replay.reset(7)
+    assert replay.since(7) == []
+    assert replay.since(5) is None
+    replay.append(8, "item 8")
+    assert replay.since(7) == ["item 8"]
+
+
+def test_merged_builds_once_per_seq_until_the_next_item():
+    replay = ring()
+    calls = []
+
+    def merge(seq, items):
+        calls.append(seq)
+        return (seq, tuple(items))
+
+    assert replay.merged(3, merge) == (3, ("item 4", "item 5"))
+    assert replay.merged(3, merge) == (3, ("item 4", "item 5"))
+    assert calls == [3]
+
+    replay.append(6, "item 6")
+    assert replay.merged(3, merge) == (3, ("item 4", "item 5", "item 6"))
+    assert calls == [3, 3]
+
+
+def test_merged_is_none_when_current_or_gone():
+    replay = ring()
+    assert replay.merged(5, lambda seq, items: items) is None
+    assert replay.merged(1, lambda seq, items: items) is None
@@ -0,0 +1,36 @@
+from utils.row_diff import VersionedRowSets
+
+
+def test_first_update_upserts_every_row():
+    rows = VersionedRowSets()
+    changes = rows.update({"positions": [{"id": 1, "value": 10}, {"id": 2, "value": 20}]})
+    assert changes == {"positions": {"upserted": [{"id": 1, "value": 10}, {"id": 2, "value": 20}], "removed": []}}
+    assert rows.version == 1
+
+
+def test_unchanged_rows_do_not_bump_the_version():
+    rows = VersionedRowSets(initial_version=5)
+    rows.update({"positions": [{"id": 1, "value": 10}]})
+    assert rows.update({"positions": [{"id": 1, "value": 10}]}) is None
+    assert rows.version == 6
+
+
+def test_changed_and_removed_rows():
+    rows = VersionedRowSets()
+    rows.update({"positions": [{"id": 1, "value": 10}, {"id": 2, "value": 20}], "trades": [{"id": 7}]})
+    changes = rows.update({"positions": [{"id": 1, "value": 11}, {"id": 3, "value": 30}], "trades": [{"id": 7}]})
+    assert changes == {
+        "positions": {"upserted": [{"id": 1, "value": 11}, {"id": 3, "value": 30}], "removed": [2]}
+    }
+    assert rows.version == 2
+    assert rows.snapshot() == {
+        "positions": [{"id": 1, "value": 11}, {"id": 3, "value": 30}],
+        "trades": [{"id": 7}]
+    }
+
+
+def test_custom_key():
+    rows = VersionedRowSets(key="asset")
+    rows.update({"ltp": [{"asset": "BTCUSD", "last_price": 1}]})
+    changes = rows.update({"ltp": [{"asset": "BTCUSD", "last_price": 2}]})
+    assert changes == {"ltp": {"upserted": [{"asset": "BTCUSD", "last_price": 2}], "removed": []}}
@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+from fastapi.websockets import WebSocketState
+
+from utils.frames import Frame
+from utils.send_queue import DISCONNECT, DROP_OLDEST, KEEP_LATEST, SocketWriter, StreamSenders
+
+
+class FakeSocket:
+    """Records sent frames; sends block until `open` is set, and overlapping sends are counted"""
+
+    def __init__(self):
+        self.client_state = WebSocketState.CONNECTED
+        self.sent = []
+        self.open = asyncio.Event()
+        self.open.set()
+        self.sending = 0
+        self.overlaps = 0
+        self.close_code = None
+
+    async def send_text(self, payload):
+        self.sending += 1
+        self.overlaps += self.sending > 1
+        await self.open.wait()
+        self.sent.append(payload)
+        self.sending -= 1
+
+    async def send_bytes(self, payload):
+        await self.send_text(payload.decode())
+
+    async def close(self, code=1000, reason=""):
+        self.close_code = code
+        self.client_state = WebSocketState.DISCONNECTED
+
+
+def frame(n):
+    return Frame(b"%d" % n)
+
+
+async def drain():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_channels_of_one_connection_share_a_writer_in_queue_order():
+    async def run():
+        socket = FakeSocket()
+        socket.open.clear()
+        prices = StreamSenders("prices", 10, DROP_OLDEST)
+        models = StreamSenders("models", 10, DROP_OLDEST)
+        prices.register(socket, channel="prices")
+        models.register(socket, channel="models")
+        assert len(SocketWriter.writers) == 1
+
+        for n in range(3):
+            prices.send(socket, frame(n))
+            models.send(socket, frame(n))
+        await drain()
+        socket.open.set()
+        await drain()
+
+        sent = [(message["channel"], message["message"]) for message in map(json.loads, socket.sent)]
+        assert sent == [(channel, n) for n in range(3) for channel in ("prices", "models")]
+        assert socket.overlaps == 0
+
+        prices.unregister(socket)
+        assert SocketWriter.writers
+        models.unregister(socket)
+        assert not SocketWriter.writers
+
+    asyncio.run(run())
+
+
+def test_each_stream_applies_its_own_limit_and_policy():
+    async def run():
+        socket = FakeSocket()
+        socket.open.clear()
+        oldest = StreamSenders("oldest", 2, DROP_OLDEST)
+        latest = StreamSenders("latest", 2, KEEP_LATEST)
+        oldest.register(socket, channel="oldest")
+        latest.register(socket, channel="latest")
+        # The writer takes the first frame and blocks on the socket with it
+        oldest.send(socket, frame(0))
+        await drain()
+
+        for n in range(1, 5):
+            oldest.send(socket, frame(n))
+            latest.send(socket, frame(n))
+        assert oldest.status()["dropped_frames"] == 2
+        assert latest.status()["dropped_frames"] == 2
+
+        socket.open.set()
+        await drain()
+        sent = [(message["channel"], message["message"]) for message in map(json.loads, socket.sent)]
+        assert sent == [("oldest", 0), ("oldest", 3), ("latest", 3), ("oldest", 4), ("latest", 4)]
+
+        oldest.unregister(socket)
+        latest.unregister(socket)
+
+    asyncio.run(run())
+
+
+def test_disconnect_policy_closes_a_slow_client():
+    async def run():
+        socket = FakeSocket()
+        socket.open.clear()
+        strict = StreamSenders("strict", 1, DISCONNECT)
+        strict.register(socket)
+        strict.send(socket, frame(0))
+        await drain()
+        assert strict.send(socket, frame(1))
+        assert not strict.send(socket, frame(2))
+        await drain()
+
+        assert socket.close_code == 1008
+        assert strict.status()["slow_disconnects"] == 1
+        strict.unregister(socket)
+        assert not SocketWriter.writers
+
+    asyncio.run(run())
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from utils.frames import Frame
+from utils.snapshots import SnapshotCache
+
+
+class Builder:
+    """Counts builds; each build waits for `release` so callers can pile up"""
+
+    def __init__(self):
+        self.builds = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.builds += 1
+        await self.release.wait()
+        return Frame(b"snapshot %d" % self.builds)
+
+
+def test_concurrent_gets_share_one_build():
+    async def run():
+        cache = SnapshotCache("test", max_age=60)
+        build = Builder()
+        waiters = [asyncio.create_task(cache.get("all", build)) for _ in range(10)]
+        await asyncio.sleep(0)
+        assert len(cache.refreshing) == 1
+        build.release.set()
+        frames = await asyncio.gather(*waiters)
+
+        assert build.builds == 1
+        assert {frame.data for frame in frames} == {b"snapshot 1"}
+        # Served from the cache afterwards
+        assert (await cache.get("all", build)).data == b"snapshot 1"
+        assert build.builds == 1 and cache.hits == 1 and not cache.refreshing
+
+    asyncio.run(run())
+
+
+def test_rebuilds_for_a_new_version_or_when_too_old(monkeypatch):
+    async def run():
+        version = [1]
+        cache = SnapshotCache("test", max_age=60, version=lambda: version[0])
+        build = Builder()
+        build.release.set()
+        await cache.get("all", build)
+
+        version[0] = 2
+        assert (await cache.get("all", build)).data == b"snapshot 2"
+
+        now = [0.0]
+        monkeypatch.setattr("utils.snapshots.time.monotonic", lambda: now[0])
+        cache.put("all", Frame(b"pushed"))
+        now[0] = 30.0
+        assert (await cache.get("all", build)).data == b"pushed"
+        now[0] = 61.0
+        assert (await cache.get("all", build)).data == b"snapshot 3"
+
+    asyncio.run(run())
+
+
+def test_data_changing_during_a_build_is_not_cached_as_current():
+    async def run():
+        version = [1]
+        cache = SnapshotCache("test", max_age=60, version=lambda: version[0])
+        build = Builder()
+        waiter = asyncio.create_task(cache.get("all", build))
+        while not build.builds:
+            await asyncio.sleep(0)
+        version[0] = 2
+        build.release.set()
+        assert (await waiter).data == b"snapshot 1"
+        assert (await cache.get("all", build)).data == b"snapshot 2"
+
+    asyncio.run(run())
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_build():
+    async def run():
+        cache = SnapshotCache("test", max_age=60)
+        build = Builder()
+        leaving = asyncio.create_task(cache.get("all", build))
+        staying = asyncio.create_task(cache.get("all", build))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        await asyncio.sleep(0)
+        build.release.set()
+
+        assert (await staying).data == b"snapshot 1"
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+        assert build.builds == 1
+
+    asyncio.run(run())
+
+
+def test_least_recently_used_views_are_dropped():
+    cache = SnapshotCache("test", max_age=60, max_entries=2)
+    cache.put("a", Frame(b"a"))
+    cache.put("b", Frame(b"b"))
+    assert cache._fresh("a") is not None
+    cache.put("c", Frame(b"c"))
+    assert list(cache.entries) == ["a", "c"]
@@ -0,0 +1,71 @@
+import pytest
+
+from utils.subscriptions import (
+    StreamFilter,
+    apply_subscription,
+    filter_rows,
+    parse_subscription_request,
+    subscription_message
+)
+
+
+def test_subscribe_adds_and_unsubscribe_removes():
+    stream_filter = apply_subscription(None, {"type": "subscribe", "ai_model_ids": [1, 2], "symbols": ["BTCUSD"]})
+    stream_filter = apply_subscription(stream_filter, {"type": "subscribe", "code_names": ["gpt"]})
+    assert stream_filter.to_dict() == {"ai_model_ids": [1, 2], "code_names": ["gpt"], "symbols": ["BTCUSD"]}
+
+    stream_filter = apply_subscription(stream_filter, {"type": "unsubscribe", "ai_model_ids": [2], "symbols": ["BTCUSD"]})
+    assert stream_filter.to_dict() == {"ai_model_ids": [1], "code_names": ["gpt"], "symbols": []}
+
+
+def test_unsubscribing_everything_receives_everything_again():
+    stream_filter = apply_subscription(None, {"type": "subscribe", "symbols": ["BTCUSD"]})
+    assert apply_subscription(stream_filter, {"type": "unsubscribe", "symbols": ["BTCUSD"]}) is None
+    assert apply_subscription(None, {"type": "unsubscribe", "symbols": ["ETHUSD"]}) is None
+
+
+@pytest.mark.parametrize("request_body", [
+    {"type": "subscribe", "ai_model_ids": "1"},
+    {"type": "subscribe", "ai_model_ids": ["1"]},
+    {"type": "subscribe", "ai_model_ids": [True]},
+    {"type": "subscribe", "symbols": [1]},
+])
+def test_malformed_lists_are_rejected(request_body):
+    with pytest.raises(ValueError):
+        apply_subscription(None, request_body)
+
+
+def test_equal_filters_share_a_key():
+    first = StreamFilter([2, 1], ["gpt"])
+    second = StreamFilter([1, 2], ["gpt"])
+    assert first == second and hash(first) == hash(second)
+    assert len({first, second}) == 1
+    assert first != StreamFilter([1, 2])
+    assert not StreamFilter()
+
+
+def test_rows_match_by_id_or_code_name():
+    stream_filter = StreamFilter([1], ["gpt"])
+    rows = [
+        {"ai_model_id": 1, "code_name": "claude"},
+        {"ai_model_id": 2, "code_name": "gpt"},
+        {"ai_model_id": 3, "code_name": "gemini"},
+    ]
+    assert filter_rows(rows, stream_filter) == rows[:2]
+    assert StreamFilter(symbols=["BTCUSD"]).matches_symbol("BTCUSD")
+    assert not stream_filter.matches_symbol("BTCUSD")
+
+
+def test_only_subscription_messages_are_parsed():
+    assert parse_subscription_request('{"type": "subscribe", "symbols": ["BTCUSD"]}') == {
+        "type": "subscribe",
+        "symbols": ["BTCUSD"]
+    }
+    assert parse_subscription_request("ping") is None
+    assert parse_subscription_request('{"type": "pong"}') is None
+    assert parse_subscription_request("[1, 2]") is None
+
+
+def test_acknowledgement_carries_the_filter():
+    assert subscription_message(None, "now") == {"type": "subscription", "filter": None, "timestamp": "now"}
+    assert subscription_message(StreamFilter(symbols=["BTCUSD"]), "now")["filter"]["symbols"] == ["BTCUSD"]
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+from fastapi import status
+
+from utils.trade_execution import execution_error
+
+
+def test_executed_trade_has_no_error():
+    execution = {"has_cash": True, "cash_balance": 100.0, "trade": {"id": 1}}
+    assert execution_error(execution, "model", 50) is None
+
+
+def test_buy_without_cash_position():
+    execution = {"has_cash": False, "cash_balance": None, "trade": None}
+    code, detail = execution_error(execution, "model", 50)
+    assert code == status.HTTP_404_NOT_FOUND
+    assert "No CASH position" in detail
+
+
+def test_buy_beyond_cash_balance():
+    execution = {"has_cash": True, "cash_balance": 30.0, "trade": None}
+    code, detail = execution_error(execution, "model", 50)
+    assert code == status.HTTP_400_BAD_REQUEST
+    assert "Shortfall: 20.00" in detail
+
+
+async def seed(database, cash=95.0):
+    from sqlalchemy import text
+
+    async with database.begin() as conn:
+        await conn.execute(text("INSERT INTO ai_models (id, code_name, display_name, provider) VALUES (1, 'model', 'Model', 'test')"))
+        await conn.execute(text("""
+            INSERT INTO positions (asset, percentage, value, quantity, last_price, code_name, ai_model_id)
+            VALUES ('CASH', 100, :cash, :cash, 1, 'model', 1), ('AAA', 0, 0, 0, 10, 'model', 1)
+        """), {"cash": cash})
+
+
+async def holdings(database):
+    from sqlalchemy import text
+
+    async with database.connect() as conn:
+        positions = dict((await conn.execute(text("SELECT asset, quantity FROM positions"))).all())
+        trades = (await conn.execute(text("SELECT COUNT(*) FROM trades"))).scalar_one()
+    return positions, trades
+
+
+@pytest.mark.database
+def test_concurrent_buys_cannot_overspend(database):
+    """Twenty concurrent BUYs of 10 against 95 of cash: exactly nine go through"""
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from utils.model_identity import ModelIdentity
+    from utils.trade_execution import execute_trade
+
+    model = ModelIdentity(1, "model", "Model")
+    session_maker = async_sessionmaker(database)
+
+    async def buy():
+        async with session_maker() as session:
+            execution = await execute_trade(session, model, "AAA", "BUY", 1, 10.0, 10.0)
+            await session.commit()
+            return execution["trade"] is not None
+
+    async def run():
+        await seed(database)
+        executed = await asyncio.gather(*(buy() for _ in range(20)))
+        return sum(executed), *await holdings(database)
+
+    executed, positions, trades = asyncio.run(run())
+    assert executed == trades == 9
+    assert positions["CASH"] == pytest.approx(5)
+    assert positions["AAA"] == pytest.approx(9)
+
+
+@pytest.mark.database
+def test_rejected_trades_change_nothing(database):
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from utils.model_identity import ModelIdentity
+    from utils.trade_execution import execute_trade
+
+    model = ModelIdentity(1, "model", "Model")
+
+    async def run():
+        await seed(database, cash=5.0)
+        async with async_sessionmaker(database)() as session:
+            short = await execute_trade(session, model, "AAA", "BUY", 1, 10.0, 10.0)
+            sold = await execute_trade(session, model, "AAA", "SELL", 1, 10.0, 10.0)
+            await session.commit()
+        return short, sold, *await holdings(database)
+
+    short, sold, positions, trades = asyncio.run(run())
+    assert short["trade"] is None and short["has_cash"] and short["cash_balance"] == pytest.approx(5)
+    # A SELL credits cash and reduces the asset in the same statement
+    assert sold["trade"]["side"] == "SELL"
+    # The trade takes the model's id and display_name from the identity
+    assert (sold["trade"]["ai_model_id"], sold["trade"]["display_name"]) == (1, "Model")
+    assert sold["asset_position"]["quantity"] == pytest.approx(-1)
+    assert positions == {"CASH": pytest.approx(15), "AAA": pytest.approx(-1)}
+    assert trades == 1
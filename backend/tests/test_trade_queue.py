@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+import pytest
+
+import utils.trade_queue as trade_queue
+from config.database import Database
+from config.redis import RedisClient
+from utils.trade_queue import EXECUTED, QUEUED, RUNNING, TradeQueue, ticket_key
+
+
+class Session:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def commit(self):
+        pass
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    """A fake Redis whose final ticket writes fail `failures[0]` times"""
+    state = {"tickets": {}, "acked": [], "trades": 0, "failures": [0]}
+
+    async def execute(command, *args, **kwargs):
+        if command == "eval":
+            ticket = json.loads(args[3])
+            if ticket["status"] == EXECUTED and state["failures"][0] > 0:
+                state["failures"][0] -= 1
+                raise ConnectionError("connection reset")
+            current = state["tickets"].get(args[2])
+            if current and json.loads(current)["status"] not in args[5:]:
+                return 0
+            state["tickets"][args[2]] = args[3]
+            return 1
+        if command == "xack":
+            state["acked"].append(args[2])
+            return 1
+        raise AssertionError(command)
+
+    async def get(key):
+        return state["tickets"].get(key)
+
+    async def execute_trade(*args):
+        state["trades"] += 1
+        return {"has_cash": True, "cash_balance": 100.0, "trade": {"id": state["trades"]}}
+
+    async def publish_frames(*args):
+        pass
+
+    async def no_sleep(delay):
+        pass
+
+    monkeypatch.setattr(RedisClient, "execute", execute, raising=False)
+    monkeypatch.setattr(RedisClient, "get", get, raising=False)
+    monkeypatch.setattr(Database, "async_session_maker", Session, raising=False)
+    monkeypatch.setattr(trade_queue, "execute_trade", execute_trade)
+    monkeypatch.setattr(trade_queue, "publish_frames", publish_frames)
+    monkeypatch.setattr(asyncio, "sleep", no_sleep)
+    return state
+
+
+def process(ticket):
+    fields = {b"ticket": json.dumps(ticket).encode()}
+    asyncio.run(TradeQueue._process("trade_queue:0", b"1-0", fields))
+
+
+def ticket():
+    return {
+        "ticket_id": "t1", "status": QUEUED, "code_name": "model", "ai_model_id": 1, "display_name": "Model",
+        "asset": "AAA", "side": "BUY", "quantity": 1, "price": 10.0, "notional_value": 10.0,
+        "completed_at": None, "trade": None, "error": None, "status_code": None
+    }
+
+
+def test_outcome_write_is_retried_without_running_the_trade_again(queue):
+    queue["failures"][0] = 2
+    process(ticket())
+    assert queue["trades"] == 1
+    assert json.loads(queue["tickets"][ticket_key("t1")])["status"] == EXECUTED
+    assert queue["acked"] == [b"1-0"]
+
+
+def test_entry_stays_pending_while_the_outcome_cannot_be_written(queue):
+    queue["failures"][0] = 100
+    process(ticket())
+    assert queue["trades"] == 1
+    assert json.loads(queue["tickets"][ticket_key("t1")])["status"] == RUNNING
+    assert queue["acked"] == []
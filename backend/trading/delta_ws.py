@@ -40,7 +40,10 @@ def on_message(ws, message):
     # print json response
     message_json = json.loads(message)
     try:
-        redis.hset("ltp_data", "BTCUSD", {'last_price': float(message_json['mark_price'])*89, 'change': float(message_json['ltp_change_24h'])})
+        tick = {'last_price': float(message_json['mark_price'])*89, 'change': float(message_json['ltp_change_24h'])}
+        redis.hset("ltp_data", "BTCUSD", tick)
+        # Let the API's price stream know about the tick right away
+        redis.publish("ltp_ticks", json.dumps({"symbol": "BTCUSD", **tick}))
     except:
         pass
     print(message_json)
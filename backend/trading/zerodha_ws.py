@@ -1,4 +1,5 @@
 import logging
+import json
 from kiteconnect import KiteTicker
 from dotenv import load_dotenv
 import os
@@ -20,6 +21,14 @@ def on_ticks(ws, ticks):
     for tick in ticks:
         symbol = mapping.get(tick['instrument_token'], 'UNKNOWN')
         redis.hset(f"ltp_data", symbol, tick)
+        # Let the API's price stream know about the tick right away
+        redis.publish("ltp_ticks", json.dumps({
+            "symbol": symbol,
+            "last_price": tick['last_price'],
+            "change": tick.get('change', 0),
+            "last_trade_time": tick.get('last_trade_time'),
+            "exchange_timestamp": tick.get('exchange_timestamp')
+        }, default=str))
         logging.info(f"Tick for {symbol}: {tick['last_price']} {tick['exchange_timestamp']}")
         
 
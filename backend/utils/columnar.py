@@ -0,0 +1,111 @@
+"""
+Columnar Layout Utilities
+-------------------------
+Optional layout for time-series frames. Instead of one dict per data point,
+which repeats the model's names and an ISO timestamp every time, a model's
+group carries its header once, timestamps as an epoch base plus integer
+deltas, and each metric as one flat array.
+
+Groups are built straight from NumPy columns (the in-memory modeldata cache)
+or from query results collected per column, and are serialized by orjson
+without going through Python lists.
+"""
+
+from datetime import datetime
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+# Layouts a client can ask for with ?layout=
+ROWS_LAYOUT = "rows"          # one dict per data point (default)
+COLUMNAR_LAYOUT = "columnar"  # one header per model, flat arrays per column
+LAYOUTS = (ROWS_LAYOUT, COLUMNAR_LAYOUT)
+LAYOUT_PATTERN = "^(" + "|".join(LAYOUTS) + ")$"
+
+# Stored timestamps are naive IST; columnar times are UTC epoch milliseconds
+IST_OFFSET_MS = (5 * 60 + 30) * 60 * 1000
+EPOCH = np.datetime64("1970-01-01T00:00:00", "ms")
+# Decimals kept per metric column: cents for money, 4 places for the return
+# percentage. Full float precision is noise on a chart and would dominate the
+# frame size
+COLUMN_DECIMALS = {"account_value": 2, "return_value": 4, "total_pnl": 2, "fees": 2}
+
+
+def delta_encode(values: np.ndarray) -> Tuple[int, np.ndarray]:
+    """First value and the differences to each previous value (the first difference is 0)"""
+    if len(values) == 0:
+        return 0, np.zeros(0, dtype=np.int64)
+    return int(values[0]), np.diff(values, prepend=values[0])
+
+
+def epoch_millis(timestamps: np.ndarray) -> np.ndarray:
+    """Naive IST datetime64 values as UTC epoch milliseconds"""
+    return (timestamps.astype("datetime64[ms]") - EPOCH).astype(np.int64) - IST_OFFSET_MS
+
+
+def columnar_group(
+    ai_model_id: int,
+    code_name: str,
+    display_name: str,
+    ids: np.ndarray,
+    timestamps: np.ndarray,
+    values: Dict[str, np.ndarray]
+) -> dict:
+    """
+    One model's data points in the columnar layout.
+
+    Args:
+        ids: modeldata ids, int64
+        timestamps: created_at as datetime64 (naive IST)
+        values: Metric columns as float64, NaN where the value is missing;
+            rounded to COLUMN_DECIMALS
+
+    Returns:
+        A group with `time_base`/`time_deltas` (UTC epoch ms), `id_base`/
+        `id_deltas` and a `columns` dict of flat metric arrays (null for
+        missing values once serialized)
+    """
+    time_base, time_deltas = delta_encode(epoch_millis(timestamps))
+    id_base, id_deltas = delta_encode(ids)
+    columns = {}
+    for column, array in values.items():
+        # Whole-number columns such as trades go out as integers when complete
+        if column == "trades" and not np.isnan(array).any():
+            array = array.astype(np.int64)
+        elif column in COLUMN_DECIMALS:
+            array = np.round(array, COLUMN_DECIMALS[column])
+        columns[column] = np.ascontiguousarray(array)
+    first = timestamps[0].astype(datetime).isoformat() if len(timestamps) else None
+    latest = timestamps[-1].astype(datetime).isoformat() if len(timestamps) else None
+    return {
+        "ai_model_id": ai_model_id,
+        "code_name": code_name,
+        "display_name": display_name,
+        "total_points": len(ids),
+        "first_timestamp": first,
+        "latest_timestamp": latest,
+        "time_base": time_base,
+        "time_deltas": time_deltas,
+        "id_base": id_base,
+        "id_deltas": id_deltas,
+        "columns": columns
+    }
+
+
+def columnar_group_from_rows(
+    ai_model_id: int,
+    code_name: str,
+    display_name: str,
+    ids: Sequence[int],
+    created_at: Sequence[datetime],
+    values: Dict[str, Sequence]
+) -> dict:
+    """Columnar group from per-column lists collected out of query results"""
+    return columnar_group(
+        ai_model_id,
+        code_name,
+        display_name,
+        np.array(ids, dtype=np.int64),
+        np.array(created_at, dtype="datetime64[us]"),
+        {column: np.array(column_values, dtype=np.float64) for column, column_values in values.items()}
+    )
@@ -0,0 +1,121 @@
+"""
+Downsampling Utilities
+----------------------
+Pick which points of a long series to draw on a chart. Every function
+returns sorted row positions that always include the first and last row.
+
+- even: evenly spaced rows, the same rows as the SQL resampling
+- lttb: Largest-Triangle-Three-Buckets, keeps the points that shape the line
+- minmax: the lowest and highest point of every bucket, so spikes and
+  drawdowns always survive
+"""
+
+import numpy as np
+
+EVEN = "even"
+LTTB = "lttb"
+MINMAX = "minmax"
+ALGORITHMS = (EVEN, LTTB, MINMAX)
+ALGORITHM_PATTERN = "^(" + "|".join(ALGORITHMS) + ")$"
+
+
+def fill_missing(y: np.ndarray) -> np.ndarray:
+    """Carry the last valid value over NaNs (leading NaNs take the first valid value)"""
+    missing = np.isnan(y)
+    if not missing.any():
+        return y
+    if missing.all():
+        return np.zeros_like(y)
+    positions = np.where(missing, 0, np.arange(len(y)))
+    np.maximum.accumulate(positions, out=positions)
+    filled = y[positions]
+    first_valid = np.argmax(~missing)
+    filled[:first_valid] = y[first_valid]
+    return filled
+
+
+def even_indices(n: int, points: int) -> np.ndarray:
+    """`points` evenly spaced row positions"""
+    if n <= points:
+        return np.arange(n)
+    k = np.arange(points, dtype=np.int64)
+    # round(k * (n - 1) / (points - 1)), rounding halves up like PostgreSQL
+    return (2 * k * (n - 1) + (points - 1)) // (2 * (points - 1))
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets.
+
+    The rows between the first and last are split into points - 2 buckets;
+    from each bucket the row forming the largest triangle with the previously
+    chosen row and the next bucket's average is kept. Bucket averages come
+    from cumulative sums and each bucket's areas are computed in one NumPy
+    expression, so the Python loop only runs once per output point.
+    """
+    n = len(x)
+    if n <= points:
+        return np.arange(n)
+    if points < 3:
+        return np.array([0, n - 1])
+
+    x = x.astype(np.float64)
+    y = fill_missing(y.astype(np.float64))
+
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    sizes = np.diff(edges)
+    sum_x = np.concatenate(([0.0], np.cumsum(x)))
+    sum_y = np.concatenate(([0.0], np.cumsum(y)))
+    avg_x = (sum_x[edges[1:]] - sum_x[edges[:-1]]) / sizes
+    avg_y = (sum_y[edges[1:]] - sum_y[edges[:-1]]) / sizes
+    # The last bucket looks ahead to the last row itself
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    anchor = 0
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        ax, ay = x[anchor], y[anchor]
+        areas = np.abs((ax - next_x[bucket]) * (y[start:end] - ay) - (ax - x[start:end]) * (next_y[bucket] - ay))
+        anchor = start + int(np.argmax(areas))
+        selected[bucket + 1] = anchor
+    return selected
+
+
+def minmax_indices(y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Lowest and highest row of each bucket.
+
+    The rows between the first and last are split into (points - 2) // 2
+    buckets; per-bucket extremes come from ufunc.reduceat and the first row
+    reaching each extreme is kept.
+    """
+    n = len(y)
+    if n <= points:
+        return np.arange(n)
+
+    y = fill_missing(y.astype(np.float64))
+    buckets = max((points - 2) // 2, 1)
+    edges = np.linspace(1, n - 1, buckets + 1).astype(np.int64)
+    inner = y[1:n - 1]
+    starts = edges[:-1] - 1
+    bucket_of = np.repeat(np.arange(buckets), np.diff(edges))
+
+    picked = [np.array([0, n - 1])]
+    for extremes in (np.minimum.reduceat(inner, starts), np.maximum.reduceat(inner, starts)):
+        hits = np.flatnonzero(inner == extremes[bucket_of])
+        _, first = np.unique(bucket_of[hits], return_index=True)
+        picked.append(hits[first] + 1)
+    return np.unique(np.concatenate(picked))
+
+
+def downsample_indices(algorithm: str, x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """Row positions to keep for the given algorithm"""
+    if algorithm == LTTB:
+        return lttb_indices(x, y, points)
+    if algorithm == MINMAX:
+        return minmax_indices(y, points)
+    return even_indices(len(x), points)
@@ -0,0 +1,214 @@
+"""
+Frame Bus Utilities
+-------------------
+Cross-worker fan-out for the WebSocket streams. For each stream one worker in
+the cluster is elected through a Redis lock and runs the producer; it
+publishes pre-serialized frames on a Redis channel and every worker (the
+leader included) relays them to its own sockets.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from config.redis import RedisClient
+
+# Identifies this worker process in leader locks
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# A leader that stops renewing loses the lock after LEADER_TTL_MS
+LEADER_TTL_MS = 10000
+LEADER_RENEW_INTERVAL = 3  # seconds
+
+# A worker's requested interval is ignored once it has not been refreshed for
+# INTERVAL_TTL_MS, so a crashed worker's clients stop setting the pace
+INTERVAL_TTL_MS = 60000
+
+RENEW_LEADER_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_LEADER_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def frame_channel(stream: str) -> str:
+    """Redis channel carrying a stream's frames"""
+    return f"ws_frames:{stream}"
+
+
+def leader_key(stream: str) -> str:
+    """Redis key holding the id of a stream's leader"""
+    return f"ws_leader:{stream}"
+
+
+def intervals_key(stream: str) -> str:
+    """Redis hash of the interval each worker's clients requested from a stream's producer"""
+    return f"ws_intervals:{stream}"
+
+
+def encode_frames(meta: dict, frames: Dict[str, Optional[bytes]]) -> bytes:
+    """
+    Pack metadata and several pre-serialized frames into one bus message.
+
+    The layout is a JSON header line holding the metadata and each frame's
+    byte length, followed by the frames back to back, so frames are not
+    escaped a second time inside another JSON document.
+    """
+    present = {name: data for name, data in frames.items() if data is not None}
+    header = {"meta": meta, "frames": {name: len(data) for name, data in present.items()}}
+    return json.dumps(header).encode("utf-8") + b"\n" + b"".join(present.values())
+
+
+def decode_frames(data: bytes) -> Tuple[dict, Dict[str, bytes]]:
+    """Unpack a bus message created by encode_frames"""
+    header_line, _, body = data.partition(b"\n")
+    header = json.loads(header_line)
+    frames = {}
+    offset = 0
+    for name, length in header["frames"].items():
+        frames[name] = body[offset:offset + length]
+        offset += length
+    return header["meta"], frames
+
+
+async def publish_frames(stream: str, meta: dict, frames: Dict[str, Optional[bytes]]):
+    """Publish frames for every worker's relay"""
+    await RedisClient.publish(frame_channel(stream), encode_frames(meta, frames))
+
+
+async def relay_frames(stream: str, handler: Callable[[dict, Dict[str, bytes]], Awaitable[None]]):
+    """
+    Forward every message on a stream's frame channel to `handler`.
+
+    Runs until cancelled, resubscribing if the Redis subscription drops.
+    """
+    while True:
+        subscription = RedisClient.subscribe(frame_channel(stream))
+        try:
+            while True:
+                data = await subscription.get()
+                if data is None:
+                    break
+                try:
+                    meta, frames = decode_frames(data)
+                except (ValueError, KeyError) as e:
+                    print(f"Dropping malformed frame on {stream}: {e}")
+                    continue
+                await handler(meta, frames)
+        except Exception as e:
+            print(f"Frame relay error on {stream}: {e}")
+        finally:
+            subscription.close()
+        await asyncio.sleep(1)
+
+
+class RequestedIntervals:
+    """This worker's entry in a stream's cluster-wide registry of requested producer intervals"""
+
+    def __init__(self, stream: str):
+        self.stream = stream
+        self.published: Optional[float] = None
+        self.published_at = 0.0
+
+    async def publish(self, interval: Optional[float]):
+        """
+        Record the fastest interval, in seconds, this worker's clients asked
+        for (None once it has no clients). An unchanged interval is only
+        written again before it expires.
+        """
+        now = time.monotonic()
+        if interval == self.published and (
+            interval is None or now - self.published_at < INTERVAL_TTL_MS / 3000
+        ):
+            return
+        key = intervals_key(self.stream)
+        if interval is None:
+            await RedisClient.execute("hdel", key, WORKER_ID)
+        else:
+            expires_at = int(time.time() * 1000) + INTERVAL_TTL_MS
+            await RedisClient.execute("hset", key, WORKER_ID, f"{interval}:{expires_at}")
+        self.published = interval
+        self.published_at = now
+
+    async def fastest(self, default: float) -> float:
+        """The shortest interval any worker requested, `default` when none did"""
+        entries = await RedisClient.hgetall(intervals_key(self.stream))
+        now_ms = time.time() * 1000
+        intervals = []
+        expired = []
+        for worker_id, value in entries.items():
+            try:
+                interval, expires_at = str(value).split(":")
+                if float(expires_at) >= now_ms:
+                    intervals.append(float(interval))
+                    continue
+            except ValueError:
+                pass
+            expired.append(worker_id)
+        if expired:
+            await RedisClient.execute("hdel", intervals_key(self.stream), *expired)
+        return min(intervals, default=default)
+
+
+class StreamLeadership:
+    """Runs a stream's producer only while this worker holds the stream's leader lock"""
+
+    def __init__(self, stream: str, producer: Callable[[], Awaitable[None]]):
+        self.stream = stream
+        self.producer = producer
+        self.is_leader = False
+
+    async def _try_lead(self) -> bool:
+        key = leader_key(self.stream)
+        if self.is_leader:
+            renewed = await RedisClient.execute("eval", RENEW_LEADER_SCRIPT, 1, key, WORKER_ID, LEADER_TTL_MS)
+            return bool(renewed)
+        acquired = await RedisClient.execute("execute_command", "SET", key, WORKER_ID, "NX", "PX", LEADER_TTL_MS)
+        return bool(acquired)
+
+    async def run(self):
+        """Campaign for leadership until cancelled, starting and stopping the producer as it changes"""
+        producer_task = None
+        try:
+            while True:
+                try:
+                    is_leader = await self._try_lead()
+                except Exception as e:
+                    # Step down rather than risk two producers
+                    print(f"Leader election error on {self.stream}: {e}")
+                    is_leader = False
+
+                if is_leader and not self.is_leader:
+                    print(f"Worker {WORKER_ID} is now producing {self.stream}")
+                elif self.is_leader and not is_leader:
+                    print(f"Worker {WORKER_ID} lost leadership of {self.stream}")
+                self.is_leader = is_leader
+
+                if self.is_leader and (producer_task is None or producer_task.done()):
+                    producer_task = asyncio.create_task(self.producer())
+                elif not self.is_leader and producer_task is not None:
+                    producer_task.cancel()
+                    producer_task = None
+
+                await asyncio.sleep(LEADER_RENEW_INTERVAL)
+        finally:
+            if producer_task is not None:
+                producer_task.cancel()
+            if self.is_leader:
+                self.is_leader = False
+                try:
+                    await RedisClient.execute("eval", RELEASE_LEADER_SCRIPT, 1, leader_key(self.stream), WORKER_ID)
+                except Exception as e:
+                    print(f"Failed to release leadership of {self.stream}: {e}")
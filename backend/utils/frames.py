@@ -0,0 +1,108 @@
+"""
+Frame Utilities
+---------------
+Broadcast messages are serialized once per push with orjson and the resulting
+bytes are shared by every connection, instead of running json.dumps and a
+UTF-8 encode for each socket. MessagePack and deflate variants are likewise
+built at most once per frame, by whichever connection first needs them.
+"""
+
+import zlib
+from typing import Any, Dict, Optional, Tuple, Union
+
+import msgpack
+import orjson
+
+# Datetimes go through `default=str` like json.dumps(default=str) did, so
+# timestamps keep their existing format; integer dict keys become strings and
+# NumPy arrays (columnar frames) are written natively, NaN as null
+FRAME_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# Wire encodings a client can ask for with ?encoding=
+TEXT_ENCODING = "text"        # JSON in text frames (default)
+BINARY_ENCODING = "binary"    # the same UTF-8 JSON bytes in binary frames, sent without re-encoding
+MSGPACK_ENCODING = "msgpack"  # MessagePack in binary frames
+FRAME_ENCODINGS = (TEXT_ENCODING, BINARY_ENCODING, MSGPACK_ENCODING)
+FRAME_ENCODING_PATTERN = "^(" + "|".join(FRAME_ENCODINGS) + ")$"
+
+# Compression a client can ask for with ?compression=; compressed frames are
+# always binary (zlib format, readable with DecompressionStream("deflate"))
+NO_COMPRESSION = "none"
+DEFLATE_COMPRESSION = "deflate"
+FRAME_COMPRESSIONS = (NO_COMPRESSION, DEFLATE_COMPRESSION)
+FRAME_COMPRESSION_PATTERN = "^(" + "|".join(FRAME_COMPRESSIONS) + ")$"
+DEFLATE_LEVEL = 6
+
+
+def encode_json(message: Any) -> bytes:
+    """Serialize a message to UTF-8 JSON bytes"""
+    return orjson.dumps(message, default=str, option=FRAME_OPTIONS)
+
+
+class Frame:
+    """A broadcast message serialized once and shared by every connection"""
+
+    __slots__ = ("data", "_text", "_variants", "_channels")
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self._text: Optional[str] = None
+        self._variants: Dict[Tuple[str, str], bytes] = {}
+        self._channels: Optional[Dict[str, "Frame"]] = None
+
+    @classmethod
+    def from_message(cls, message: Any) -> "Frame":
+        return cls(encode_json(message))
+
+    @property
+    def text(self) -> str:
+        """The frame as a str for text-frame clients, decoded once and cached"""
+        if self._text is None:
+            self._text = self.data.decode("utf-8")
+        return self._text
+
+    def payload(self, encoding: str = TEXT_ENCODING, compression: str = NO_COMPRESSION) -> Union[str, bytes]:
+        """
+        The frame in a connection's wire format: a str for text frames, bytes
+        for binary frames. Each variant is built once and then reused.
+        """
+        if compression == NO_COMPRESSION:
+            if encoding == TEXT_ENCODING:
+                return self.text
+            if encoding == BINARY_ENCODING:
+                return self.data
+
+        if encoding == TEXT_ENCODING:
+            # Compressed frames are binary; share the variant with 'binary' clients
+            encoding = BINARY_ENCODING
+        key = (encoding, compression)
+        variant = self._variants.get(key)
+        if variant is None:
+            if encoding == MSGPACK_ENCODING:
+                # Packed from the JSON form so both encodings carry the same values
+                variant = self._variants.get((MSGPACK_ENCODING, NO_COMPRESSION))
+                if variant is None:
+                    variant = msgpack.packb(orjson.loads(self.data))
+                    self._variants[(MSGPACK_ENCODING, NO_COMPRESSION)] = variant
+            else:
+                variant = self.data
+            if compression == DEFLATE_COMPRESSION:
+                variant = zlib.compress(variant, DEFLATE_LEVEL)
+            self._variants[key] = variant
+        return variant
+
+    def for_channel(self, channel: str) -> "Frame":
+        """
+        The frame wrapped as {"channel": ..., "message": ...} for multiplexed
+        connections, spliced from the serialized bytes once per channel
+        """
+        if self._channels is None:
+            self._channels = {}
+        tagged = self._channels.get(channel)
+        if tagged is None:
+            tagged = Frame(b'{"channel":' + orjson.dumps(channel) + b',"message":' + self.data + b"}")
+            self._channels[channel] = tagged
+        return tagged
+
+    def __len__(self) -> int:
+        return len(self.data)
@@ -0,0 +1,140 @@
+"""
+AI Model Identity Cache
+-----------------------
+In-process map of every AI model's id, code_name and display_name. The write
+routes resolve the code_name (or ai_model_id) of a request through it instead
+of querying ai_models on every write from the agents and the price updater.
+
+AI models are created and renamed outside the API, so the map is reloaded:
+- on a notification on AI_MODELS_CHANNEL, which whatever changes the table
+  can send with `SELECT pg_notify('ai_models', '')`
+- every AI_MODEL_CACHE_TTL seconds otherwise
+- right away when a code_name or id is not in it, at most once every
+  AI_MODEL_CACHE_MISS_INTERVAL seconds so unknown names do not cost a query each
+
+Nothing in this repository sends AI_MODELS_CHANNEL notifications yet, so in
+practice the map can be up to AI_MODEL_CACHE_TTL seconds stale. A new model
+is picked up by the miss reload, but after a rename the rows the write routes
+create until the next reload (trades included) carry the old display_name,
+since they take it from here instead of reading ai_models. A model
+deleted since the last reload still resolves until the next one; the write
+then fails on its foreign key as it would have without the cache.
+"""
+
+import asyncio
+import os
+import time
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import text
+
+from utils.notifications import ChangeListener, AI_MODELS_CHANNEL
+
+# Reload interval when no notification arrives
+AI_MODEL_CACHE_TTL = int(os.getenv("AI_MODEL_CACHE_TTL", "60"))  # seconds
+# Shortest time between two reloads caused by unknown code_names or ids
+AI_MODEL_CACHE_MISS_INTERVAL = 5  # seconds
+
+
+class ModelIdentity:
+    """The columns of one AI model the write routes copy into their rows"""
+
+    __slots__ = ("id", "code_name", "display_name")
+
+    def __init__(self, id: int, code_name: str, display_name: str):
+        self.id = id
+        self.code_name = code_name
+        self.display_name = display_name
+
+
+class ModelIdentityCache:
+    """Process-wide AI model identities by code_name and by id"""
+    by_code_name: Dict[str, ModelIdentity] = {}
+    by_id: Dict[int, ModelIdentity] = {}
+    loaded = False
+    # time.monotonic() of the last reload, and of the last one caused by a miss
+    loaded_at = 0.0
+    miss_reload_at = 0.0
+    sync_task = None
+    _lock = None
+
+    @classmethod
+    async def load(cls):
+        """Load every AI model and start following the table"""
+        try:
+            await cls.refresh()
+            print(f"Loaded AI model identity cache: {len(cls.by_id)} models")
+        except Exception as e:
+            print(f"Failed to load AI model identity cache, loading on first use: {e}")
+        if cls.sync_task is None or cls.sync_task.done():
+            cls.sync_task = asyncio.create_task(cls._sync())
+
+    @classmethod
+    async def close(cls):
+        """Stop following the table"""
+        if cls.sync_task is not None:
+            cls.sync_task.cancel()
+            cls.sync_task = None
+
+    @classmethod
+    async def refresh(cls, since: Optional[float] = None):
+        """
+        Reload every AI model and swap the maps in at once.
+
+        Args:
+            since: loaded_at as the caller saw it; the reload is skipped if
+                another one finished since, e.g. while waiting for the lock
+        """
+        from config.database import Database
+
+        if cls._lock is None:
+            cls._lock = asyncio.Lock()
+
+        async with cls._lock:
+            if since is not None and cls.loaded_at > since:
+                return
+            async with Database.async_session_maker() as session:
+                result = await session.execute(text("SELECT id, code_name, display_name FROM ai_models"))
+                identities = [ModelIdentity(*row) for row in result.fetchall()]
+            cls.by_code_name = {identity.code_name: identity for identity in identities}
+            cls.by_id = {identity.id: identity for identity in identities}
+            cls.loaded = True
+            cls.loaded_at = time.monotonic()
+
+    @classmethod
+    async def _sync(cls):
+        """Reload on AI model notifications, and at least every AI_MODEL_CACHE_TTL seconds"""
+        subscription = await ChangeListener.subscribe(AI_MODELS_CHANNEL)
+        try:
+            while True:
+                await subscription.wait(timeout=AI_MODEL_CACHE_TTL)
+                try:
+                    await cls.refresh()
+                except Exception as e:
+                    print(f"AI model identity cache refresh error: {e}")
+        finally:
+            await ChangeListener.unsubscribe(subscription)
+
+    @classmethod
+    async def get(cls, code_name: str) -> Optional[ModelIdentity]:
+        """The AI model with this code_name, None if there is none"""
+        return await cls._resolve(lambda: cls.by_code_name.get(code_name))
+
+    @classmethod
+    async def get_by_id(cls, ai_model_id: int) -> Optional[ModelIdentity]:
+        """The AI model with this id, None if there is none"""
+        return await cls._resolve(lambda: cls.by_id.get(ai_model_id))
+
+    @classmethod
+    async def _resolve(cls, find: Callable[[], Optional[ModelIdentity]]) -> Optional[ModelIdentity]:
+        now = time.monotonic()
+        if not cls.loaded or now - cls.loaded_at > AI_MODEL_CACHE_TTL:
+            # Covers processes where _sync is not running, e.g. scripts
+            await cls.refresh(since=cls.loaded_at)
+        identity = find()
+        if identity is None and now - cls.miss_reload_at >= AI_MODEL_CACHE_MISS_INTERVAL:
+            # Possibly created since the last reload
+            cls.miss_reload_at = now
+            await cls.refresh(since=cls.loaded_at)
+            identity = find()
+        return identity
@@ -0,0 +1,592 @@
+"""
+ModelData Cache
+---------------
+In-process, columnar copy of the append-only modeldata table. Each AI model's
+history is held in growable NumPy arrays ordered by created_at, so the
+modeldata stream can resample it without querying PostgreSQL on every tick.
+
+The cache is loaded once at startup and then follows the table through an
+id watermark: create_model_data sends a notification after each insert and
+every worker appends the new rows, while a slower poll also picks up rows
+written without a notification. Inserts can commit out of id order, leaving a
+row below the watermark that no refresh would fetch, so every
+MODELDATA_CACHE_VERIFY_INTERVAL seconds, notified or not, the rows below the
+watermark are counted and the table is reloaded if the count differs. Memory
+is bounded per model by thinning the older half of a model's history once it
+reaches MODELDATA_CACHE_MAX_ROWS.
+
+Downsampled results are kept per (model, algorithm, points, window, layout)
+until the model's series changes. Until the cache is loaded, readers fall back to the
+single-query SQL resampling.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from utils.notifications import ChangeListener, MODELDATA_CHANNEL
+from utils.downsampling import EVEN, downsample_indices
+from utils.columnar import ROWS_LAYOUT, COLUMNAR_LAYOUT, columnar_group, columnar_group_from_rows
+
+# Rows kept per model before the older half of its history is thinned
+MODELDATA_CACHE_MAX_ROWS = int(os.getenv("MODELDATA_CACHE_MAX_ROWS", "500000"))
+# Poll interval that catches rows written without a notification
+MODELDATA_CACHE_SYNC_INTERVAL = 30  # seconds
+# Interval of the check for rows committed below the watermark; notifications
+# arrive more often than the poll, so it runs on its own clock
+MODELDATA_CACHE_VERIFY_INTERVAL = 30  # seconds
+# Rows fetched per query while loading
+MODELDATA_CACHE_CHUNK_SIZE = 100000
+INITIAL_CAPACITY = 1024
+
+# Value columns held per model, besides id and created_at
+VALUE_COLUMNS = ("account_value", "return_value", "total_pnl", "fees", "trades")
+# Column whose shape LTTB and min/max downsampling preserve
+DOWNSAMPLE_COLUMN = "account_value"
+# Downsampled groups kept, keyed by (model, algorithm, points, window, layout)
+DOWNSAMPLE_CACHE_SIZE = 256
+
+# Points per model in modeldata stream frames, and the bounds clients can ask for
+MODELDATA_SAMPLE_POINTS = 500
+MODELDATA_MIN_POINTS = 10
+MODELDATA_MAX_POINTS = 5000
+# Shortest trailing window clients can ask for
+MODELDATA_MIN_WINDOW = 60  # seconds
+
+# Resamples every model's history in one round trip. Each model's rows are
+# numbered along the (ai_model_id, created_at) index and `points` evenly spaced
+# row numbers (always including the first and last row) are picked per model.
+MODELDATA_RESAMPLE_QUERY = text("""
+    WITH model_counts AS (
+        SELECT ai_model_id, COUNT(*) AS total_rows
+        FROM modeldata
+        GROUP BY ai_model_id
+    ),
+    sample_rows AS (
+        SELECT DISTINCT
+            mc.ai_model_id,
+            CASE
+                WHEN mc.total_rows <= :points THEN s.k + 1
+                ELSE CAST(1 + ROUND(s.k * (mc.total_rows - 1) / (:points - 1.0)) AS INTEGER)
+            END AS row_num
+        FROM model_counts mc
+        CROSS JOIN LATERAL generate_series(0, LEAST(mc.total_rows, :points) - 1) AS s(k)
+    ),
+    ranked_data AS (
+        SELECT
+            id,
+            ai_model_id,
+            code_name,
+            display_name,
+            account_value,
+            return_value,
+            total_pnl,
+            fees,
+            trades,
+            created_at,
+            ROW_NUMBER() OVER (PARTITION BY ai_model_id ORDER BY created_at) AS row_num
+        FROM modeldata
+    )
+    SELECT
+        rd.id,
+        rd.ai_model_id,
+        rd.code_name,
+        rd.display_name,
+        rd.account_value,
+        rd.return_value,
+        rd.total_pnl,
+        rd.fees,
+        rd.trades,
+        rd.created_at,
+        am.code_name AS model_code_name,
+        am.display_name AS model_display_name
+    FROM ranked_data rd
+    INNER JOIN sample_rows sr ON sr.ai_model_id = rd.ai_model_id AND sr.row_num = rd.row_num
+    INNER JOIN ai_models am ON am.id = rd.ai_model_id
+    ORDER BY rd.ai_model_id, rd.row_num
+""")
+
+FETCH_ROWS_QUERY = text("""
+    SELECT id, ai_model_id, created_at, account_value, return_value, total_pnl, fees, trades
+    FROM modeldata
+    WHERE id > :after_id
+    ORDER BY id
+    LIMIT :limit
+""")
+
+
+class ModelSeries:
+    """One model's modeldata history as growable columns, ordered by created_at"""
+
+    def __init__(self, ai_model_id: int, code_name: str, display_name: str):
+        self.ai_model_id = ai_model_id
+        self.code_name = code_name
+        self.display_name = display_name
+        self.size = 0
+        # Bumped on every change so downsampled results can be reused until then
+        self.version = 0
+        # Rows dropped to keep memory bounded
+        self.thinned = 0
+        self.ids = np.empty(INITIAL_CAPACITY, dtype=np.int64)
+        self.timestamps = np.empty(INITIAL_CAPACITY, dtype="datetime64[us]")
+        # trades is held as float so missing values can be NaN like the others
+        self.values = {column: np.empty(INITIAL_CAPACITY, dtype=np.float64) for column in VALUE_COLUMNS}
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only view of a column's filled part ('id', 'created_at' or a value column)"""
+        if name == "id":
+            array = self.ids
+        elif name == "created_at":
+            array = self.timestamps
+        else:
+            array = self.values[name]
+        view = array[:self.size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.timestamps.nbytes + sum(array.nbytes for array in self.values.values())
+
+    def _resize(self, capacity: int):
+        self.ids = np.resize(self.ids, capacity)
+        self.timestamps = np.resize(self.timestamps, capacity)
+        self.values = {column: np.resize(array, capacity) for column, array in self.values.items()}
+
+    def append(self, ids: np.ndarray, timestamps: np.ndarray, values: Dict[str, np.ndarray]):
+        """Append rows (ordered by id), keeping the series ordered by created_at"""
+        count = len(ids)
+        if count == 0:
+            return
+
+        if self.size + count > len(self.ids):
+            capacity = len(self.ids)
+            while capacity < self.size + count:
+                capacity *= 2
+            self._resize(capacity)
+
+        start, end = self.size, self.size + count
+        self.ids[start:end] = ids
+        self.timestamps[start:end] = timestamps
+        for column, array in self.values.items():
+            array[start:end] = values[column]
+        self.size = end
+        self.version += 1
+
+        # Rows normally arrive in time order; re-sort only when they did not
+        series_timestamps = self.timestamps[:end]
+        check_from = max(start - 1, 0)
+        if np.any(series_timestamps[check_from + 1:end] < series_timestamps[check_from:end - 1]):
+            order = np.lexsort((self.ids[:end], series_timestamps))
+            self.ids[:end] = self.ids[:end][order]
+            self.timestamps[:end] = series_timestamps[order]
+            for array in self.values.values():
+                array[:end] = array[:end][order]
+
+        while self.size > MODELDATA_CACHE_MAX_ROWS:
+            self._thin()
+
+    def _thin(self):
+        """Drop every other row from the older half, keeping the first row and recent detail"""
+        half = self.size // 2
+        keep = np.concatenate([np.arange(0, half, 2), np.arange(half, self.size)])
+        self.thinned += self.size - len(keep)
+        self.size = len(keep)
+        self.ids[:self.size] = self.ids[keep]
+        self.timestamps[:self.size] = self.timestamps[keep]
+        for array in self.values.values():
+            array[:self.size] = array[keep]
+
+    def window_start(self, window: Optional[int]) -> int:
+        """Position of the first row within `window` seconds of the latest row"""
+        if not window or self.size == 0:
+            return 0
+        cutoff = self.timestamps[self.size - 1] - np.timedelta64(window, "s")
+        return int(np.searchsorted(self.timestamps[:self.size], cutoff, side="left"))
+
+    def downsample(self, algorithm: str, points: int, window: Optional[int] = None) -> np.ndarray:
+        """Positions of the rows to keep, within the optional trailing window"""
+        start = self.window_start(window)
+        timestamps = self.timestamps[start:self.size]
+        # Seconds since the window's first row keep the LTTB areas well scaled
+        x = (timestamps - timestamps[0]) / np.timedelta64(1, "s") if len(timestamps) else timestamps
+        y = self.values[DOWNSAMPLE_COLUMN][start:self.size]
+        return start + downsample_indices(algorithm, x, y, points)
+
+    def data_points(self, indices: np.ndarray) -> List[dict]:
+        """Build modeldata stream data points for the rows at `indices`"""
+        ids = self.ids[indices].tolist()
+        created_at = self.timestamps[indices].astype(datetime).tolist()
+        columns = {
+            column: [None if np.isnan(value) else value for value in array[indices].tolist()]
+            for column, array in self.values.items()
+        }
+        return [
+            {
+                "id": ids[i],
+                "ai_model_id": self.ai_model_id,
+                "code_name": self.code_name,
+                "display_name": self.display_name,
+                "account_value": columns["account_value"][i],
+                "return_value": columns["return_value"][i],
+                "total_pnl": columns["total_pnl"][i],
+                "fees": columns["fees"][i],
+                "trades": int(columns["trades"][i]) if columns["trades"][i] is not None else None,
+                "created_at": created_at[i].isoformat()
+            }
+            for i in range(len(ids))
+        ]
+
+    def columnar_group(self, indices: np.ndarray) -> dict:
+        """Build a columnar modeldata group for the rows at `indices`, without per-point dicts"""
+        return columnar_group(
+            self.ai_model_id,
+            self.code_name,
+            self.display_name,
+            self.ids[indices],
+            self.timestamps[indices],
+            {column: array[indices] for column, array in self.values.items()}
+        )
+
+
+class ModelDataCache:
+    """Process-wide modeldata cache, following the table through an id watermark"""
+    series: Dict[int, ModelSeries] = {}
+    # (ai_model_id, algorithm, points, window, layout) -> (series, version, group)
+    downsampled: "OrderedDict[tuple, tuple]" = OrderedDict()
+    watermark = 0
+    # Bumped whenever a refresh changes the cached rows
+    generation = 0
+    loaded = False
+    # time.monotonic() of the last check below the watermark (or full reload)
+    verified_at = 0.0
+    sync_task = None
+    _lock = None
+
+    @classmethod
+    async def load(cls):
+        """Load every model's history and start following the table"""
+        try:
+            await cls.refresh(full=True)
+            cls.loaded = True
+            cls.verified_at = time.monotonic()
+            rows = sum(series.size for series in cls.series.values())
+            print(f"Loaded modeldata cache: {rows} rows for {len(cls.series)} models")
+        except Exception as e:
+            print(f"Failed to load modeldata cache, falling back to database queries: {e}")
+        if cls.sync_task is None or cls.sync_task.done():
+            cls.sync_task = asyncio.create_task(cls._sync())
+
+    @classmethod
+    async def close(cls):
+        """Stop following the table"""
+        if cls.sync_task is not None:
+            cls.sync_task.cancel()
+            cls.sync_task = None
+
+    @classmethod
+    async def refresh(cls, full: bool = False, verify: bool = False):
+        """
+        Append rows written since the last refresh.
+
+        With `full`, or when `verify` finds that rows below the watermark
+        appeared or disappeared (a transaction committed late or rows were
+        deleted), the whole table is reloaded and swapped in at once.
+        """
+        from config.database import Database
+
+        if cls._lock is None:
+            cls._lock = asyncio.Lock()
+
+        async with cls._lock:
+            async with Database.async_session_maker() as session:
+                if verify and not full and cls.loaded:
+                    result = await session.execute(
+                        text("SELECT COUNT(*) FROM modeldata WHERE id <= :watermark"),
+                        {"watermark": cls.watermark}
+                    )
+                    cached_rows = sum(series.size + series.thinned for series in cls.series.values())
+                    full = result.scalar() != cached_rows
+
+                series = {} if full else cls.series
+                watermark = 0 if full else cls.watermark
+                names = await cls._load_names(session)
+                for ai_model_id, model_series in series.items():
+                    model_series.code_name, model_series.display_name = names.get(
+                        ai_model_id, (model_series.code_name, model_series.display_name)
+                    )
+
+                while True:
+                    result = await session.execute(
+                        FETCH_ROWS_QUERY,
+                        {"after_id": watermark, "limit": MODELDATA_CACHE_CHUNK_SIZE}
+                    )
+                    rows = result.fetchall()
+                    if not rows:
+                        break
+                    cls._append_rows(series, names, rows)
+                    watermark = rows[-1][0]
+                    if len(rows) < MODELDATA_CACHE_CHUNK_SIZE:
+                        break
+
+            if full or watermark != cls.watermark:
+                cls.generation += 1
+            cls.series = series
+            cls.watermark = watermark
+
+    @classmethod
+    async def _load_names(cls, session) -> Dict[int, tuple]:
+        result = await session.execute(text("SELECT id, code_name, display_name FROM ai_models"))
+        return {row[0]: (row[1], row[2]) for row in result.fetchall()}
+
+    @classmethod
+    def _append_rows(cls, series: Dict[int, ModelSeries], names: Dict[int, tuple], rows: list):
+        columns = list(zip(*rows))
+        model_ids = np.array(columns[1], dtype=np.int64)
+        ids = np.array(columns[0], dtype=np.int64)
+        timestamps = np.array(columns[2], dtype="datetime64[us]")
+        values = {
+            column: np.array(columns[3 + i], dtype=np.float64)
+            for i, column in enumerate(VALUE_COLUMNS)
+        }
+
+        for ai_model_id in np.unique(model_ids).tolist():
+            mask = model_ids == ai_model_id
+            model_series = series.get(ai_model_id)
+            if model_series is None:
+                code_name, display_name = names.get(ai_model_id, (None, None))
+                model_series = series[ai_model_id] = ModelSeries(ai_model_id, code_name, display_name)
+            model_series.append(
+                ids[mask],
+                timestamps[mask],
+                {column: array[mask] for column, array in values.items()}
+            )
+
+    @classmethod
+    async def _sync(cls):
+        """
+        Refresh on modeldata notifications, polling in case rows arrive
+        without one, and check below the watermark on its own interval
+        """
+        subscription = await ChangeListener.subscribe(MODELDATA_CHANNEL)
+        try:
+            while True:
+                await subscription.wait(timeout=MODELDATA_CACHE_SYNC_INTERVAL)
+                now = time.monotonic()
+                # Also checks for rows that slipped below the watermark, when due
+                verify = now - cls.verified_at >= MODELDATA_CACHE_VERIFY_INTERVAL
+                try:
+                    await cls.refresh(full=not cls.loaded, verify=verify)
+                    cls.loaded = True
+                    if verify:
+                        cls.verified_at = now
+                except Exception as e:
+                    print(f"Modeldata cache refresh error: {e}")
+        finally:
+            await ChangeListener.unsubscribe(subscription)
+
+    @classmethod
+    def get(cls, ai_model_id: int) -> Optional[ModelSeries]:
+        """One model's series, for analytics that read the columns directly"""
+        return cls.series.get(ai_model_id)
+
+    @classmethod
+    def downsample_group(
+        cls,
+        ai_model_id: int,
+        algorithm: str,
+        points: int,
+        window: Optional[int] = None,
+        layout: str = ROWS_LAYOUT
+    ) -> Optional[dict]:
+        """
+        One model's downsampled modeldata group, reused until the model's
+        series changes.
+        """
+        series = cls.series.get(ai_model_id)
+        if series is None or series.size == 0:
+            return None
+
+        key = (ai_model_id, algorithm, points, window, layout)
+        cached = cls.downsampled.get(key)
+        if cached is not None and cached[0] is series and cached[1] == series.version:
+            cls.downsampled.move_to_end(key)
+            return cached[2]
+
+        indices = series.downsample(algorithm, points, window)
+        if layout == COLUMNAR_LAYOUT:
+            group = series.columnar_group(indices)
+        else:
+            group = cls._rows_group(series, series.data_points(indices))
+        cls.downsampled[key] = (series, series.version, group)
+        cls.downsampled.move_to_end(key)
+        while len(cls.downsampled) > DOWNSAMPLE_CACHE_SIZE:
+            cls.downsampled.popitem(last=False)
+        return group
+
+    @classmethod
+    def _rows_group(cls, series: ModelSeries, data_points: List[dict]) -> dict:
+        return {
+            "ai_model_id": series.ai_model_id,
+            "code_name": series.code_name,
+            "display_name": series.display_name,
+            "data_points": data_points,
+            "total_points": len(data_points),
+            "latest_timestamp": data_points[-1]["created_at"],
+            "first_timestamp": data_points[0]["created_at"]
+        }
+
+    @classmethod
+    def downsample(
+        cls,
+        algorithm: str,
+        points: int,
+        window: Optional[int] = None,
+        ai_model_ids: Optional[Iterable[int]] = None,
+        layout: str = ROWS_LAYOUT
+    ) -> Dict[str, dict]:
+        """
+        Downsampled data points for every model (or the given models), in the
+        same shape as the database resampling used by the modeldata stream.
+        """
+        modeldata_groups = {}
+        for ai_model_id in sorted(cls.series if ai_model_ids is None else ai_model_ids):
+            group = cls.downsample_group(ai_model_id, algorithm, points, window, layout)
+            if group is not None:
+                modeldata_groups[str(ai_model_id)] = group
+        return modeldata_groups
+
+    @classmethod
+    def resample(cls, points: int) -> Dict[str, dict]:
+        """Evenly resampled data points for every model"""
+        return cls.downsample(EVEN, points)
+
+    @classmethod
+    def status(cls) -> dict:
+        """Cache size for /ws/status"""
+        return {
+            "loaded": cls.loaded,
+            "models": len(cls.series),
+            "rows": sum(series.size for series in cls.series.values()),
+            "thinned_rows": sum(series.thinned for series in cls.series.values()),
+            "memory_bytes": sum(series.nbytes for series in cls.series.values()),
+            "watermark_id": cls.watermark,
+            "generation": cls.generation
+        }
+
+
+async def load_resampled_modeldata(
+    session: AsyncSession,
+    points: int = MODELDATA_SAMPLE_POINTS,
+    layout: str = ROWS_LAYOUT
+) -> Dict[str, dict]:
+    """
+    Fetch evenly resampled modeldata for every AI model with a single query.
+
+    Returns:
+        Groups keyed by str(ai_model_id), in ai_model_id order, each holding
+        the model's names and its sampled data points (in `layout`)
+    """
+    result = await session.execute(MODELDATA_RESAMPLE_QUERY, {"points": max(points, 2)})
+    rows = result.fetchall()
+    if layout == COLUMNAR_LAYOUT:
+        return _columnar_groups(rows)
+
+    modeldata_groups = {}
+    for row in rows:
+        group = modeldata_groups.get(str(row[1]))
+        if group is None:
+            group = modeldata_groups[str(row[1])] = {
+                "ai_model_id": row[1],
+                "code_name": row[10],
+                "display_name": row[11],
+                "data_points": []
+            }
+        group["data_points"].append({
+            "id": row[0],
+            "ai_model_id": row[1],
+            "code_name": row[2],
+            "display_name": row[3],
+            "account_value": float(row[4]) if row[4] is not None else None,
+            "return_value": float(row[5]) if row[5] is not None else None,
+            "total_pnl": float(row[6]) if row[6] is not None else None,
+            "fees": float(row[7]) if row[7] is not None else None,
+            "trades": int(row[8]) if row[8] is not None else None,
+            "created_at": row[9].isoformat() if row[9] else None
+        })
+
+    for group in modeldata_groups.values():
+        data_points = group["data_points"]
+        group["total_points"] = len(data_points)
+        group["latest_timestamp"] = data_points[-1]["created_at"]
+        group["first_timestamp"] = data_points[0]["created_at"]
+
+    return modeldata_groups
+
+
+def _columnar_groups(rows: list) -> Dict[str, dict]:
+    """Columnar groups from resample query rows, collected per column"""
+    collected = {}
+    for row in rows:
+        model = collected.get(row[1])
+        if model is None:
+            model = collected[row[1]] = (row[10], row[11], [], [], {column: [] for column in VALUE_COLUMNS})
+        model[2].append(row[0])
+        model[3].append(row[9])
+        for i, column in enumerate(VALUE_COLUMNS):
+            model[4][column].append(row[4 + i])
+    return {
+        str(ai_model_id): columnar_group_from_rows(ai_model_id, code_name, display_name, ids, created_at, values)
+        for ai_model_id, (code_name, display_name, ids, created_at, values) in collected.items()
+    }
+
+
+async def get_modeldata_version() -> tuple:
+    """
+    Cheap marker of the modeldata table's state, to skip rebuilding frames
+    when nothing was written: the cache generation, or the table's highest
+    id until the cache is loaded
+    """
+    from config.database import Database
+
+    if ModelDataCache.loaded:
+        return ("cache", ModelDataCache.generation)
+    async with Database.async_session_maker() as session:
+        result = await session.execute(text("SELECT MAX(id) FROM modeldata"))
+        return ("table", result.scalar())
+
+
+async def get_downsampled_modeldata(
+    algorithm: str = EVEN,
+    points: int = MODELDATA_SAMPLE_POINTS,
+    window: Optional[int] = None,
+    ai_model_ids: Optional[Iterable[int]] = None,
+    layout: str = ROWS_LAYOUT
+) -> Tuple[str, Dict[str, dict]]:
+    """
+    Downsample every model's modeldata (or the given models').
+
+    Reads the in-memory cache; until it is loaded, falls back to the
+    database's even resampling over the full history.
+
+    Returns:
+        The algorithm actually used and the groups keyed by str(ai_model_id)
+    """
+    from config.database import Database
+
+    if ModelDataCache.loaded:
+        return algorithm, ModelDataCache.downsample(algorithm, points, window, ai_model_ids, layout)
+
+    async with Database.async_session_maker() as session:
+        modeldata_groups = await load_resampled_modeldata(session, points, layout)
+    if ai_model_ids is not None:
+        wanted = {str(ai_model_id) for ai_model_id in ai_model_ids}
+        modeldata_groups = {key: group for key, group in modeldata_groups.items() if key in wanted}
+    return EVEN, modeldata_groups
@@ -0,0 +1,289 @@
+"""
+ModelData History
+-----------------
+Time-bucketed modeldata history for charts. Buckets are aligned to multiples
+of the bucket width since the epoch (on the stored IST timestamps) and every
+model's values are returned as columns aligned to one shared time axis.
+
+Buckets are aggregated from the first source that can answer the request in
+one pass:
+- the in-memory modeldata cache, when it is loaded and none of the requested
+  models have had history thinned
+- modeldata_rollups, when the bucket width is a multiple of a rollup
+  resolution and the aggregate is last/min/max
+- the raw modeldata table otherwise
+"""
+
+import math
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from utils.modeldata_cache import ModelDataCache, VALUE_COLUMNS
+from utils.modeldata_rollups import RESOLUTIONS
+
+LAST = "last"
+AVG = "avg"
+MIN = "min"
+MAX = "max"
+AGGREGATES = (LAST, AVG, MIN, MAX)
+AGGREGATE_PATTERN = "^(" + "|".join(AGGREGATES) + ")$"
+
+HISTORY_METRICS = VALUE_COLUMNS
+# Buckets per model when neither a bucket width nor a point count is given
+HISTORY_DEFAULT_POINTS = 500
+HISTORY_MAX_POINTS = 5000
+# Bucket widths (seconds) a point count is rounded up to, so buckets line up
+# with wall-clock boundaries and the rollups; past a day, whole days are used
+NICE_BUCKETS = (
+    1, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800,
+    3600, 7200, 10800, 21600, 43200, 86400
+)
+
+SOURCE_CACHE = "cache"
+SOURCE_ROLLUPS = "rollups"
+SOURCE_MODELDATA = "modeldata"
+
+EPOCH = datetime(1970, 1, 1)
+
+# SQL aggregate per metric, over raw rows and over rollup buckets
+_RAW_AGGREGATES = {
+    LAST: "(array_agg(m.{metric} ORDER BY m.created_at DESC, m.id DESC))[1]",
+    AVG: "AVG(m.{metric})",
+    MIN: "MIN(m.{metric})",
+    MAX: "MAX(m.{metric})",
+}
+_ROLLUP_AGGREGATES = {
+    LAST: "(array_agg(m.{metric}_close ORDER BY m.bucket_start DESC))[1]",
+    MIN: "MIN(m.{metric}_low)",
+    MAX: "MAX(m.{metric}_high)",
+}
+
+_HISTORY_QUERY = """
+    SELECT
+        m.ai_model_id,
+        am.code_name,
+        am.display_name,
+        CAST(floor(EXTRACT(EPOCH FROM m.{time_column}) / CAST(:bucket AS INTEGER)) AS BIGINT) - :first_bucket AS bucket_index,
+        {aggregates}
+    FROM {table} m
+    INNER JOIN ai_models am ON am.id = m.ai_model_id
+    WHERE {where}
+        AND m.{time_column} >= :start AND m.{time_column} < :end
+        AND (CAST(:all_models AS BOOLEAN) OR m.ai_model_id = ANY(:ai_model_ids))
+    GROUP BY m.ai_model_id, am.code_name, am.display_name, bucket_index
+    ORDER BY m.ai_model_id, bucket_index
+"""
+
+
+def _epoch_seconds(value: datetime) -> float:
+    return (value - EPOCH).total_seconds()
+
+
+def bucket_width(start: datetime, end: datetime, points: int) -> int:
+    """Smallest aligned bucket width (seconds) giving at most `points` buckets"""
+    needed = math.ceil((end - start).total_seconds() / max(points, 1))
+    for width in NICE_BUCKETS:
+        if width >= needed:
+            return width
+    return math.ceil(needed / 86400) * 86400
+
+
+def rollup_resolution(bucket: int, aggregate: str) -> Optional[int]:
+    """Coarsest rollup resolution the buckets can be built from, if any"""
+    if aggregate == AVG:
+        return None
+    for resolution in sorted(RESOLUTIONS, reverse=True):
+        if bucket % resolution == 0:
+            return resolution
+    return None
+
+
+def _history_query(aggregate: str, metrics: List[str], resolution: Optional[int]):
+    if resolution is None:
+        aggregates = _RAW_AGGREGATES[aggregate]
+        table, time_column, where = "modeldata", "created_at", "TRUE"
+    else:
+        aggregates = _ROLLUP_AGGREGATES[aggregate]
+        table, time_column, where = "modeldata_rollups", "bucket_start", "m.resolution = :resolution"
+    return text(_HISTORY_QUERY.format(
+        aggregates=",\n        ".join(aggregates.format(metric=metric) for metric in metrics),
+        table=table,
+        time_column=time_column,
+        where=where
+    ))
+
+
+def _empty_columns(metrics: List[str], count: int) -> Dict[str, np.ndarray]:
+    return {metric: np.full(count, np.nan) for metric in metrics}
+
+
+def _column_lists(columns: Dict[str, np.ndarray], aggregate: str) -> Dict[str, list]:
+    """NumPy columns to JSON lists, with None for empty buckets"""
+    lists = {}
+    for metric, values in columns.items():
+        as_int = metric == "trades" and aggregate != AVG
+        lists[metric] = [
+            None if math.isnan(value) else (int(value) if as_int else value)
+            for value in values.tolist()
+        ]
+    return lists
+
+
+def _aggregate_series(series, start: datetime, end: datetime, bucket: int, first_bucket: int,
+                      count: int, aggregate: str, metrics: List[str]) -> Optional[Dict[str, np.ndarray]]:
+    """Bucket one cached model series with NumPy, or None if it has no rows in range"""
+    timestamps = series.column("created_at")
+    lo = int(np.searchsorted(timestamps, np.datetime64(start, "us"), side="left"))
+    hi = int(np.searchsorted(timestamps, np.datetime64(end, "us"), side="left"))
+    if lo == hi:
+        return None
+
+    seconds = (timestamps[lo:hi] - np.datetime64(EPOCH, "us")) // np.timedelta64(1, "s")
+    indices = seconds // bucket - first_bucket
+    starts = np.flatnonzero(np.concatenate(([True], indices[1:] != indices[:-1])))
+    ends = np.append(starts[1:], hi - lo)
+    filled = indices[starts]
+
+    columns = _empty_columns(metrics, count)
+    for metric in metrics:
+        values = series.column(metric)[lo:hi]
+        if aggregate == LAST:
+            columns[metric][filled] = values[ends - 1]
+        elif aggregate == MIN:
+            columns[metric][filled] = np.fmin.reduceat(values, starts)
+        elif aggregate == MAX:
+            columns[metric][filled] = np.fmax.reduceat(values, starts)
+        else:
+            present = ~np.isnan(values)
+            sums = np.add.reduceat(np.where(present, values, 0.0), starts)
+            counts = np.add.reduceat(present.astype(np.int64), starts)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                columns[metric][filled] = np.where(counts > 0, sums / counts, np.nan)
+    return columns
+
+
+def _history_from_cache(ai_model_ids: Optional[List[int]], start: datetime, end: datetime, bucket: int,
+                        first_bucket: int, count: int, aggregate: str, metrics: List[str]) -> Dict[str, dict]:
+    models = {}
+    for ai_model_id in sorted(ModelDataCache.series if ai_model_ids is None else ai_model_ids):
+        series = ModelDataCache.get(ai_model_id)
+        if series is None or series.size == 0:
+            continue
+        columns = _aggregate_series(series, start, end, bucket, first_bucket, count, aggregate, metrics)
+        if columns is None:
+            continue
+        models[str(ai_model_id)] = {
+            "code_name": series.code_name,
+            "display_name": series.display_name,
+            **_column_lists(columns, aggregate)
+        }
+    return models
+
+
+async def _history_from_database(db: AsyncSession, ai_model_ids: Optional[List[int]], start: datetime,
+                                 end: datetime, bucket: int, first_bucket: int, count: int,
+                                 aggregate: str, metrics: List[str], resolution: Optional[int]) -> Dict[str, dict]:
+    params = {
+        "bucket": bucket,
+        "first_bucket": first_bucket,
+        "start": start,
+        "end": end,
+        "all_models": ai_model_ids is None,
+        "ai_model_ids": ai_model_ids or []
+    }
+    if resolution is not None:
+        params["resolution"] = resolution
+    result = await db.execute(_history_query(aggregate, metrics, resolution), params)
+
+    groups = {}
+    for row in result.fetchall():
+        group = groups.get(row[0])
+        if group is None:
+            group = groups[row[0]] = (row[1], row[2], _empty_columns(metrics, count))
+        for i, metric in enumerate(metrics):
+            value = row[4 + i]
+            group[2][metric][row[3]] = np.nan if value is None else float(value)
+
+    return {
+        str(ai_model_id): {
+            "code_name": code_name,
+            "display_name": display_name,
+            **_column_lists(columns, aggregate)
+        }
+        for ai_model_id, (code_name, display_name, columns) in groups.items()
+    }
+
+
+async def load_modeldata_history(
+    db: AsyncSession,
+    start: datetime,
+    end: datetime,
+    aggregate: str = LAST,
+    bucket: Optional[int] = None,
+    points: int = HISTORY_DEFAULT_POINTS,
+    ai_model_ids: Optional[Iterable[int]] = None,
+    metrics: Optional[Iterable[str]] = None
+) -> dict:
+    """
+    Aggregate modeldata into aligned time buckets for every model (or the
+    given models), in one pass over the chosen source.
+
+    Args:
+        db: Session used when the buckets come from the database
+        start, end: Naive IST range; it is widened to whole buckets
+        aggregate: 'last', 'avg', 'min' or 'max' of each bucket's rows
+        bucket: Bucket width in seconds (default: derived from `points`)
+        points: Target bucket count when no width is given
+        ai_model_ids: Only these models (default: all)
+        metrics: Only these columns (default: all modeldata metrics)
+
+    Returns:
+        The bucket width, the shared bucket start times and, per model, one
+        list per metric aligned to those times (None for empty buckets)
+
+    Raises:
+        ValueError: If the range holds more than HISTORY_MAX_POINTS buckets
+    """
+    bucket = bucket or bucket_width(start, end, points)
+    first_bucket = math.floor(_epoch_seconds(start) / bucket)
+    last_bucket = math.ceil(_epoch_seconds(end) / bucket)
+    count = last_bucket - first_bucket
+    if count > HISTORY_MAX_POINTS:
+        raise ValueError(
+            f"{count} buckets of {bucket}s requested, at most {HISTORY_MAX_POINTS} are allowed"
+        )
+    aligned_start = EPOCH + timedelta(seconds=first_bucket * bucket)
+    aligned_end = EPOCH + timedelta(seconds=last_bucket * bucket)
+    metrics = list(metrics or HISTORY_METRICS)
+    ai_model_ids = None if ai_model_ids is None else sorted(set(ai_model_ids))
+
+    cached_series = [
+        ModelDataCache.get(ai_model_id)
+        for ai_model_id in (ModelDataCache.series if ai_model_ids is None else ai_model_ids)
+    ]
+    if ModelDataCache.loaded and all(series is None or series.thinned == 0 for series in cached_series):
+        source = SOURCE_CACHE
+        models = _history_from_cache(ai_model_ids, aligned_start, aligned_end, bucket, first_bucket,
+                                     count, aggregate, metrics)
+    else:
+        resolution = rollup_resolution(bucket, aggregate)
+        source = SOURCE_MODELDATA if resolution is None else SOURCE_ROLLUPS
+        models = await _history_from_database(db, ai_model_ids, aligned_start, aligned_end, bucket,
+                                              first_bucket, count, aggregate, metrics, resolution)
+
+    return {
+        "aggregate": aggregate,
+        "bucket": bucket,
+        "source": source,
+        "start": aligned_start.isoformat(),
+        "end": aligned_end.isoformat(),
+        "metrics": metrics,
+        "timestamps": [
+            (aligned_start + timedelta(seconds=i * bucket)).isoformat() for i in range(count)
+        ],
+        "models": models
+    }
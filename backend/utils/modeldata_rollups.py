@@ -0,0 +1,223 @@
+"""
+ModelData Rollups
+-----------------
+Maintains modeldata_rollups, the open/high/low/close of every modeldata
+metric per AI model at 1-minute, 15-minute, 1-hour and 1-day resolution, so
+chart queries read a few thousand buckets instead of scanning raw rows.
+
+create_model_data folds each new row into its four buckets inside the same
+transaction, so the table must exist before modeldata is written: the API
+creates it at startup with ensure_rollup_table(). Existing history is (re)built with the backfill command, which
+recomputes whole days from the raw rows and can be re-run safely:
+
+    python -m utils.modeldata_rollups backfill --start 2025-01-01 --chunk-days 7
+
+Buckets are aligned to the epoch on the stored (IST) timestamps, so daily
+buckets start at IST midnight. A modeldata row committed while the backfill
+is rewriting its bucket can be left out of that bucket until the next
+backfill of the same day.
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tables.modeldata_rollup import ModelDataRollup
+
+# Bucket widths in seconds, finest first; each one divides a day
+RESOLUTIONS = (60, 900, 3600, 86400)
+ROLLUP_METRICS = ("account_value", "return_value", "total_pnl", "fees", "trades")
+# Days recomputed per backfill transaction
+BACKFILL_CHUNK_DAYS = 7
+
+_RESOLUTION_VALUES = ", ".join(f"({resolution})" for resolution in RESOLUTIONS)
+_ROLLUP_COLUMNS = [
+    f"{metric}_{part}" for metric in ROLLUP_METRICS for part in ("open", "high", "low", "close")
+] + ["sample_count", "first_at", "last_at", "last_id"]
+_AGGREGATES = ",\n".join(
+    f"""
+        (array_agg(m.{metric} ORDER BY m.created_at, m.id))[1],
+        MAX(m.{metric}),
+        MIN(m.{metric}),
+        (array_agg(m.{metric} ORDER BY m.created_at DESC, m.id DESC))[1]"""
+    for metric in ROLLUP_METRICS
+)
+
+# Aggregates the modeldata rows matching {where} into every resolution's buckets
+_ROLLUP_INSERT = f"""
+    INSERT INTO modeldata_rollups AS r (
+        resolution, ai_model_id, bucket_start, {", ".join(_ROLLUP_COLUMNS)}
+    )
+    SELECT
+        res.resolution,
+        m.ai_model_id,
+        TIMESTAMP 'epoch' + make_interval(
+            secs => floor(EXTRACT(EPOCH FROM m.created_at) / res.resolution) * res.resolution
+        ) AS bucket_start,
+        {_AGGREGATES},
+        COUNT(*),
+        MIN(m.created_at),
+        MAX(m.created_at),
+        (array_agg(m.id ORDER BY m.created_at DESC, m.id DESC))[1]
+    FROM modeldata m
+    CROSS JOIN (VALUES {_RESOLUTION_VALUES}) AS res(resolution)
+    WHERE {{where}}
+    GROUP BY res.resolution, m.ai_model_id, bucket_start
+    ON CONFLICT (resolution, ai_model_id, bucket_start) DO UPDATE SET
+    {{updates}}
+"""
+
+
+def _merge_updates() -> str:
+    """ON CONFLICT assignments that fold newer rows into an existing bucket"""
+    updates = []
+    for metric in ROLLUP_METRICS:
+        updates += [
+            f"{metric}_open = CASE WHEN EXCLUDED.first_at < r.first_at "
+            f"THEN EXCLUDED.{metric}_open ELSE r.{metric}_open END",
+            f"{metric}_high = GREATEST(r.{metric}_high, EXCLUDED.{metric}_high)",
+            f"{metric}_low = LEAST(r.{metric}_low, EXCLUDED.{metric}_low)",
+            f"{metric}_close = CASE WHEN EXCLUDED.last_at >= r.last_at "
+            f"THEN EXCLUDED.{metric}_close ELSE r.{metric}_close END",
+        ]
+    updates += [
+        "sample_count = r.sample_count + EXCLUDED.sample_count",
+        "first_at = LEAST(r.first_at, EXCLUDED.first_at)",
+        "last_at = GREATEST(r.last_at, EXCLUDED.last_at)",
+        "last_id = CASE WHEN EXCLUDED.last_at >= r.last_at THEN EXCLUDED.last_id ELSE r.last_id END",
+    ]
+    return ",\n    ".join(updates)
+
+
+def _replace_updates() -> str:
+    """ON CONFLICT assignments that overwrite a bucket with recomputed values"""
+    return ",\n    ".join(f"{column} = EXCLUDED.{column}" for column in _ROLLUP_COLUMNS)
+
+
+ROLLUP_MERGE_QUERY = text(_ROLLUP_INSERT.format(where="m.id = :modeldata_id", updates=_merge_updates()))
+ROLLUP_REBUILD_QUERY = text(_ROLLUP_INSERT.format(
+    where="m.created_at >= :start AND m.created_at < :end",
+    updates=_replace_updates()
+))
+ROLLUP_DELETE_QUERY = text("""
+    DELETE FROM modeldata_rollups
+    WHERE bucket_start >= :start AND bucket_start < :end
+""")
+
+
+async def update_rollups(db: AsyncSession, modeldata_id: int):
+    """
+    Fold a flushed modeldata row into its bucket at every resolution.
+
+    Runs inside the caller's transaction, so the row and its rollups commit
+    (or roll back) together.
+    """
+    await db.execute(ROLLUP_MERGE_QUERY, {"modeldata_id": modeldata_id})
+
+
+def choose_resolution(start: datetime, end: datetime, points: int) -> Optional[int]:
+    """
+    Coarsest resolution that still yields at least `points` buckets between
+    `start` and `end`, or None when only raw rows are fine-grained enough.
+    """
+    span = (end - start).total_seconds()
+    for resolution in sorted(RESOLUTIONS, reverse=True):
+        if span / resolution >= points:
+            return resolution
+    return None
+
+
+async def load_rollups(
+    db: AsyncSession,
+    resolution: int,
+    start: datetime,
+    end: datetime,
+    ai_model_ids: Optional[Iterable[int]] = None
+) -> List[ModelDataRollup]:
+    """Buckets at `resolution` starting in [start, end), ordered by model and time"""
+    query = select(ModelDataRollup).where(
+        ModelDataRollup.resolution == resolution,
+        ModelDataRollup.bucket_start >= start,
+        ModelDataRollup.bucket_start < end
+    )
+    if ai_model_ids is not None:
+        query = query.where(ModelDataRollup.ai_model_id.in_(list(ai_model_ids)))
+    query = query.order_by(ModelDataRollup.ai_model_id, ModelDataRollup.bucket_start)
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+
+async def ensure_rollup_table():
+    """Create modeldata_rollups if it does not exist yet"""
+    from config.database import Database
+
+    async with Database.engine.begin() as conn:
+        await conn.run_sync(lambda sync_conn: ModelDataRollup.__table__.create(sync_conn, checkfirst=True))
+
+
+def _day_floor(value: datetime) -> datetime:
+    return datetime(value.year, value.month, value.day)
+
+
+async def backfill_rollups(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    chunk_days: int = BACKFILL_CHUNK_DAYS
+):
+    """
+    Recompute every rollup bucket between `start` and `end` (default: the
+    whole modeldata table) from the raw rows, one chunk of whole days per
+    transaction.
+    """
+    from config.database import Database
+
+    await ensure_rollup_table()
+
+    async with Database.async_session_maker() as session:
+        result = await session.execute(text("SELECT MIN(created_at), MAX(created_at) FROM modeldata"))
+        first_at, last_at = result.one()
+    if first_at is None:
+        print("No modeldata rows to roll up")
+        return
+
+    chunk_start = _day_floor(start or first_at)
+    end = _day_floor(end or last_at) + timedelta(days=1)
+    while chunk_start < end:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days), end)
+        async with Database.async_session_maker() as session:
+            params = {"start": chunk_start, "end": chunk_end}
+            await session.execute(ROLLUP_DELETE_QUERY, params)
+            result = await session.execute(ROLLUP_REBUILD_QUERY, params)
+            await session.commit()
+        print(f"Rolled up {chunk_start:%Y-%m-%d} to {chunk_end:%Y-%m-%d}: {result.rowcount} buckets")
+        chunk_start = chunk_end
+
+
+async def _run_backfill(args):
+    from config.database import Database
+    import tables  # Registers ai_models for the rollup table's foreign key
+
+    await Database.connect_db()
+    try:
+        await backfill_rollups(args.start, args.end, args.chunk_days)
+    finally:
+        await Database.close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill = subparsers.add_parser("backfill", help="Rebuild rollups from the modeldata table")
+    backfill.add_argument("--start", type=datetime.fromisoformat, default=None, help="First day to rebuild (default: oldest row)")
+    backfill.add_argument("--end", type=datetime.fromisoformat, default=None, help="Last day to rebuild (default: newest row)")
+    backfill.add_argument("--chunk-days", type=int, default=BACKFILL_CHUNK_DAYS, help="Days recomputed per transaction")
+    args = parser.parse_args()
+    asyncio.run(_run_backfill(args))
+
+
+if __name__ == "__main__":
+    main()
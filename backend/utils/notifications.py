@@ -0,0 +1,185 @@
+"""
+Change Notification Utilities
+-----------------------------
+PostgreSQL LISTEN/NOTIFY helpers that let write routes wake the WebSocket
+broadcasters as soon as a transaction commits, instead of polling on a timer.
+"""
+
+import asyncio
+import json
+from typing import Dict, List, Set
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.database import DATABASE_URL
+
+# Channel used by the position/trade/modelchat writers
+MODEL_UPDATES_CHANNEL = "model_updates"
+# Channel used by the modeldata writer
+MODELDATA_CHANNEL = "modeldata_updates"
+# Channel for changes to ai_models, sent by whatever creates or renames models
+AI_MODELS_CHANNEL = "ai_models"
+
+
+def change_payload(*tables: str) -> str:
+    """NOTIFY payload reporting changes to `tables`, for statements that notify themselves"""
+    return json.dumps({"tables": list(tables)})
+
+
+async def notify_change(db: AsyncSession, *tables: str, channel: str = MODEL_UPDATES_CHANNEL):
+    """
+    Queue a change notification inside the current transaction.
+
+    PostgreSQL only delivers NOTIFY payloads when the surrounding transaction
+    commits, so listeners never see a change that was rolled back.
+
+    Args:
+        db: Session whose transaction the notification belongs to
+        *tables: Names of the tables that were modified
+        channel: Notification channel name
+    """
+    payload = change_payload(*tables)
+    await db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": channel, "payload": payload}
+    )
+
+
+async def request_wake(channel: str = MODEL_UPDATES_CHANNEL):
+    """
+    Wake whichever worker is consuming `channel` without reporting any changed
+    tables, e.g. so a new WebSocket client gets data right away.
+    """
+    from config.database import Database
+
+    async with Database.async_session_maker() as session:
+        await session.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": channel, "payload": json.dumps({"wake": True})}
+        )
+        await session.commit()
+
+
+class ChangeSubscription:
+    """Receives notifications for one channel on behalf of one consumer"""
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.event = asyncio.Event()
+        self.pending: List[dict] = []
+
+    def _push(self, payload: dict):
+        self.pending.append(payload)
+        self.event.set()
+
+    async def wait(self, timeout: float, debounce: float = 0.25, max_delay: float = 1.0) -> List[dict]:
+        """
+        Wait for the next burst of notifications.
+
+        Once the first notification arrives, further notifications are absorbed
+        until the channel has been quiet for `debounce` seconds or `max_delay`
+        seconds have passed, so a burst of writes results in a single push.
+
+        Args:
+            timeout: Fallback poll interval in seconds
+            debounce: Quiet period that ends a burst
+            max_delay: Upper bound on how long a burst can be delayed
+
+        Returns:
+            List of notification payloads, empty if the timeout elapsed first
+        """
+        await ChangeListener.ensure_connected()
+
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_delay
+        while True:
+            self.event.clear()
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self.event.wait(), min(debounce, remaining))
+            except asyncio.TimeoutError:
+                break
+
+        self.event.clear()
+        payloads, self.pending = self.pending, []
+        return payloads
+
+
+class ChangeListener:
+    """Process-wide LISTEN connection shared by all change subscriptions"""
+    connection = None
+    subscriptions: Dict[str, Set[ChangeSubscription]] = {}
+    _lock = None
+
+    @classmethod
+    async def subscribe(cls, channel: str) -> ChangeSubscription:
+        """Subscribe to a notification channel"""
+        subscription = ChangeSubscription(channel)
+        cls.subscriptions.setdefault(channel, set()).add(subscription)
+        await cls.ensure_connected()
+        return subscription
+
+    @classmethod
+    async def unsubscribe(cls, subscription: ChangeSubscription):
+        """Remove a subscription, stopping to LISTEN once a channel has no subscribers"""
+        channel_subscriptions = cls.subscriptions.get(subscription.channel)
+        if channel_subscriptions is None:
+            return
+        channel_subscriptions.discard(subscription)
+        if not channel_subscriptions:
+            del cls.subscriptions[subscription.channel]
+            if cls.connection is not None and not cls.connection.is_closed():
+                try:
+                    await cls.connection.remove_listener(subscription.channel, cls._dispatch)
+                except Exception as e:
+                    print(f"Failed to stop listening on {subscription.channel}: {e}")
+
+    @classmethod
+    async def ensure_connected(cls):
+        """
+        Open the LISTEN connection if needed and register all channels.
+
+        Errors are logged rather than raised: subscribers fall back to their
+        poll interval until the connection can be re-established.
+        """
+        if cls._lock is None:
+            cls._lock = asyncio.Lock()
+
+        async with cls._lock:
+            try:
+                if cls.connection is None or cls.connection.is_closed():
+                    dsn = make_url(DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+                    cls.connection = await asyncpg.connect(dsn, timeout=10)
+                    print("Opened change notification listener")
+                # add_listener only issues LISTEN for channels not registered yet
+                for channel in list(cls.subscriptions):
+                    await cls.connection.add_listener(channel, cls._dispatch)
+            except Exception as e:
+                print(f"Failed to open change notification listener: {e}")
+                cls.connection = None
+
+    @classmethod
+    def _dispatch(cls, connection, pid, channel, payload):
+        try:
+            data = json.loads(payload) if payload else {}
+        except json.JSONDecodeError:
+            data = {"raw": payload}
+        for subscription in list(cls.subscriptions.get(channel, ())):
+            subscription._push(data)
+
+    @classmethod
+    async def close(cls):
+        """Close the LISTEN connection"""
+        if cls.connection is not None and not cls.connection.is_closed():
+            await cls.connection.close()
+        cls.connection = None
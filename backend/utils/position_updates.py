@@ -0,0 +1,124 @@
+"""
+Bulk Position Updates
+---------------------
+Set-based implementation of PUT /models/update_bulk_positions. The price
+updater sends every position every few seconds, so a request costs a fixed
+number of round trips whatever its size: one lookup that validates every
+position id and ai_model_id, and one UPDATE ... FROM jsonb_array_elements()
+that applies all items and returns the updated rows.
+
+Each item only changes the fields it sets (an explicit null clears a nullable
+field). Items that fail validation are reported one by one and the rest are
+still applied.
+
+    python -m benchmarks.bulk_positions --positions 1000 10000
+
+compares it with the per-item queries it replaced.
+"""
+
+from typing import Dict, List, Sequence, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tables.positions import Position, PositionBulkUpdateItem
+from utils.time_utils import get_ist_now
+
+# Position columns an item can change
+BULK_UPDATE_FIELDS = tuple(field for field in PositionBulkUpdateItem.model_fields if field != "id")
+
+_COLUMNS = Position.__table__.c
+_ASSIGNMENTS = ",\n        ".join(
+    f"{field} = CASE WHEN u.item ? '{field}' "
+    f"THEN CAST(u.item->>'{field}' AS {_COLUMNS[field].type.compile(dialect=postgresql.dialect())}) "
+    f"ELSE p.{field} END"
+    for field in BULK_UPDATE_FIELDS
+)
+
+# Existing positions and AI models among the ids a request refers to
+BULK_LOOKUP_QUERY = text("""
+    SELECT 'position' AS kind, id FROM positions WHERE id = ANY(:position_ids)
+    UNION ALL
+    SELECT 'ai_model' AS kind, id FROM ai_models WHERE id = ANY(:ai_model_ids)
+""")
+
+# Applies every item (one JSON object per position) and returns the updated rows
+BULK_UPDATE_QUERY = text(f"""
+    UPDATE positions AS p SET
+        {_ASSIGNMENTS},
+        last_updated = :last_updated
+    FROM jsonb_array_elements(:items) AS u(item)
+    WHERE p.id = CAST(u.item->>'id' AS INTEGER)
+    RETURNING {", ".join(f"p.{column.name}" for column in _COLUMNS)}
+""").bindparams(bindparam("items", type_=JSONB))
+
+
+def _item_error(item: PositionBulkUpdateItem, update_data: dict, found: Dict[str, set]) -> str:
+    """Why an item cannot be applied, or an empty string"""
+    if item.id not in found["position"]:
+        return f"Position with ID {item.id} not found"
+    if item.ai_model_id is not None and item.ai_model_id not in found["ai_model"]:
+        return f"AI model with ID {item.ai_model_id} not found"
+    null_fields = [field for field, value in update_data.items() if value is None and not _COLUMNS[field].nullable]
+    if null_fields:
+        return f"{', '.join(null_fields)} cannot be null"
+    return ""
+
+
+async def update_positions_in_bulk(
+    db: AsyncSession,
+    items: Sequence[PositionBulkUpdateItem]
+) -> Tuple[List[dict], List[dict]]:
+    """
+    Validate and apply position updates inside the caller's transaction.
+
+    Items updating the same position are merged in request order, so the
+    last value of each field wins, and each of them is reported as updated.
+
+    Args:
+        db: Session whose transaction the update belongs to
+        items: Position updates from the request
+
+    Returns:
+        (updated position rows in request order, errors as
+        {"position_id", "error"} for the items that were not applied)
+    """
+    found: Dict[str, set] = {"position": set(), "ai_model": set()}
+    lookup = await db.execute(BULK_LOOKUP_QUERY, {
+        "position_ids": list({item.id for item in items}),
+        "ai_model_ids": list({item.ai_model_id for item in items if item.ai_model_id is not None})
+    })
+    for kind, row_id in lookup:
+        found[kind].add(row_id)
+
+    errors = []
+    changes: Dict[int, dict] = {}
+    applied: List[int] = []
+    for item in items:
+        update_data = item.model_dump(exclude_unset=True, exclude={"id"})
+        error = _item_error(item, update_data, found)
+        if error:
+            errors.append({"position_id": item.id, "error": error})
+            continue
+        changes.setdefault(item.id, {"id": item.id}).update(update_data)
+        applied.append(item.id)
+
+    if not changes:
+        return [], errors
+
+    result = await db.execute(BULK_UPDATE_QUERY, {
+        "items": list(changes.values()),
+        "last_updated": get_ist_now()
+    })
+    updated = {row.id: dict(row._mapping) for row in result}
+
+    updated_positions = []
+    for position_id in applied:
+        if position_id in updated:
+            updated_positions.append(updated[position_id])
+        else:
+            # Deleted between the lookup and the update
+            errors.append({"position_id": position_id, "error": f"Position with ID {position_id} not found"})
+    return updated_positions, errors
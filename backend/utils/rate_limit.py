@@ -0,0 +1,132 @@
+"""
+Client Rate Utilities
+---------------------
+Per-connection update rates for the WebSocket streams. Each stream's producer
+runs at the fastest rate any client asked for; a connection that asked for a
+slower one simply skips the shared frames that arrive before it is due. A
+connection that skipped a frame is owed the latest data, so it is caught up
+with a frame built from the newest state once its interval has passed, even
+if the producer has gone quiet by then.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from fastapi import WebSocket
+
+
+class ClientRates:
+    """Minimum interval between frames for each connection of one stream"""
+
+    def __init__(
+        self,
+        stream: str,
+        default_interval: float,
+        catch_up: Callable[[List[WebSocket]], Awaitable[None]]
+    ):
+        """
+        Args:
+            stream: Stream name, for logs and status
+            default_interval: Seconds between frames for connections that did
+                not ask for a rate (0: every frame)
+            catch_up: Sends the latest data to connections that skipped a
+                frame and are now due
+        """
+        self.stream = stream
+        self.default_interval = default_interval
+        self.catch_up = catch_up
+        self.intervals: Dict[WebSocket, float] = {}
+        self.last_sent: Dict[WebSocket, float] = {}
+        # Connections that skipped a frame since their last one
+        self.behind: Set[WebSocket] = set()
+        self.timer: Optional[asyncio.Task] = None
+        # When the sleeping timer wakes up next, None while it sends
+        self.wake_at: Optional[float] = None
+        self.skipped = 0
+        self.caught_up = 0
+
+    def set(self, websocket: WebSocket, interval: Optional[float] = None):
+        """Set a connection's interval in seconds (None: the stream's default)"""
+        self.intervals[websocket] = self.default_interval if interval is None else interval
+
+    def remove(self, websocket: WebSocket):
+        self.intervals.pop(websocket, None)
+        self.last_sent.pop(websocket, None)
+        self.behind.discard(websocket)
+        if not self.intervals and self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def interval(self, websocket: WebSocket) -> float:
+        return self.intervals.get(websocket, self.default_interval)
+
+    def fastest(self) -> Optional[float]:
+        """The shortest interval among the connections, None without connections"""
+        return min(self.intervals.values(), default=None)
+
+    def _due_at(self, websocket: WebSocket, max_interval: Optional[float] = None) -> float:
+        interval = self.interval(websocket)
+        if max_interval is not None:
+            interval = min(interval, max_interval)
+        return self.last_sent.get(websocket, 0.0) + interval
+
+    def due(self, websocket: WebSocket, max_interval: Optional[float] = None) -> bool:
+        """
+        Whether the connection may be sent a frame now; `max_interval` caps
+        its interval, e.g. for heartbeats that must not wait for a slow rate
+        """
+        return time.monotonic() >= self._due_at(websocket, max_interval)
+
+    def sent(self, websocket: WebSocket):
+        """Record that the connection was just sent the latest data"""
+        if websocket in self.intervals:
+            self.last_sent[websocket] = time.monotonic()
+        self.behind.discard(websocket)
+
+    def skip(self, websocket: WebSocket):
+        """Record that the connection skipped a frame; it is caught up once due"""
+        self.skipped += 1
+        self.behind.add(websocket)
+        if self.timer is not None and self.wake_at is not None and self._due_at(websocket) < self.wake_at:
+            # Due before the timer wakes up: restart it
+            self.timer.cancel()
+            self.timer = None
+        if self.timer is None or self.timer.done():
+            self.timer = asyncio.create_task(self._catch_up_behind())
+
+    async def _catch_up_behind(self):
+        while self.behind:
+            now = time.monotonic()
+            next_due = min(self._due_at(websocket) for websocket in self.behind)
+            if next_due > now:
+                self.wake_at = next_due
+                try:
+                    await asyncio.sleep(next_due - now)
+                finally:
+                    self.wake_at = None
+                continue
+            due = [websocket for websocket in self.behind if self._due_at(websocket) <= now]
+            try:
+                await self.catch_up(due)
+            except Exception as e:
+                print(f"Failed to catch up {self.stream} connections: {e}")
+            for websocket in due:
+                # Connections that left meanwhile are not tracked again
+                self.behind.discard(websocket)
+                if websocket in self.intervals:
+                    self.last_sent[websocket] = time.monotonic()
+            self.caught_up += len(due)
+
+    def status(self) -> dict:
+        """Rate counters for /ws/status"""
+        return {
+            "default_interval_seconds": self.default_interval,
+            "fastest_interval_seconds": self.fastest(),
+            "custom_rate_connections": sum(
+                1 for interval in self.intervals.values() if interval != self.default_interval
+            ),
+            "behind": len(self.behind),
+            "skipped": self.skipped,
+            "caught_up": self.caught_up
+        }
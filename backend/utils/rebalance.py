@@ -0,0 +1,242 @@
+"""
+Portfolio Rebalancing
+---------------------
+Implementation of POST /models/rebalance, which moves an AI model's
+portfolio to target weights in one transaction instead of one create_trade
+call (and one transaction) per asset:
+
+1. lock_positions() loads the model's positions with FOR UPDATE, so trades
+   and rebalances for the model wait until this one commits
+2. plan_rebalance() computes every trade at once from the positions and one
+   LTP snapshot, with numpy arrays over the assets
+3. apply_rebalance() writes the new positions and the trades, and sends the
+   change notification, as one statement
+
+The weights are percentages of the portfolio value (CASH plus every asset at
+its LTP); whatever the weights leave over stays in CASH. Assets the model
+holds but does not list are sold.
+"""
+
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.types import JSON
+
+from tables.trades import Trade
+from utils.model_identity import ModelIdentity
+from utils.notifications import MODEL_UPDATES_CHANNEL, change_payload
+from utils.time_utils import get_ist_now
+from utils.trade_execution import CASH_ASSET
+
+# Float error allowed when checking that the basket is covered by the cash
+CASH_TOLERANCE = 1e-6
+
+LOCK_POSITIONS_QUERY = text("""
+    SELECT id, asset, quantity FROM positions
+    WHERE code_name = :code_name
+    ORDER BY id
+    FOR UPDATE
+""")
+
+# Every use of a parameter is cast the same way, so PostgreSQL deduces one type for it
+REBALANCE_QUERY = text(f"""
+    WITH target AS (
+        SELECT * FROM jsonb_to_recordset(:positions) AS t(
+            position_id INTEGER, asset TEXT, quantity FLOAT, last_price FLOAT, value FLOAT, percentage FLOAT
+        )
+    ),
+    updated AS (
+        UPDATE positions AS p
+        SET quantity = t.quantity,
+            last_price = t.last_price,
+            value = t.value,
+            percentage = t.percentage,
+            last_updated = :now
+        FROM target AS t
+        WHERE p.id = t.position_id
+        RETURNING p.*
+    ),
+    created AS (
+        INSERT INTO positions (
+            asset, display_name, percentage, value, quantity, last_price, code_name, ai_model_id, last_updated
+        )
+        SELECT
+            asset, CAST(:display_name AS TEXT), percentage, value, quantity, last_price,
+            CAST(:code_name AS TEXT), CAST(:ai_model_id AS INTEGER), :now
+        FROM target
+        WHERE position_id IS NULL
+        RETURNING *
+    ),
+    trade AS (
+        INSERT INTO trades (
+            display_name, code_name, ai_model_id, asset, side, quantity, price, notional_value, last_update_time
+        )
+        SELECT
+            CAST(:display_name AS TEXT), CAST(:code_name AS TEXT), CAST(:ai_model_id AS INTEGER), t.asset,
+            CAST(t.side AS {Trade.__table__.c.side.type.name}), t.quantity, t.price, t.notional_value, :now
+        FROM ROWS FROM (
+            jsonb_to_recordset(:trades) AS (asset TEXT, side TEXT, quantity FLOAT, price FLOAT, notional_value FLOAT)
+        ) WITH ORDINALITY AS t(asset, side, quantity, price, notional_value, n)
+        ORDER BY t.n
+        RETURNING *
+    ),
+    -- Delivered on commit, like notify_change
+    notified AS (
+        SELECT pg_notify(CAST(:channel AS TEXT), CAST(:payload AS TEXT))
+    )
+    SELECT
+        (SELECT COALESCE(json_agg(trade ORDER BY trade.id), '[]') FROM trade) AS trades,
+        (SELECT COALESCE(json_agg(p ORDER BY p.id), '[]')
+         FROM (SELECT * FROM updated UNION ALL SELECT * FROM created) AS p) AS positions,
+        (SELECT COUNT(*) FROM notified) AS notified
+""").bindparams(
+    bindparam("positions", type_=JSONB),
+    bindparam("trades", type_=JSONB)
+).columns(trades=JSON, positions=JSON)
+
+
+async def lock_positions(db: AsyncSession, code_name: str) -> List[dict]:
+    """The model's positions as {"id", "asset", "quantity"}, locked until the transaction ends"""
+    result = await db.execute(LOCK_POSITIONS_QUERY, {"code_name": code_name})
+    return [dict(row._mapping) for row in result]
+
+
+def assets_to_price(positions: List[dict], targets: Dict[str, float]) -> List[str]:
+    """Assets whose LTP the rebalance needs: the targets and every other asset still held"""
+    assets = dict.fromkeys(targets)
+    for position in positions:
+        if position["asset"] != CASH_ASSET and (position["quantity"] or 0) != 0:
+            assets.setdefault(position["asset"])
+    return list(assets)
+
+
+def invalid_prices(prices: Dict[str, float]) -> List[str]:
+    """Assets whose price is not a positive, finite number, which plan_rebalance() cannot use"""
+    invalid = []
+    for asset, price in prices.items():
+        try:
+            valid = math.isfinite(price) and price > 0
+        except TypeError:
+            valid = False
+        if not valid:
+            invalid.append(asset)
+    return invalid
+
+
+def plan_rebalance(
+    positions: List[dict],
+    targets: Dict[str, float],
+    prices: Dict[str, float],
+    min_trade_value: float = 0
+) -> dict:
+    """
+    Compute the trades that move the positions to the target weights.
+
+    Args:
+        positions: The model's positions from lock_positions(), with CASH
+        targets: Asset -> percentage of the portfolio value
+        prices: Price of every asset from assets_to_price(), each positive
+            and finite
+        min_trade_value: Trades with a smaller notional value are skipped
+
+    Returns:
+        portfolio_value, cash_before and cash_after; trades (sells first,
+        as {"asset", "side", "quantity", "price", "notional_value"}); and
+        positions, the new state of CASH and of every priced asset as
+        {"position_id" (None for a new position), "asset", "quantity",
+        "last_price", "value", "percentage"}
+
+    Raises:
+        ValueError: If a price is zero, negative or not finite
+    """
+    invalid = invalid_prices(prices)
+    if invalid:
+        raise ValueError(f"Invalid prices for assets {', '.join(invalid)}")
+
+    held = {position["asset"]: position for position in positions}
+    assets = list(prices)
+    position_ids = [held[asset]["id"] if asset in held else None for asset in assets]
+
+    price = np.array([prices[asset] for asset in assets], dtype=np.float64)
+    quantity = np.array(
+        [(held[asset]["quantity"] or 0) if asset in held else 0 for asset in assets], dtype=np.float64
+    )
+    weight = np.array([targets.get(asset, 0) for asset in assets], dtype=np.float64) / 100
+
+    cash_before = float(held[CASH_ASSET]["quantity"] or 0)
+    portfolio_value = cash_before + float(np.dot(quantity, price))
+
+    target_quantity = weight * portfolio_value / price
+    change = target_quantity - quantity
+    notional = np.abs(change) * price
+    traded = notional > min_trade_value
+    new_quantity = np.where(traded, target_quantity, quantity)
+    cash_after = cash_before - float(np.dot(change[traded], price[traded]))
+
+    trades = []
+    # Sells first, so the trade log shows the cash being raised before it is spent
+    for i in sorted(np.flatnonzero(traded), key=lambda i: change[i] > 0):
+        trades.append({
+            "asset": assets[i],
+            "side": "BUY" if change[i] > 0 else "SELL",
+            "quantity": float(abs(change[i])),
+            "price": float(price[i]),
+            "notional_value": float(notional[i])
+        })
+
+    # Percentages as the price updater computes them, over the unchanged portfolio value
+    value = new_quantity * price
+    percentage = value / portfolio_value * 100 if portfolio_value else np.zeros_like(value)
+    new_positions = [{
+        "position_id": held[CASH_ASSET]["id"],
+        "asset": CASH_ASSET,
+        "quantity": cash_after,
+        "last_price": 1.0,
+        "value": cash_after,
+        "percentage": cash_after / portfolio_value * 100 if portfolio_value else 0.0
+    }]
+    for i, asset in enumerate(assets):
+        if position_ids[i] is None and new_quantity[i] == 0:
+            continue
+        new_positions.append({
+            "position_id": position_ids[i],
+            "asset": asset,
+            "quantity": float(new_quantity[i]),
+            "last_price": float(price[i]),
+            "value": float(value[i]),
+            "percentage": float(percentage[i])
+        })
+
+    return {
+        "portfolio_value": portfolio_value,
+        "cash_before": cash_before,
+        "cash_after": cash_after,
+        "trades": trades,
+        "positions": new_positions
+    }
+
+
+async def apply_rebalance(db: AsyncSession, identity: ModelIdentity, plan: dict) -> Optional[dict]:
+    """
+    Write a plan from plan_rebalance() inside the caller's transaction.
+
+    Returns:
+        The trades and positions as written, None if the plan has no trades
+    """
+    if not plan["trades"]:
+        return None
+    result = await db.execute(REBALANCE_QUERY, {
+        "positions": plan["positions"],
+        "trades": plan["trades"],
+        "display_name": identity.display_name,
+        "code_name": identity.code_name,
+        "ai_model_id": identity.id,
+        "now": get_ist_now(),
+        "channel": MODEL_UPDATES_CHANNEL,
+        "payload": change_payload("trades", "positions")
+    })
+    return dict(result.one()._mapping)
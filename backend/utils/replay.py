@@ -0,0 +1,92 @@
+"""
+Replay Ring Utilities
+---------------------
+Bounded in-memory history of a stream's sequenced items (frames or ticks).
+A client that reconnects with the sequence number of the last frame it saw
+is sent only the items that came after it, merged into one frame; when those
+have already left the ring, or the sequence was never issued here, the caller
+falls back to a snapshot. Merged frames are kept until the next item, so a
+reconnect storm builds each of them once.
+"""
+
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+
+class ReplayRing:
+    """The last `size` items of one stream, each tagged with consecutive sequence numbers"""
+
+    def __init__(self, stream: str, size: int):
+        self.stream = stream
+        self.entries: deque = deque(maxlen=max(1, size))
+        self.last_seq: Optional[int] = None
+        # since seq -> merged items, valid until the next append or reset
+        self.merged_cache: Dict[int, Any] = {}
+        self.replays = 0
+        self.fallbacks = 0
+
+    def append(self, seq: int, item: Any):
+        """
+        Record the item published as `seq`. A sequence that does not follow
+        the previous one (a new producer, a missed publish) starts the ring over.
+        """
+        if self.last_seq is not None and seq != self.last_seq + 1:
+            self.entries.clear()
+        self.entries.append((seq, item))
+        self.last_seq = seq
+        self.merged_cache.clear()
+
+    def reset(self, seq: int):
+        """Drop the history; `seq` is the stream's sequence from now on"""
+        self.entries.clear()
+        self.last_seq = seq
+        self.merged_cache.clear()
+
+    def since(self, seq: int) -> Optional[List[Any]]:
+        """
+        Items published after `seq`, oldest first.
+
+        Returns:
+            The missed items (empty if the client is current), or None when
+            they cannot be replayed and a snapshot is needed
+        """
+        if self.last_seq is None or seq > self.last_seq:
+            self.fallbacks += 1
+            return None
+        if seq == self.last_seq:
+            return []
+        if not self.entries or seq < self.entries[0][0] - 1:
+            self.fallbacks += 1
+            return None
+        self.replays += 1
+        return [item for item_seq, item in self.entries if item_seq > seq]
+
+    def merged(self, seq: int, merge: Callable[[int, List[Any]], Any]) -> Optional[Any]:
+        """
+        merge(seq, items) over the items published after `seq`, built once
+        per seq until the ring changes.
+
+        Returns:
+            The merged result, or None when there is nothing to replay or the
+            items are gone
+        """
+        if seq in self.merged_cache:
+            self.replays += 1
+            return self.merged_cache[seq]
+        items = self.since(seq)
+        if not items:
+            return None
+        result = merge(seq, items)
+        self.merged_cache[seq] = result
+        return result
+
+    def status(self) -> dict:
+        """Ring counters for /ws/status"""
+        return {
+            "size": len(self.entries),
+            "capacity": self.entries.maxlen,
+            "first_seq": self.entries[0][0] if self.entries else None,
+            "last_seq": self.last_seq,
+            "replays": self.replays,
+            "fallbacks": self.fallbacks
+        }
@@ -0,0 +1,54 @@
+"""
+Row Diff Utilities
+------------------
+Keeps the latest rows of several tables keyed by id so that broadcasters can
+send only inserted, changed and removed rows instead of full tables.
+"""
+
+from typing import Any, Dict, List, Optional
+
+
+class VersionedRowSets:
+    """
+    Latest rows of several tables, keyed by id, with a version number that
+    increases every time any row changes.
+    """
+
+    def __init__(self, key: str = "id", initial_version: int = 0):
+        self.key = key
+        self.version = initial_version
+        self.tables: Dict[str, Dict[Any, dict]] = {}
+
+    def update(self, table_rows: Dict[str, List[dict]]) -> Optional[Dict[str, dict]]:
+        """
+        Replace the rows of the given tables and work out what changed.
+
+        Args:
+            table_rows: Mapping of table name to its current list of rows
+
+        Returns:
+            Mapping of table name to {"upserted": [...], "removed": [...]} for
+            every table that changed, or None if nothing changed. The version
+            is only bumped when something changed.
+        """
+        changes = {}
+        for table, rows in table_rows.items():
+            previous = self.tables.get(table, {})
+            current = {row[self.key]: row for row in rows}
+
+            upserted = [row for row_id, row in current.items() if previous.get(row_id) != row]
+            removed = [row_id for row_id in previous if row_id not in current]
+
+            self.tables[table] = current
+            if upserted or removed:
+                changes[table] = {"upserted": upserted, "removed": removed}
+
+        if not changes:
+            return None
+
+        self.version += 1
+        return changes
+
+    def snapshot(self) -> Dict[str, List[dict]]:
+        """Get the full current rows of every table"""
+        return {table: list(rows.values()) for table, rows in self.tables.items()}
@@ -0,0 +1,247 @@
+"""
+Send Queue Utilities
+--------------------
+Bounded outbound queues for WebSocket connections. Broadcasters only append
+frames to each connection's queue; a writer task per connection drains it, so
+a stalled client never holds up the producer or the other clients. Each
+stream on a connection may hold up to its own limit of queued frames; when
+that is reached the stream's policy decides what happens.
+"""
+
+import asyncio
+from collections import deque
+from typing import Dict, Optional, Set
+
+from fastapi import WebSocket
+from fastapi.websockets import WebSocketState
+
+from utils.frames import Frame, NO_COMPRESSION, TEXT_ENCODING
+
+# Full-queue policies
+DROP_OLDEST = "drop_oldest"    # discard the oldest queued frame
+KEEP_LATEST = "keep_latest"    # discard every queued frame, keep only the new one
+DISCONNECT = "disconnect"      # close the connection
+SEND_POLICIES = (DROP_OLDEST, KEEP_LATEST, DISCONNECT)
+
+# Close code sent to clients disconnected for falling behind (policy violation)
+SLOW_CONSUMER_CLOSE_CODE = 1008
+
+
+class SocketWriter:
+    """
+    The one writer task of a WebSocket connection. Every stream sending on the
+    connection (several on a multiplexed /ws/stream socket) queues its frames
+    here, so frames leave in the order they were queued and the socket never
+    sees two concurrent sends.
+    """
+
+    # Writers of the open connections; shared by every stream on a connection
+    writers: Dict[WebSocket, "SocketWriter"] = {}
+
+    def __init__(self, websocket: WebSocket, encoding: str, compression: str):
+        self.websocket = websocket
+        self.encoding = encoding
+        self.compression = compression
+        self.queue: deque = deque()  # (ConnectionSender, Frame)
+        self.ready = asyncio.Event()
+        self.lanes: Set["ConnectionSender"] = set()
+        self.closed = False
+        self.task = asyncio.create_task(self._write())
+
+    @classmethod
+    def acquire(cls, sender: "ConnectionSender") -> "SocketWriter":
+        """The connection's writer, created for its first stream"""
+        writer = cls.writers.get(sender.websocket)
+        if writer is None:
+            writer = cls(sender.websocket, sender.encoding, sender.compression)
+            cls.writers[sender.websocket] = writer
+        writer.lanes.add(sender)
+        return writer
+
+    def release(self, sender: "ConnectionSender"):
+        """Drop a stream's queued frames; the writer stops after the connection's last stream"""
+        self.discard(sender)
+        self.lanes.discard(sender)
+        if not self.lanes:
+            self.close()
+
+    def push(self, sender: "ConnectionSender", frame: Frame):
+        self.queue.append((sender, frame))
+        sender.pending += 1
+        self.ready.set()
+
+    def discard(self, sender: "ConnectionSender", count: Optional[int] = None) -> int:
+        """Remove a stream's oldest `count` queued frames (all of them by default)"""
+        if not sender.pending:
+            return 0
+        count = sender.pending if count is None else min(count, sender.pending)
+        kept = deque()
+        removed = 0
+        for entry in self.queue:
+            if entry[0] is sender and removed < count:
+                removed += 1
+            else:
+                kept.append(entry)
+        self.queue = kept
+        sender.pending -= removed
+        return removed
+
+    async def _write(self):
+        try:
+            while True:
+                while not self.queue:
+                    self.ready.clear()
+                    await self.ready.wait()
+                sender, frame = self.queue.popleft()
+                sender.pending -= 1
+                if self.websocket.client_state != WebSocketState.CONNECTED:
+                    break
+                if sender.channel is not None:
+                    frame = frame.for_channel(sender.channel)
+                # Variants are shared by every connection using the same format
+                payload = frame.payload(self.encoding, self.compression)
+                if isinstance(payload, str):
+                    await self.websocket.send_text(payload)
+                else:
+                    await self.websocket.send_bytes(payload)
+                sender.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Failed to send to client: {e}")
+        finally:
+            self.closed = True
+            self.queue.clear()
+            if SocketWriter.writers.get(self.websocket) is self:
+                del SocketWriter.writers[self.websocket]
+            for sender in self.lanes:
+                sender.pending = 0
+
+    def close(self):
+        """Stop the writer task and discard queued frames"""
+        self.closed = True
+        self.queue.clear()
+        if SocketWriter.writers.get(self.websocket) is self:
+            del SocketWriter.writers[self.websocket]
+        self.task.cancel()
+
+
+class ConnectionSender:
+    """One stream's bounded share of a connection's outbound queue"""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        senders: "StreamSenders",
+        encoding: str = TEXT_ENCODING,
+        compression: str = NO_COMPRESSION,
+        channel: Optional[str] = None
+    ):
+        self.websocket = websocket
+        self.senders = senders
+        self.encoding = encoding
+        self.compression = compression
+        # Set on multiplexed connections, whose frames are tagged with their channel
+        self.channel = channel
+        # Frames of this stream in the writer's queue
+        self.pending = 0
+        self.dropped = 0
+        self.sent = 0
+        self.closed = False
+        self.writer = SocketWriter.acquire(self)
+
+    def send(self, frame: Frame) -> bool:
+        """
+        Queue a frame without waiting for the socket.
+
+        Returns:
+            False if the frame was not queued because the connection is closed
+            or was just disconnected for falling behind
+        """
+        if self.closed or self.writer.closed:
+            return False
+
+        if self.pending >= self.senders.max_size:
+            if self.senders.policy == DISCONNECT:
+                self.senders.disconnected += 1
+                self.disconnect()
+                return False
+            dropped = self.writer.discard(self, None if self.senders.policy == KEEP_LATEST else 1)
+            self.dropped += dropped
+            self.senders.dropped += dropped
+
+        self.writer.push(self, frame)
+        return True
+
+    def disconnect(self):
+        """Stop writing and close the socket; the endpoint's receive loop then cleans up"""
+        self.close()
+        asyncio.create_task(self._close_socket())
+
+    async def _close_socket(self):
+        try:
+            await asyncio.wait_for(
+                self.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE, reason="Client too slow"),
+                timeout=5
+            )
+        except Exception as e:
+            print(f"Failed to close slow client on {self.senders.stream}: {e}")
+
+    def close(self):
+        """Discard this stream's queued frames and leave the connection's writer"""
+        if not self.closed:
+            self.closed = True
+            self.writer.release(self)
+
+
+class StreamSenders:
+    """Outbound queues of all connections to one stream, sharing its size and full-queue policy"""
+
+    def __init__(self, stream: str, max_size: int, policy: str):
+        if policy not in SEND_POLICIES:
+            raise ValueError(f"Unknown send queue policy for {stream}: {policy}")
+        self.stream = stream
+        self.max_size = max(1, max_size)
+        self.policy = policy
+        self.senders: Dict[WebSocket, ConnectionSender] = {}
+        self.dropped = 0
+        self.disconnected = 0
+
+    def register(
+        self,
+        websocket: WebSocket,
+        encoding: str = TEXT_ENCODING,
+        compression: str = NO_COMPRESSION,
+        channel: Optional[str] = None
+    ) -> ConnectionSender:
+        """
+        Add a stream to a connection, or one channel to a multiplexed
+        connection; the connection's writer task is shared by all of them
+        """
+        sender = ConnectionSender(websocket, self, encoding, compression, channel)
+        self.senders[websocket] = sender
+        return sender
+
+    def unregister(self, websocket: WebSocket):
+        """Remove a stream from a connection, stopping the writer after its last stream"""
+        sender = self.senders.pop(websocket, None)
+        if sender is not None:
+            sender.close()
+
+    def send(self, websocket: WebSocket, frame: Frame) -> bool:
+        """Queue a frame for one connection"""
+        sender = self.senders.get(websocket)
+        return sender.send(frame) if sender is not None else False
+
+    def status(self) -> dict:
+        """Queue depth and drop counters for /ws/status"""
+        depths = [sender.pending for sender in self.senders.values()]
+        return {
+            "policy": self.policy,
+            "max_queue_size": self.max_size,
+            "connections": len(depths),
+            "queued_frames": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "dropped_frames": self.dropped,
+            "slow_disconnects": self.disconnected
+        }
@@ -0,0 +1,108 @@
+"""
+Snapshot Cache Utilities
+------------------------
+Keeps the latest encoded initial frame of a stream so a new connection is
+answered at once instead of re-running the stream's queries. When a snapshot
+is stale, concurrent connects share a single in-flight refresh, so a page
+refresh storm after a deploy costs one rebuild rather than one per client.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from utils.frames import Frame
+
+
+class SnapshotCache:
+    """Latest snapshot frame per view of one stream, rebuilt single-flight when stale"""
+
+    def __init__(
+        self,
+        stream: str,
+        max_age: float,
+        version: Optional[Callable[[], Any]] = None,
+        max_entries: int = 64
+    ):
+        """
+        Args:
+            stream: Stream name, for logs and status
+            max_age: Seconds after which a snapshot is rebuilt
+            version: Returns the current version of the stream's data; a
+                snapshot built for another version is rebuilt
+            max_entries: Views kept, least recently used dropped first
+        """
+        self.stream = stream
+        self.max_age = max_age
+        self.version = version or (lambda: None)
+        self.max_entries = max(1, max_entries)
+        # key -> (frame, built_at, version)
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.refreshing: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.refreshes = 0
+
+    def _fresh(self, key: Hashable) -> Optional[Frame]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        frame, built_at, version = entry
+        if version != self.version() or time.monotonic() - built_at > self.max_age:
+            return None
+        self.entries.move_to_end(key)
+        return frame
+
+    def put(self, key: Hashable, frame: Frame, version: Any = None):
+        """
+        Store a frame, e.g. one built by a broadcaster, as built from
+        `version` of the data (default: the current version).
+        """
+        version = self.version() if version is None else version
+        self.entries[key] = (frame, time.monotonic(), version)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def get(self, key: Hashable, build: Callable[[], Awaitable[Frame]]) -> Frame:
+        """
+        The snapshot for `key`, rebuilt with `build` if it is missing, older
+        than max_age or was built for another version of the data.
+
+        Callers arriving while a rebuild is running wait for that rebuild.
+        """
+        frame = self._fresh(key)
+        if frame is not None:
+            self.hits += 1
+            return frame
+
+        task = self.refreshing.get(key)
+        if task is None:
+            task = asyncio.create_task(self._refresh(key, build))
+            self.refreshing[key] = task
+        # Shielded so a disconnecting client does not cancel the others' refresh
+        return await asyncio.shield(task)
+
+    async def _refresh(self, key: Hashable, build: Callable[[], Awaitable[Frame]]) -> Frame:
+        # Taken before building, so data changing meanwhile forces another rebuild
+        version = self.version()
+        try:
+            frame = await build()
+            self.refreshes += 1
+            self.put(key, frame, version)
+            return frame
+        finally:
+            self.refreshing.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def status(self) -> dict:
+        """Snapshot counters for /ws/status"""
+        return {
+            "snapshots": len(self.entries),
+            "max_age_seconds": self.max_age,
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "refreshing": len(self.refreshing)
+        }
@@ -0,0 +1,135 @@
+"""
+Subscription Utilities
+----------------------
+Client-side filters for the WebSocket streams. A client narrows what it
+receives by sending
+
+    {"type": "subscribe", "ai_model_ids": [1], "code_names": ["gpt"], "symbols": ["BTCUSD"]}
+    {"type": "unsubscribe", "symbols": ["BTCUSD"]}
+
+on its socket. Model rows match when their ai_model_id or code_name is
+subscribed; prices match when their symbol is. A client without any
+subscriptions receives everything.
+
+Filters are immutable and hashable, so broadcasters can build each filtered
+frame once and share it among every client with the same filter.
+"""
+
+import json
+from typing import Any, Dict, FrozenSet, Iterable, Optional
+
+SUBSCRIBE = "subscribe"
+UNSUBSCRIBE = "unsubscribe"
+SUBSCRIPTION_MESSAGES = (SUBSCRIBE, UNSUBSCRIBE)
+# Lists a subscribe/unsubscribe message can carry
+FILTER_FIELDS = ("ai_model_ids", "code_names", "symbols")
+
+
+class StreamFilter:
+    """The ai_model_ids, code_names and symbols one client subscribed to"""
+
+    __slots__ = ("ai_model_ids", "code_names", "symbols", "key")
+
+    def __init__(
+        self,
+        ai_model_ids: Iterable[int] = (),
+        code_names: Iterable[str] = (),
+        symbols: Iterable[str] = ()
+    ):
+        self.ai_model_ids: FrozenSet[int] = frozenset(ai_model_ids)
+        self.code_names: FrozenSet[str] = frozenset(code_names)
+        self.symbols: FrozenSet[str] = frozenset(symbols)
+        self.key = (
+            tuple(sorted(self.ai_model_ids)),
+            tuple(sorted(self.code_names)),
+            tuple(sorted(self.symbols))
+        )
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, StreamFilter) and self.key == other.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __bool__(self) -> bool:
+        return bool(self.ai_model_ids or self.code_names or self.symbols)
+
+    def matches_model(self, row: dict) -> bool:
+        """Whether a row carrying ai_model_id/code_name belongs to a subscribed model"""
+        return row.get("ai_model_id") in self.ai_model_ids or row.get("code_name") in self.code_names
+
+    def matches_symbol(self, symbol: str) -> bool:
+        return symbol in self.symbols
+
+    def to_dict(self) -> dict:
+        return {
+            "ai_model_ids": list(self.key[0]),
+            "code_names": list(self.key[1]),
+            "symbols": list(self.key[2])
+        }
+
+
+def _items(request: dict, field: str, item_type: type) -> set:
+    values = request.get(field) or []
+    if not isinstance(values, list) or not all(isinstance(value, item_type) and not isinstance(value, bool) for value in values):
+        raise ValueError(f"'{field}' must be a list of {item_type.__name__}")
+    return set(values)
+
+
+def apply_subscription(current: Optional[StreamFilter], request: dict) -> Optional[StreamFilter]:
+    """
+    Apply a subscribe/unsubscribe message to a client's filter.
+
+    Args:
+        current: The client's filter, None while it receives everything
+        request: Decoded client message with type subscribe or unsubscribe
+
+    Returns:
+        The new filter, or None once no subscriptions are left
+
+    Raises:
+        ValueError: If the message's lists are malformed
+    """
+    ai_model_ids = _items(request, "ai_model_ids", int)
+    code_names = _items(request, "code_names", str)
+    symbols = _items(request, "symbols", str)
+
+    current = current or StreamFilter()
+    if request.get("type") == SUBSCRIBE:
+        updated = StreamFilter(
+            current.ai_model_ids | ai_model_ids,
+            current.code_names | code_names,
+            current.symbols | symbols
+        )
+    else:
+        updated = StreamFilter(
+            current.ai_model_ids - ai_model_ids,
+            current.code_names - code_names,
+            current.symbols - symbols
+        )
+    return updated or None
+
+
+def filter_rows(rows: list, stream_filter: StreamFilter) -> list:
+    """Rows of subscribed models"""
+    return [row for row in rows if stream_filter.matches_model(row)]
+
+
+def subscription_message(stream_filter: Optional[StreamFilter], timestamp: str) -> Dict[str, Any]:
+    """Acknowledgement sent after a client changes its subscriptions"""
+    return {
+        "type": "subscription",
+        "filter": stream_filter.to_dict() if stream_filter is not None else None,
+        "timestamp": timestamp
+    }
+
+
+def parse_subscription_request(message: str) -> Optional[dict]:
+    """The decoded message if it is a subscribe/unsubscribe request, else None"""
+    try:
+        request = json.loads(message)
+    except json.JSONDecodeError:
+        return None
+    if isinstance(request, dict) and request.get("type") in SUBSCRIPTION_MESSAGES:
+        return request
+    return None
@@ -52,4 +52,18 @@ def ist_to_utc(ist_dt):
     if ist_dt.tzinfo is None:
         # If naive datetime, assume it's IST
         ist_dt = IST.localize(ist_dt)
-    return ist_dt.astimezone(pytz.utc)
\ No newline at end of file
+    return ist_dt.astimezone(pytz.utc)
+
+def to_naive_ist(dt):
+    """
+    Convert a datetime to the naive IST form stored in the database.
+    
+    Args:
+        dt (datetime): Timezone-aware datetime, or naive datetime already in IST
+        
+    Returns:
+        datetime: Timezone-naive datetime representing IST time
+    """
+    if dt.tzinfo is None:
+        return dt
+    return dt.astimezone(IST).replace(tzinfo=None)
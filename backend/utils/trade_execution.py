@@ -0,0 +1,169 @@
+"""
+Trade Execution
+---------------
+Executes a trade for POST /models/create_trade as a single statement: the
+CASH debit (or credit), the asset position change, the trade insert and the
+change notification are data-modifying CTEs of one query, so a trade costs
+one round trip plus the commit. The AI model's id and display_name come from
+the caller's ModelIdentity (see utils.model_identity) rather than a lookup in
+the statement.
+
+The cash check is part of the CASH row's UPDATE. Concurrent BUYs for one
+model queue on that row lock and each re-checks the balance it left behind,
+so they cannot overspend; a BUY the balance no longer covers changes nothing.
+"""
+
+from datetime import datetime, time as dt_time
+from typing import Optional, Tuple
+
+import pytz
+from fastapi import status
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.types import JSON
+
+from tables.trades import Trade
+from utils.model_identity import ModelIdentity
+from utils.notifications import MODEL_UPDATES_CHANNEL, change_payload
+from utils.time_utils import get_ist_now
+
+CASH_ASSET = "CASH"
+# Traded around the clock; every other asset only in market hours
+ALWAYS_OPEN_ASSET = "BTCUSD"
+MARKET_OPEN = dt_time(9, 15)  # 9:15 AM IST
+MARKET_CLOSE = dt_time(15, 30)  # 3:30 PM IST
+
+# Every use of a parameter is cast the same way, so PostgreSQL deduces one type for it
+TRADE_EXECUTION_QUERY = text(f"""
+    WITH cash_before AS (
+        SELECT quantity FROM positions WHERE code_name = :code_name AND asset = '{CASH_ASSET}'
+    ),
+    cash AS (
+        UPDATE positions AS p
+        SET quantity = COALESCE(p.quantity, 0) + CASE
+                WHEN CAST(:side AS TEXT) = 'BUY' THEN -CAST(:notional_value AS FLOAT)
+                ELSE CAST(:notional_value AS FLOAT)
+            END,
+            last_updated = :now
+        WHERE p.code_name = :code_name
+          AND p.asset = '{CASH_ASSET}'
+          AND (CAST(:side AS TEXT) = 'SELL' OR COALESCE(p.quantity, 0) >= CAST(:notional_value AS FLOAT))
+        RETURNING p.*
+    ),
+    -- A SELL goes through without a CASH position, a BUY only once the cash was debited
+    accepted AS (
+        SELECT 1 WHERE CAST(:side AS TEXT) = 'SELL' OR EXISTS (SELECT 1 FROM cash)
+    ),
+    asset AS (
+        UPDATE positions AS p
+        SET quantity = COALESCE(p.quantity, 0) + CASE
+                WHEN CAST(:side AS TEXT) = 'BUY' THEN CAST(:quantity AS FLOAT)
+                ELSE -CAST(:quantity AS FLOAT)
+            END,
+            last_price = CAST(:price AS FLOAT),
+            last_updated = :now
+        WHERE p.code_name = :code_name
+          AND p.asset = :asset
+          AND p.asset <> '{CASH_ASSET}'
+          AND EXISTS (SELECT 1 FROM accepted)
+        RETURNING p.*
+    ),
+    trade AS (
+        INSERT INTO trades (
+            display_name, code_name, ai_model_id, asset, side, quantity, price, notional_value, last_update_time
+        )
+        SELECT
+            CAST(:display_name AS TEXT), :code_name, CAST(:ai_model_id AS INTEGER), :asset,
+            CAST(CAST(:side AS TEXT) AS {Trade.__table__.c.side.type.name}),
+            CAST(:quantity AS FLOAT), CAST(:price AS FLOAT), CAST(:notional_value AS FLOAT), :now
+        FROM accepted
+        RETURNING *
+    ),
+    -- Delivered on commit, like notify_change
+    notified AS (
+        SELECT pg_notify(CAST(:channel AS TEXT), CAST(:payload AS TEXT)) FROM trade
+    )
+    SELECT
+        EXISTS (SELECT 1 FROM cash_before) AS has_cash,
+        (SELECT COALESCE(quantity, 0) FROM cash_before) AS cash_balance,
+        (SELECT row_to_json(trade) FROM trade) AS trade,
+        (SELECT row_to_json(cash) FROM cash) AS cash_position,
+        (SELECT row_to_json(a) FROM asset AS a) AS asset_position,
+        (SELECT COUNT(*) FROM notified) AS notified
+""").columns(trade=JSON, cash_position=JSON, asset_position=JSON)
+
+
+def market_closed_reason(asset: str) -> Optional[str]:
+    """Why `asset` cannot be traded right now, None if it can"""
+    if asset == ALWAYS_OPEN_ASSET:
+        return None
+    current_time = datetime.now(pytz.timezone('Asia/Kolkata'))
+    # Monday=0, Sunday=6
+    if current_time.weekday() >= 5:
+        return f"Trading for {asset} is not allowed on weekends. Market is open Monday-Friday, 9:15 AM - 3:30 PM IST."
+    if not (MARKET_OPEN <= current_time.time() <= MARKET_CLOSE):
+        return f"Trading for {asset} is not allowed outside market hours. Market is open Monday-Friday, 9:15 AM - 3:30 PM IST. Current time: {current_time.strftime('%A, %I:%M %p IST')}"
+    return None
+
+
+def price_from_ltp(asset: str, asset_ltp: dict) -> float:
+    """Trade price of `asset` from its 'ltp_data' entry in Redis"""
+    if asset == ALWAYS_OPEN_ASSET:
+        # Special calculation for BTCUSD
+        return ((asset_ltp['last_price']) * 0.001) / 10
+    return asset_ltp['last_price']
+
+
+async def execute_trade(
+    db: AsyncSession,
+    ai_model: ModelIdentity,
+    asset: str,
+    side: str,
+    quantity: float,
+    price: float,
+    notional_value: float
+) -> dict:
+    """
+    Execute a trade inside the caller's transaction.
+
+    A BUY debits CASH by notional_value and needs a CASH position that covers
+    it; a SELL credits CASH if the model has one. The asset position, if the
+    model holds one, gains (BUY) or loses (SELL) `quantity` and takes `price`
+    as its last_price.
+
+    Returns:
+        has_cash and cash_balance (the CASH position before the trade), and
+        the trade, cash_position and asset_position rows as written; trade is
+        None when nothing was executed
+    """
+    result = await db.execute(TRADE_EXECUTION_QUERY, {
+        "code_name": ai_model.code_name,
+        "ai_model_id": ai_model.id,
+        "display_name": ai_model.display_name,
+        "asset": asset,
+        "side": side,
+        "quantity": quantity,
+        "price": price,
+        "notional_value": notional_value,
+        "now": get_ist_now(),
+        "channel": MODEL_UPDATES_CHANNEL,
+        "payload": change_payload("trades", "positions")
+    })
+    return dict(result.one()._mapping)
+
+
+def execution_error(execution: dict, code_name: str, notional_value: float) -> Optional[Tuple[int, str]]:
+    """(HTTP status, detail) for a trade execute_trade() refused, None if it was executed"""
+    if execution["trade"] is not None:
+        return None
+    # Only BUY trades are refused: without a CASH position or with too little cash
+    if not execution["has_cash"]:
+        return (
+            status.HTTP_404_NOT_FOUND,
+            f"No CASH position found for code_name '{code_name}'. Cannot execute BUY trade without cash balance."
+        )
+    current_cash = execution["cash_balance"]
+    return (
+        status.HTTP_400_BAD_REQUEST,
+        f"Insufficient cash balance. Current cash: {current_cash:.2f}, Required: {notional_value:.2f}, Shortfall: {abs(current_cash - notional_value):.2f}"
+    )
@@ -0,0 +1,395 @@
+"""
+Trade Queue
+-----------
+Optional asynchronous intake for trades, enabled with TRADE_QUEUE_ENABLED.
+POST /models/queue_trade validates and prices a trade like create_trade,
+appends it to a Redis Stream and answers 202 with a ticket id, without
+touching the database. A worker executes it afterwards with execute_trade();
+GET /models/trade_ticket/{ticket_id} and the /ws/trade-tickets stream report
+the outcome.
+
+Trades are spread over TRADE_QUEUE_PARTITIONS streams by code_name. Each
+stream is consumed by one worker in the cluster at a time, elected like the
+WebSocket producers, which executes its trades one after another. A model's
+trades therefore run in the order they were accepted, different models'
+trades run in parallel, and the queue never uses more than one database
+connection per stream.
+
+Trades run at most once: a ticket is marked running before its trade starts,
+and a worker taking over a stream fails the tickets it finds running instead
+of executing them again. Tickets change status with a compare-and-set, so
+when the previous owner still finishes such a trade, its outcome replaces the
+failure (and is announced again) rather than the other way round. An entry is
+acknowledged only once its ticket is finished: when the outcome of a trade
+cannot be stored, the write is retried without running the trade again, and
+if it keeps failing the entry is left pending for the next owner to fail.
+"""
+
+import asyncio
+import functools
+import json
+import os
+import uuid
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from config.redis import RedisClient
+from utils.frame_bus import StreamLeadership, publish_frames
+from utils.frames import encode_json
+from utils.model_identity import ModelIdentity
+from utils.time_utils import get_ist_now
+from utils.trade_execution import execute_trade, execution_error
+
+load_dotenv()
+
+TRADE_QUEUE_ENABLED = os.getenv("TRADE_QUEUE_ENABLED", "false").lower() in ("1", "true", "yes")
+# Streams the trades are spread over: the most trades executing at once
+TRADE_QUEUE_PARTITIONS = int(os.getenv("TRADE_QUEUE_PARTITIONS", "8"))
+# Approximate length each stream is trimmed to
+TRADE_QUEUE_MAXLEN = 100000
+# How long a worker's read waits for new trades, and how many it takes at once
+TRADE_QUEUE_BLOCK_MS = 1000
+TRADE_QUEUE_BATCH = 100
+# Attempts at an entry, or at recording a trade's outcome, while Redis fails;
+# the entry stays pending for the next owner after that
+TRADE_QUEUE_ATTEMPTS = 3
+TRADE_QUEUE_GROUP = "trade_workers"
+# Every owner of a stream reads as the same consumer, so the next owner finds
+# the entries the previous one read but did not acknowledge
+TRADE_QUEUE_CONSUMER = "owner"
+TRADE_TICKET_TTL = int(os.getenv("TRADE_TICKET_TTL", "86400"))  # seconds
+
+# Frame bus stream of ticket completion events
+TRADE_TICKETS_STREAM = "trade-tickets"
+
+QUEUED = "queued"
+RUNNING = "running"
+EXECUTED = "executed"
+REJECTED = "rejected"
+FAILED = "failed"
+
+
+# Write a ticket (ARGV[1], expiring after ARGV[2] seconds) only if the stored
+# one is missing or has one of the statuses ARGV[3..]
+UPDATE_TICKET_SCRIPT = """
+local current = redis.call('get', KEYS[1])
+if current then
+    local status = cjson.decode(current)['status']
+    local allowed = false
+    for i = 3, #ARGV do
+        if ARGV[i] == status then
+            allowed = true
+        end
+    end
+    if not allowed then
+        return 0
+    end
+end
+redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+
+def partition_for(code_name: str) -> int:
+    return zlib.crc32(code_name.encode("utf-8")) % TRADE_QUEUE_PARTITIONS
+
+
+def queue_key(partition: int) -> str:
+    """Redis Stream holding one partition's trades"""
+    return f"trade_queue:{partition}"
+
+
+def ticket_key(ticket_id: str) -> str:
+    """Redis key holding a ticket as JSON"""
+    return f"trade_ticket:{ticket_id}"
+
+
+async def create_ticket(ticket: dict) -> bool:
+    """Store a new ticket unless a worker already stored it; True if stored"""
+    created = await RedisClient.execute(
+        "execute_command", "SET", ticket_key(ticket["ticket_id"]), json.dumps(ticket), "EX", TRADE_TICKET_TTL, "NX"
+    )
+    return bool(created)
+
+
+async def update_ticket(ticket: dict, replaces: Tuple[str, ...]) -> bool:
+    """Store a ticket if the stored one is missing or has a status in `replaces`; True if stored"""
+    updated = await RedisClient.execute(
+        "eval", UPDATE_TICKET_SCRIPT, 1, ticket_key(ticket["ticket_id"]),
+        json.dumps(ticket), TRADE_TICKET_TTL, *replaces
+    )
+    return bool(updated)
+
+
+async def get_ticket(ticket_id: str) -> Optional[dict]:
+    """A ticket, None if it does not exist or has expired"""
+    data = await RedisClient.get(ticket_key(ticket_id))
+    return json.loads(data) if data else None
+
+
+class TradeQueue:
+    """This worker's share of the trade queue: the partitions it consumes"""
+    leaderships: List[StreamLeadership] = []
+    tasks: List[asyncio.Task] = []
+    reader_task = None
+    # Entries read for each partition this worker consumes, in stream order
+    inboxes: Dict[int, asyncio.Queue] = {}
+    completed: Dict[str, int] = {EXECUTED: 0, REJECTED: 0, FAILED: 0}
+
+    @classmethod
+    async def start(cls):
+        """Campaign for every partition; the partitions won are consumed until close()"""
+        if not TRADE_QUEUE_ENABLED or cls.tasks:
+            return
+        for partition in range(TRADE_QUEUE_PARTITIONS):
+            leadership = StreamLeadership(
+                f"trade-queue:{partition}", functools.partial(cls._consume, partition)
+            )
+            cls.leaderships.append(leadership)
+            cls.tasks.append(asyncio.create_task(leadership.run()))
+        cls.reader_task = asyncio.create_task(cls._read())
+        print(f"Trade queue started with {TRADE_QUEUE_PARTITIONS} partitions")
+
+    @classmethod
+    async def close(cls):
+        for task in cls.tasks:
+            task.cancel()
+        if cls.reader_task is not None:
+            cls.reader_task.cancel()
+        cls.leaderships = []
+        cls.tasks = []
+        cls.reader_task = None
+        cls.inboxes = {}
+
+    @classmethod
+    async def enqueue(
+        cls,
+        ai_model: ModelIdentity,
+        asset: str,
+        side: str,
+        quantity: float,
+        price: float,
+        notional_value: float
+    ) -> dict:
+        """Append a validated, priced trade to its model's partition and return its ticket"""
+        ticket = {
+            "ticket_id": uuid.uuid4().hex,
+            "status": QUEUED,
+            "code_name": ai_model.code_name,
+            "ai_model_id": ai_model.id,
+            "display_name": ai_model.display_name,
+            "asset": asset,
+            "side": side,
+            "quantity": quantity,
+            "price": price,
+            "notional_value": notional_value,
+            "queued_at": get_ist_now().isoformat(),
+            "completed_at": None,
+            "trade": None,
+            "error": None,
+            "status_code": None
+        }
+        # The entry carries the whole ticket, so the trade survives the ticket key.
+        # It is appended first, so no ticket exists for a trade that was never queued
+        await RedisClient.execute(
+            "xadd",
+            queue_key(partition_for(ai_model.code_name)),
+            {"ticket": json.dumps(ticket)},
+            maxlen=TRADE_QUEUE_MAXLEN,
+            approximate=True
+        )
+        # Not stored if a worker already took the trade and wrote a newer status
+        await create_ticket(ticket)
+        return ticket
+
+    @classmethod
+    async def _ensure_group(cls, key: str):
+        try:
+            await RedisClient.execute("xgroup_create", key, TRADE_QUEUE_GROUP, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    @classmethod
+    async def _consume(cls, partition: int):
+        """Producer of a partition's leadership: execute its trades one after another"""
+        key = queue_key(partition)
+        await cls._ensure_group(key)
+
+        # Entries a previous owner read but did not acknowledge come first
+        last_id = "0"
+        while True:
+            response = await RedisClient.execute(
+                "xreadgroup", TRADE_QUEUE_GROUP, TRADE_QUEUE_CONSUMER, {key: last_id}, count=TRADE_QUEUE_BATCH
+            )
+            entries = response[0][1] if response else []
+            if not entries:
+                break
+            for entry_id, fields in entries:
+                await asyncio.shield(cls._process(key, entry_id, fields, recovering=True))
+                last_id = entry_id
+
+        inbox: asyncio.Queue = asyncio.Queue()
+        cls.inboxes[partition] = inbox
+        try:
+            while True:
+                entry_id, fields = await inbox.get()
+                # A trade that started is finished even if leadership is lost meanwhile
+                await asyncio.shield(cls._process(key, entry_id, fields))
+        finally:
+            # Entries still in the inbox stay pending for the next owner
+            if cls.inboxes.get(partition) is inbox:
+                del cls.inboxes[partition]
+
+    @classmethod
+    async def _read(cls):
+        """Read new entries of every partition this worker consumes into their inboxes"""
+        while True:
+            if not cls.inboxes:
+                await asyncio.sleep(TRADE_QUEUE_BLOCK_MS / 1000)
+                continue
+            streams = {queue_key(partition): ">" for partition in cls.inboxes}
+            try:
+                response = await RedisClient.execute(
+                    "xreadgroup", TRADE_QUEUE_GROUP, TRADE_QUEUE_CONSUMER, streams,
+                    count=TRADE_QUEUE_BATCH, block=TRADE_QUEUE_BLOCK_MS
+                )
+            except Exception as e:
+                print(f"Trade queue read error: {e}")
+                await asyncio.sleep(1)
+                continue
+            for key, entries in response or []:
+                partition = int(key.decode("utf-8").rsplit(":", 1)[1])
+                inbox = cls.inboxes.get(partition)
+                if inbox is None:
+                    # Partition lost meanwhile; the entries stay pending for its next owner
+                    continue
+                for entry in entries:
+                    inbox.put_nowait(entry)
+
+    @classmethod
+    async def _process(cls, key: str, entry_id: bytes, fields: Dict[bytes, bytes], recovering: bool = False):
+        """
+        Run an entry's trade unless it already ran, then acknowledge the entry.
+        An entry is only acknowledged once its ticket holds a final status.
+        """
+        try:
+            queued = json.loads(fields[b"ticket"])
+        except (KeyError, TypeError, ValueError) as e:
+            # Also entries trimmed from the stream while pending, which have no fields
+            print(f"Dropping malformed trade queue entry {entry_id}: {e}")
+            queued = None
+
+        for attempt in range(1, TRADE_QUEUE_ATTEMPTS + 1):
+            try:
+                if queued is not None:
+                    ticket = await get_ticket(queued["ticket_id"]) or queued
+                    if ticket["status"] == QUEUED:
+                        await cls._execute(ticket)
+                    elif ticket["status"] == RUNNING and recovering:
+                        # Unless the previous owner finishes the trade first
+                        await cls._finish(
+                            ticket, FAILED, 500,
+                            "Interrupted while executing; check the model's trades before submitting it again",
+                            replaces=(RUNNING,)
+                        )
+                    elif ticket["status"] == RUNNING:
+                        # Taken by an earlier attempt whose outcome could not be
+                        # recorded; left pending so the next owner fails the ticket
+                        print(f"Trade ticket {ticket['ticket_id']} is still running, leaving entry {entry_id} pending")
+                        return
+                await RedisClient.execute("xack", key, TRADE_QUEUE_GROUP, entry_id)
+                return
+            except Exception as e:
+                # A retry finds the ticket running or finished, so the trade is not run twice
+                print(f"Trade queue entry {entry_id} attempt {attempt} failed: {e}")
+                await asyncio.sleep(attempt)
+
+    @classmethod
+    async def _execute(cls, ticket: dict):
+        from config.database import Database
+
+        ticket["status"] = RUNNING
+        if not await update_ticket(ticket, (QUEUED,)):
+            # Already taken; whoever took it reports the outcome
+            return
+        try:
+            async with Database.async_session_maker() as session:
+                execution = await execute_trade(
+                    session,
+                    # The identity the trade was accepted with
+                    ModelIdentity(ticket["ai_model_id"], ticket["code_name"], ticket["display_name"]),
+                    ticket["asset"],
+                    ticket["side"],
+                    ticket["quantity"],
+                    ticket["price"],
+                    ticket["notional_value"]
+                )
+                error = execution_error(execution, ticket["code_name"], ticket["notional_value"])
+                if error is None:
+                    await session.commit()
+        except Exception as e:
+            outcome = {"status": FAILED, "status_code": 500, "error": f"Error creating trade: {str(e)}"}
+        else:
+            if error is not None:
+                outcome = {"status": REJECTED, "status_code": error[0], "error": error[1]}
+            else:
+                outcome = {"status": EXECUTED, "trade": execution["trade"]}
+
+        # The trade has run (or failed): retry recording its outcome, never the trade
+        for attempt in range(1, TRADE_QUEUE_ATTEMPTS + 1):
+            try:
+                await cls._finish(ticket, **outcome)
+                return
+            except Exception as e:
+                print(f"Recording trade ticket {ticket['ticket_id']} attempt {attempt} failed: {e}")
+                await asyncio.sleep(attempt)
+        raise RuntimeError(f"Could not record the outcome of trade ticket {ticket['ticket_id']}")
+
+    @classmethod
+    async def _finish(
+        cls,
+        ticket: dict,
+        status: str,
+        status_code: Optional[int] = None,
+        error: Optional[str] = None,
+        trade: Optional[dict] = None,
+        replaces: Tuple[str, ...] = (RUNNING, FAILED)
+    ):
+        """
+        Record a ticket's outcome and announce it on the frame bus. By default
+        the outcome of a trade that ran replaces the failure a new owner of the
+        partition recorded meanwhile; nothing else overwrites a finished ticket.
+        """
+        ticket.update(
+            status=status,
+            completed_at=get_ist_now().isoformat(),
+            status_code=status_code,
+            error=error,
+            trade=trade
+        )
+        if not await update_ticket(ticket, replaces):
+            print(f"Trade ticket {ticket['ticket_id']} already finished, not marking it {status}")
+            return
+        cls.completed[status] += 1
+        try:
+            await publish_frames(
+                TRADE_TICKETS_STREAM,
+                {"code_name": ticket["code_name"], "ai_model_id": ticket["ai_model_id"]},
+                {"message": encode_json({"type": "trade_ticket", "ticket": ticket})}
+            )
+        except Exception as e:
+            print(f"Failed to publish trade ticket {ticket['ticket_id']}: {e}")
+
+    @classmethod
+    def status(cls) -> dict:
+        """Queue counters for /ws/status"""
+        return {
+            "enabled": TRADE_QUEUE_ENABLED,
+            "partitions": TRADE_QUEUE_PARTITIONS,
+            "consumed_partitions": sorted(cls.inboxes),
+            "backlog": sum(inbox.qsize() for inbox in cls.inboxes.values()),
+            "completed": dict(cls.completed)
+        }
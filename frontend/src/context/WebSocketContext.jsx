@@ -35,7 +35,10 @@ const websocketReducer = (state, action) => {
     case ACTION_TYPES.UPDATE_PRICE_DATA:
       return {
         ...state,
-        priceData: action.payload.data || {},
+        // price_update messages only carry the symbols that changed
+        priceData: action.payload.type === 'initial_prices'
+          ? (action.payload.data || {})
+          : { ...state.priceData, ...(action.payload.data || {}) },
         timestamp: action.payload.timestamp,
         lastUpdate: new Date(),
       };
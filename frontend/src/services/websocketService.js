@@ -270,8 +270,15 @@ class WebSocketService {
     try {
       const data = JSON.parse(event.data);
       
-      if (data.type === 'price_update' && data.data) {
-        this.lastPriceData = data;
+      if ((data.type === 'price_update' || data.type === 'initial_prices') && data.data) {
+        // price_update only carries changed symbols, so keep a merged copy for late subscribers
+        this.lastPriceData = {
+          ...data,
+          type: 'initial_prices',
+          data: data.type === 'initial_prices'
+            ? data.data
+            : { ...((this.lastPriceData && this.lastPriceData.data) || {}), ...data.data },
+        };
         this.notifyPriceListeners(data);
       }
     } catch (error) {
@@ -286,6 +293,11 @@ class WebSocketService {
     try {
       const data = JSON.parse(event.data);
       
+      // Heartbeats only show the connection is alive; they carry no data to cache or render
+      if (data.type === 'heartbeat') {
+        return;
+      }
+      
       this.lastModelData = data;
       this.notifyModelListeners(data);
     } catch (error) {
@@ -300,6 +312,11 @@ class WebSocketService {
     try {
       const data = JSON.parse(event.data);
       
+      // Heartbeats only show the connection is alive; they carry no data to cache or render
+      if (data.type === 'heartbeat') {
+        return;
+      }
+      
       this.lastModelDataStreamData = data;
       this.notifyModelDataListeners(data);
     } catch (error) {